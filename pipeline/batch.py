@@ -0,0 +1,246 @@
+"""
+Batch mode: run the pipeline for every tenant in one process.
+
+  uv run python -m pipeline.batch config/tenants
+  uv run python -m pipeline.batch config/tenants --concurrency 8 --force
+
+Each {tenant}.yaml in the directory is a full config file (secrets from
+{tenant}.env beside it, else .env). A tenant's data lives under tenants/{tenant}/
+in its buckets, and its web export under tenants/{tenant}/ in the web bucket.
+
+A tenant's work is split into units, one per source to extract and then
+daily_aggregation, export and compaction, which run in that order. A pool of
+--concurrency workers takes units from the tenants round-robin, so every tenant
+makes progress and one with years of data can't hold up the rest. Tenants using
+the same storage credentials share one client and connection pool.
+
+Output lines are prefixed with [tenant], and the run report (--metrics-dir)
+breaks job time and storage requests down by tenant.
+
+Several workers, on one machine or many, can share a run by pointing at the same
+buckets and passing the same --run-id (the nightly date, say):
+
+  uv run python -m pipeline.batch config/tenants --run-id 2026-10-19   # on each node
+
+A worker claims each unit with a lease in the bucket (see pipeline.common.leases)
+before running it. Units another worker holds are retried a little later, units
+another worker already finished in this run are skipped, and a unit whose worker
+died is taken over once its lease expires (--lease-ttl). A tenant's units still
+run one at a time and in order, whichever workers run them.
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO
+
+from pipeline.common import leases, metrics, paths
+from pipeline.common.config import PipelineConfig, load_tenant_configs
+from pipeline.extract import SOURCES, extractor
+from pipeline.jobs import JOBS, load_job
+
+if TYPE_CHECKING:
+    from pipeline.common.r2 import R2Client
+
+_DEFAULT_CONCURRENCY = 4
+_RETRY_DELAY = 5.0  # seconds before retrying a unit another worker holds
+
+
+@dataclass
+class _Tenant:
+    config: PipelineConfig
+    r2: R2Client
+    units: deque[str]                                   # still to run, in order
+    failures: list[str] = field(default_factory=list)
+
+
+def units(config: PipelineConfig) -> list[str]:
+    """A tenant's work in run order: extract/{source} per source, then the other jobs."""
+    result: list[str] = []
+    for name in JOBS:
+        if config.jobs_to_run and name not in config.jobs_to_run:
+            continue
+        if name == "extract":
+            result += [
+                f"extract/{source}" for source in SOURCES
+                if not config.sources_to_extract or source in config.sources_to_extract
+            ]
+        else:
+            result.append(name)
+    return result
+
+
+def run_batch(
+    configs: dict[str, PipelineConfig],
+    concurrency: int = _DEFAULT_CONCURRENCY,
+    run_id: str | None = None,
+    lease_ttl: float = leases.DEFAULT_TTL,
+) -> dict[str, list[str]]:
+    """Run every tenant's units on a shared pool of workers; return the failed units per tenant.
+
+    Each tenant has at most one unit running at a time. When a unit finishes its
+    tenant goes to the back of the queue, so free workers always serve the tenant
+    that has waited longest. A tenant whose next unit is leased by another worker
+    waits a few seconds before trying it again.
+
+    Workers passing the same run_id share the run; without one the run is this
+    process's alone, and its leases only keep other processes off the units it is
+    running.
+    """
+    from pipeline.common.r2 import make_client
+
+    for config in configs.values():
+        config.concurrency = concurrency  # sizes the shared storage client's connection pool
+    run_id = run_id or leases.new_run_id()
+    retry_delay = min(_RETRY_DELAY, lease_ttl / 4)
+    tenants = {
+        name: _Tenant(config, make_client(config), deque(units(config)))
+        for name, config in configs.items()
+    }
+    ready = deque(name for name, tenant in tenants.items() if tenant.units)
+    waiting: list[tuple[float, str]] = []  # heap of (when to retry, tenant)
+    running: dict[Future, tuple[str, str]] = {}
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        while ready or running or waiting:
+            while waiting and waiting[0][0] <= time.monotonic():
+                ready.append(heapq.heappop(waiting)[1])
+            while ready and len(running) < concurrency:
+                name = ready.popleft()
+                tenant = tenants[name]
+                unit = tenant.units.popleft()
+                future = pool.submit(_run_unit, name, tenant, unit, run_id, lease_ttl)
+                running[future] = (name, unit)
+            timeout = max(0.0, waiting[0][0] - time.monotonic()) if waiting else None
+            if not running:
+                time.sleep(timeout)
+                continue
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                name, unit = running.pop(future)
+                if not future.result():
+                    tenants[name].units.appendleft(unit)
+                    heapq.heappush(waiting, (time.monotonic() + retry_delay, name))
+                elif tenants[name].units:
+                    ready.append(name)
+    return {name: tenant.failures for name, tenant in tenants.items()}
+
+
+def _run_unit(name: str, tenant: _Tenant, unit: str, run_id: str, lease_ttl: float) -> bool:
+    """Run the unit under its lease; return False if another worker holds it and it should be
+    retried."""
+    with paths.tenant_scope(name):
+        try:
+            with leases.hold(tenant.r2, unit, run_id, lease_ttl) as lease:
+                if lease is None:
+                    return _finished_elsewhere(tenant.r2, unit, run_id)
+                print(f"running {unit}...")
+                with metrics.span("job", unit):
+                    if unit.startswith("extract/"):
+                        source = unit.removeprefix("extract/")
+                        with metrics.span("source", source):
+                            extractor(source)(tenant.r2, tenant.config)
+                    else:
+                        load_job(unit)(tenant.r2, tenant.config)
+        except Exception:
+            traceback.print_exc()
+            tenant.failures.append(unit)
+    return True
+
+
+def _finished_elsewhere(r2: R2Client, unit: str, run_id: str) -> bool:
+    lease = leases.peek(r2, unit)
+    if lease is None or lease["run"] != run_id or lease["status"] == "running":
+        return False
+    print(f"{unit} already {lease['status']} by {lease['owner']}, skipping")
+    return True
+
+
+class _TenantPrefixed:
+    """Wraps stdout/stderr so each line written inside a tenant_scope starts with [tenant].
+
+    Lines are buffered per thread and written whole, so concurrent tenants don't
+    interleave mid-line.
+    """
+
+    def __init__(self, stream: TextIO) -> None:
+        self._stream = stream
+        self._local = threading.local()
+
+    def write(self, text: str) -> int:
+        tenant = paths.current_tenant()
+        if not tenant:
+            return self._stream.write(text)
+        *lines, self._local.partial = (getattr(self._local, "partial", "") + text).split("\n")
+        if lines:
+            self._stream.write("".join(f"[{tenant}] {line}\n" for line in lines))
+        return len(text)
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+
+def _print_summary(failures: dict[str, list[str]]) -> None:
+    by_tenant = metrics.report().get("tenants", {})
+    print(f"\n{'tenant':<20} {'seconds':>8} {'jobs':>5} {'requests':>9}  failed")
+    for name, failed in failures.items():
+        t = by_tenant.get(name, {})
+        print(
+            f"{name:<20} {t.get('seconds', 0):>8.1f} {t.get('jobs', 0):>5} "
+            f"{t.get('requests', 0):>9}  {', '.join(failed) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the pipeline for every tenant in a directory of configs.",
+    )
+    parser.add_argument("tenants", type=Path, help="directory of {tenant}.yaml configs")
+    parser.add_argument(
+        "--concurrency", type=int, default=_DEFAULT_CONCURRENCY,
+        help="units run at once across all tenants",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="reread every archive and rerun aggregations and exports even if their inputs are "
+             "unchanged",
+    )
+    parser.add_argument(
+        "--metrics-dir", default=os.getenv("METRICS_DIR") or "metrics",
+        help="where to write the run report",
+    )
+    parser.add_argument(
+        "--run-id", default=os.getenv("RUN_ID"),
+        help="shared by workers splitting one run between them "
+             "(default: a run of this worker's own)",
+    )
+    parser.add_argument(
+        "--lease-ttl", type=float, default=leases.DEFAULT_TTL,
+        help="seconds before a dead worker's unit is taken over",
+    )
+    args = parser.parse_args()
+
+    configs = load_tenant_configs(args.tenants)
+    for config in configs.values():
+        config.force = args.force
+    metrics.enable()
+    sys.stdout, sys.stderr = _TenantPrefixed(sys.stdout), _TenantPrefixed(sys.stderr)
+
+    failures = run_batch(configs, args.concurrency, args.run_id, args.lease_ttl)
+    metrics.write_reports(args.metrics_dir)
+    _print_summary(failures)
+
+    if any(failures.values()):
+        failed = [f"{name}/{unit}" for name, units in failures.items() for unit in units]
+        print(f"\n✗ Failed: {', '.join(failed)}")
+        sys.exit(1)
+    print("\nDone.")
@@ -10,23 +10,16 @@ import subprocess
 from urllib.parse import urlparse
 
 import httpx
-from botocore.exceptions import ClientError
 
 from pipeline.common import paths
 from pipeline.common.r2 import R2Client, exists, upload_bytes
 
 
 def ensure_bucket(r2: R2Client, bucket: str) -> None:
-    try:
-        r2.client.head_bucket(Bucket=bucket)  # type: ignore[attr-defined]
+    if r2.storage.ensure_bucket():
+        print(f"✓ Bucket '{bucket}' created")
+    else:
         print(f"· Bucket '{bucket}' found")
-    except ClientError as e:
-        code = e.response["Error"]["Code"]
-        if code in ("404", "NoSuchBucket"):
-            r2.client.create_bucket(Bucket=bucket)  # type: ignore[attr-defined]
-            print(f"✓ Bucket '{bucket}' created")
-        else:
-            raise
 
 
 def create_inboxes(r2: R2Client) -> None:
@@ -41,7 +34,7 @@ def create_inboxes(r2: R2Client) -> None:
 
 def apply_cors(r2: R2Client, cors_rules: list) -> None:
     try:
-        r2.client.put_bucket_cors(  # type: ignore[attr-defined]
+        r2.storage.client.put_bucket_cors(  # type: ignore[attr-defined]
             Bucket=r2.bucket, CORSConfiguration={"CORSRules": cors_rules}
         )
         print(f"✓ CORS rules applied to '{r2.bucket}'")
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import calendar
 import os
 from dataclasses import dataclass, field
+from datetime import date
 from pathlib import Path
+from typing import Literal
 
 import yaml
 from pydantic import BaseModel
@@ -26,23 +29,41 @@ class _ExtractConfig(BaseModel):
     sources_to_extract: list[str] = []
     extract_from: str = ""
     extract_to: str = ""
+    memory_budget: str = ""
 
 
 class _AggregateConfig(BaseModel):
     aggregate_from: str = ""
     aggregate_to: str = ""
+    streaming: bool = False
+
+
+class _CompactConfig(BaseModel):
+    retention_days: int | None = None
+
+
+class _MetricsConfig(BaseModel):
+    metrics_dir: str = ""
 
 
 class _PipelineSection(BaseModel):
     jobs_to_run: list[str] = []
     extract: _ExtractConfig = _ExtractConfig()
     aggregate: _AggregateConfig = _AggregateConfig()
+    compact: _CompactConfig = _CompactConfig()
+    metrics: _MetricsConfig = _MetricsConfig()
+
+
+class _StorageConfig(BaseModel):
+    backend: Literal["s3", "local", "memory"] = "s3"
+    local_dir: str = ".storage"
 
 
 class ConfigFile(BaseModel):
     """Pydantic model for config.yaml — use model_json_schema() to regenerate schema.json."""
     r2: _R2Config
     github: _GithubConfig
+    storage: _StorageConfig = _StorageConfig()
     pipeline: _PipelineSection = _PipelineSection()
 
 
@@ -53,11 +74,12 @@ class Secrets(BaseSettings):
 
     model_config = SettingsConfigDict(env_file_encoding="utf-8", extra="ignore")
 
-    r2_endpoint_url: str
-    r2_access_key_id: str
-    r2_secret_access_key: str
-    cloudflare_api_token: str
-    github_token: str
+    # Only needed for the s3 storage backend / API syncs, so local runs work without a .env
+    r2_endpoint_url: str = ""
+    r2_access_key_id: str = ""
+    r2_secret_access_key: str = ""
+    cloudflare_api_token: str = ""
+    github_token: str = ""
     gym_group_username: str = ""
     gym_group_password: str = ""
     garmin_username: str = ""
@@ -76,10 +98,23 @@ class PipelineConfig:
     github_username: str
     secrets: Secrets
     endpoint_url: str
-    extract_from: str | None
-    extract_to: str | None
+    extract_from: date | None        # window of records to extract; rows outside it are kept
+    extract_to: date | None
     jobs_to_run: list[str] = field(default_factory=list)
     sources_to_extract: list[str] = field(default_factory=list)
+    archive_retention_days: int | None = None
+    metrics_dir: str | None = None
+    profile_scope: list[str] = field(default_factory=list)
+    profile_memory: bool = False     # also trace allocations (tracemalloc) in profiled stages
+    storage_backend: str = "s3"      # s3 | local | memory
+    storage_dir: str = ".storage"    # root for the local backend
+    force: bool = False              # --force: ignore lineage and incremental state
+    concurrency: int = 1             # units sharing the storage client (batch --concurrency)
+    aggregate_streaming: bool = False  # run aggregations on Polars' streaming engine
+    aggregate_from: date | None = None  # window to re-aggregate; rows outside it are kept
+    aggregate_to: date | None = None
+    tenant: str = ""                 # batch mode: keys live under tenants/{tenant}/ (see paths)
+    extract_memory_budget: int | None = None  # bytes; extractors spill to stay under it (see spill)
 
     @staticmethod
     def load(
@@ -99,12 +134,122 @@ class PipelineConfig:
             endpoint_url=secrets.r2_endpoint_url,
             sources_to_extract=_parse_list("SOURCES_TO_EXTRACT") or cfg.pipeline.extract.sources_to_extract,
             jobs_to_run=_parse_list("JOBS_TO_RUN") or cfg.pipeline.jobs_to_run,
-            extract_from=cfg.pipeline.extract.extract_from or None,
-            extract_to=cfg.pipeline.extract.extract_to or None,
+            **_parse_window(
+                "extract",
+                os.getenv("EXTRACT_FROM") or cfg.pipeline.extract.extract_from,
+                os.getenv("EXTRACT_TO") or cfg.pipeline.extract.extract_to,
+            ),
+            archive_retention_days=cfg.pipeline.compact.retention_days,
+            metrics_dir=os.getenv("METRICS_DIR") or cfg.pipeline.metrics.metrics_dir or None,
+            profile_scope=_parse_list("PROFILE_SCOPE"),
+            profile_memory=_parse_bool("PROFILE_MEMORY", False),
+            storage_backend=os.getenv("STORAGE_BACKEND") or cfg.storage.backend,
+            storage_dir=os.getenv("STORAGE_DIR") or cfg.storage.local_dir,
+            aggregate_streaming=_parse_bool(
+                "AGGREGATE_STREAMING", cfg.pipeline.aggregate.streaming,
+            ),
+            **_parse_window(
+                "aggregate",
+                os.getenv("AGGREGATE_FROM") or cfg.pipeline.aggregate.aggregate_from,
+                os.getenv("AGGREGATE_TO") or cfg.pipeline.aggregate.aggregate_to,
+            ),
+            extract_memory_budget=parse_size(
+                os.getenv("EXTRACT_MEMORY_BUDGET") or cfg.pipeline.extract.memory_budget,
+            ),
         )
 
+    @property
+    def extract_window(self) -> tuple[date | None, date | None] | None:
+        return _window(self.extract_from, self.extract_to)
+
+    @property
+    def aggregate_window(self) -> tuple[date | None, date | None] | None:
+        return _window(self.aggregate_from, self.aggregate_to)
+
+
+def load_tenant_configs(directory: Path, env_path: str = ".env") -> dict[str, PipelineConfig]:
+    """Load every {tenant}.yaml in directory, keyed by tenant name (the file stem).
+
+    A tenant's secrets come from {tenant}.env next to its config if there is one,
+    otherwise from env_path. Env var overrides apply to every tenant.
+    """
+    configs: dict[str, PipelineConfig] = {}
+    for path in sorted(directory.glob("*.yaml")):
+        tenant_env = path.with_suffix(".env")
+        config = PipelineConfig.load(path, str(tenant_env) if tenant_env.exists() else env_path)
+        config.tenant = path.stem
+        configs[path.stem] = config
+    if not configs:
+        raise FileNotFoundError(f"no tenant configs (*.yaml) in {directory}")
+    return configs
+
+
+def profile_dir(config: PipelineConfig) -> Path:
+    """Where --profile output goes: next to the run report."""
+    return Path(config.metrics_dir or "metrics") / "profiles"
+
 
 def _parse_list(env_var: str) -> list[str]:
     """Parse a comma-separated env var into a list, returning [] if unset or empty."""
     raw = os.getenv(env_var, "").strip()
     return [t.strip() for t in raw.split(",") if t.strip()]
+
+
+def _parse_bool(env_var: str, default: bool) -> bool:
+    """Parse a true/false env var, returning default if unset or empty."""
+    raw = os.getenv(env_var, "").strip().lower()
+    return raw in ("1", "true", "yes") if raw else default
+
+
+def parse_date_bound(value: str, end: bool = False) -> date | None:
+    """Parse "2026", "2026-03" or "2026-03-05" as the first day it covers (the last day
+    with end=True). Returns None for an empty string."""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        parts = [int(p) for p in value.split("-")]
+        if len(parts) == 1:
+            return date(parts[0], 12, 31) if end else date(parts[0], 1, 1)
+        if len(parts) == 2:
+            year, month = parts
+            return date(year, month, calendar.monthrange(year, month)[1] if end else 1)
+        if len(parts) == 3:
+            return date.fromisoformat(value)
+    except ValueError:
+        pass
+    raise ValueError(f"invalid date {value!r} (expected YYYY, YYYY-MM or YYYY-MM-DD)")
+
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_size(value: str) -> int | None:
+    """Parse "512MB", "2G" or "1.5GiB" as bytes (binary units). Returns None for an empty string."""
+    number = value.strip().upper().removesuffix("B").removesuffix("I")
+    if not number:
+        return None
+    unit = number[-1] if number[-1] in _SIZE_UNITS else ""
+    try:
+        size = int(float(number.removesuffix(unit)) * _SIZE_UNITS[unit])
+    except ValueError:
+        raise ValueError(f"expected a size like 512MB or 2GB, got {value!r}") from None
+    if size <= 0:
+        raise ValueError(f"size must be positive, got {value!r}")
+    return size
+
+
+def _parse_window(name: str, start: str, end: str) -> dict[str, date | None]:
+    window = {
+        f"{name}_from": parse_date_bound(start),
+        f"{name}_to": parse_date_bound(end, end=True),
+    }
+    lo, hi = window.values()
+    if lo and hi and lo > hi:
+        raise ValueError(f"{name}_from ({start}) is after {name}_to ({end})")
+    return window
+
+
+def _window(start: date | None, end: date | None) -> tuple[date | None, date | None] | None:
+    """(start, end), or None when neither bound is set."""
+    return None if start is None and end is None else (start, end)
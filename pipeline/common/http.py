@@ -0,0 +1,62 @@
+"""
+Shared async HTTP client for the API fetches (see scripts/sync_api.py).
+
+One pooled httpx.AsyncClient serves every source so connections are reused, over
+HTTP/2 when the h2 package is installed (uv add 'httpx[http2]') and HTTP/1.1 otherwise.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from importlib.util import find_spec
+from typing import TYPE_CHECKING
+
+import httpx
+
+if TYPE_CHECKING:
+    from pipeline.common.config import PipelineConfig
+    from pipeline.common.r2 import R2Client
+
+HTTP2 = find_spec("h2") is not None
+
+_DEFAULT_TIMEOUT = 30  # seconds per request
+_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10)
+
+AsyncFetch = Callable[["R2Client", "PipelineConfig", httpx.AsyncClient], Awaitable[None]]
+
+
+def async_client(
+    rate_limits: dict[str, float] | None = None, timeout: float = _DEFAULT_TIMEOUT,
+) -> httpx.AsyncClient:
+    """A pooled AsyncClient. rate_limits maps a host to the most requests per second it is sent."""
+    hooks = {"request": [RateLimiter(rate_limits).wait]} if rate_limits else {}
+    return httpx.AsyncClient(http2=HTTP2, timeout=timeout, limits=_LIMITS, event_hooks=hooks)
+
+
+class RateLimiter:
+    """Spaces out requests to each host so none is sent more than its rate (requests/second)."""
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        self.rates = rates
+        self._next: dict[str, float] = {}  # host → earliest time its next request may go
+
+    async def wait(self, request: httpx.Request) -> None:
+        rate = self.rates.get(request.url.host)
+        if not rate:
+            return
+        now = time.monotonic()
+        slot = max(now, self._next.get(request.url.host, now))
+        self._next[request.url.host] = slot + 1 / rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def run(fetch: AsyncFetch, r2: R2Client, config: PipelineConfig) -> None:
+    """Run an async fetch to completion on a client of its own (for one-off, blocking callers)."""
+    async def main() -> None:
+        async with async_client() as client:
+            await fetch(r2, config, client)
+
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+"""
+Leases on units of work, kept in the bucket so that processes on different
+machines can share a run without doing the same unit twice.
+
+meta/leases/{unit}.json (under the tenant's prefix in batch mode):
+  {"unit": "export", "run": "2026-10-19", "owner": "host:1234:9f2c",
+   "status": "running", "acquired_at": 1760832000.0, "expires_at": 1760832300.0}
+
+status is running while held, then done or failed. A free unit is claimed by creating
+its lease with a conditional put (If-None-Match), so exactly one worker wins it.
+A lease whose holder finished it in an earlier run, or whose expiry has passed
+because the holder died, is taken over with a put conditioned on the ETag just
+read (If-Match), so of several workers recovering it only one succeeds. A unit
+done or failed in the current run stays claimed until the run changes.
+
+hold() renews the lease every ttl/3 from a heartbeat thread. If a renewal finds
+the lease gone, another worker took the unit over after it expired, and hold()
+raises LeaseLost once the work returns.
+
+Expiry compares wall clocks across machines, so ttl should be well above any
+clock skew between workers.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import os
+import secrets
+import socket
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import cache
+
+from pipeline.common import paths
+from pipeline.common import r2 as R2
+from pipeline.common.r2 import R2Client
+from pipeline.common.storage import PreconditionFailed
+
+DEFAULT_TTL = 300.0  # seconds
+
+_run_ids = itertools.count()
+
+
+class LeaseLost(Exception):
+    """The lease expired and was taken over by another worker while its unit ran."""
+
+
+@cache
+def worker_id() -> str:
+    """Identifies this process in the leases it holds."""
+    return f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(2)}"
+
+
+def new_run_id() -> str:
+    """A run of its own: leases then only exclude other processes running the same unit
+    right now."""
+    return f"{worker_id()}:{time.time():.0f}:{next(_run_ids)}"
+
+
+@dataclass
+class Lease:
+    r2: R2Client
+    unit: str
+    key: str       # resolved when acquired: the heartbeat thread has no tenant scope
+    run: str
+    ttl: float
+    etag: str
+    acquired_at: float
+    lost: threading.Event = field(default_factory=threading.Event)
+
+    def renew(self) -> None:
+        self._put("running", time.time() + self.ttl)
+
+    def finish(self, status: str) -> None:
+        self._put(status, 0.0)
+
+    def _put(self, status: str, expires_at: float) -> None:
+        body = _body(self.unit, self.run, status, self.acquired_at, expires_at)
+        try:
+            self.etag = R2.upload_bytes(
+                self.r2, self.key, body, "application/json", if_match=self.etag,
+            )
+        except PreconditionFailed:
+            self.lost.set()
+            raise LeaseLost(self.unit) from None
+
+
+def peek(r2: R2Client, unit: str) -> dict | None:
+    """The unit's lease as stored, or None if it has never been claimed."""
+    key = _key(unit)
+    return json.loads(R2.download_bytes(r2, key)) if R2.exists(r2, key) else None
+
+
+def acquire(r2: R2Client, unit: str, run: str, ttl: float = DEFAULT_TTL) -> Lease | None:
+    """Claim the unit for this run, or return None if another worker holds it or already did it."""
+    key = _key(unit)
+    now = time.time()
+    body = _body(unit, run, "running", now, now + ttl)
+    try:
+        etag = R2.upload_bytes(r2, key, body, "application/json", if_none_match=True)
+        return Lease(r2, unit, key, run, ttl, etag, now)
+    except PreconditionFailed:
+        pass
+
+    current = R2.head(r2, key)
+    if current is None:  # released and deleted in between; try again next time round
+        return None
+    lease = json.loads(R2.download_bytes(r2, key))
+    if lease["run"] == run and lease["status"] != "running":
+        return None
+    if lease["status"] == "running" and lease["expires_at"] > now:
+        return None
+    try:
+        etag = R2.upload_bytes(r2, key, body, "application/json", if_match=current.etag)
+    except PreconditionFailed:
+        return None
+    if lease["status"] == "running":
+        print(f"  recovered expired lease on {unit} from {lease['owner']}")
+    return Lease(r2, unit, key, run, ttl, etag, now)
+
+
+@contextmanager
+def hold(r2: R2Client, unit: str, run: str, ttl: float = DEFAULT_TTL) -> Iterator[Lease | None]:
+    """Hold the unit's lease while the block runs, renewing it in the background.
+
+    Yields None (and the block should skip the unit) if it can't be claimed. The
+    lease is marked done when the block returns and failed if it raises; if marking
+    it failed goes wrong too, that is printed and the block's error still propagates.
+    """
+    lease = acquire(r2, unit, run, ttl)
+    if lease is None:
+        yield None
+        return
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(lease, stop), name=f"lease-{unit}", daemon=True,
+    )
+    heartbeat.start()
+    status = "failed"
+    try:
+        yield lease
+        status = "done"
+    finally:
+        stop.set()
+        heartbeat.join()
+        if not lease.lost.is_set():
+            try:
+                lease.finish(status)
+            except Exception as e:
+                if status == "done":
+                    raise
+                # The block's own error is propagating; the lease just expires after ttl
+                print(f"  ✗ couldn't mark lease on {unit} failed: {e}")
+    if lease.lost.is_set():
+        raise LeaseLost(unit)
+
+
+def _heartbeat(lease: Lease, stop: threading.Event) -> None:
+    while not stop.wait(lease.ttl / 3):
+        try:
+            lease.renew()
+        except LeaseLost:
+            print(f"  ✗ lost lease on {lease.unit}")
+            return
+        except Exception as e:  # transient storage error: keep trying until the lease expires
+            print(f"  lease renewal for {lease.unit} failed: {e}")
+
+
+def _key(unit: str) -> str:
+    return paths.construct_meta_path(f"leases/{unit}.json")
+
+
+def _body(unit: str, run: str, status: str, acquired_at: float, expires_at: float) -> bytes:
+    return json.dumps({
+        "unit": unit, "run": run, "owner": worker_id(), "status": status,
+        "acquired_at": acquired_at, "expires_at": expires_at,
+    }).encode()
@@ -0,0 +1,98 @@
+"""
+Lineage of derived tables and web exports, used to skip steps whose inputs haven't changed.
+
+meta/lineage.json records, per step, the ETag of every input table it was built
+from, its definition (the transform or export spec) and a fingerprint of what it
+produced:
+  {"aggregations": {"daily_steps": {"inputs": {"fitbit_steps": etag, "garmin_wellness": null},
+                                    "recipe": "_aggregate_steps", "output": etag}},
+   "exports":      {"daily_steps": {"inputs": {"daily_steps": etag}, "recipe": "ExportSpec(...)",
+                                    "output": sha256}}}
+
+A step is up to date when its inputs, recipe and output all match what was
+recorded (a missing table counts as null). config.force (--force) reruns everything.
+"""
+
+from __future__ import annotations
+
+import json
+
+from pipeline.common import paths
+from pipeline.common import r2 as R2
+from pipeline.common.r2 import R2Client
+
+_LINEAGE_NAME = "lineage.json"
+
+
+def table_fingerprints(r2: R2Client) -> dict[str, str]:
+    """ETag of every table, keyed by table name, from a single listing of tables/."""
+    prefix = paths.construct_tables_prefix()
+    return {
+        obj.key.removeprefix(prefix).removesuffix(".parquet"): obj.etag
+        for obj in R2.iter_objects(r2, prefix)
+    }
+
+
+def load(r2: R2Client) -> dict:
+    if "lineage" not in r2.cache:
+        key = paths.construct_meta_path(_LINEAGE_NAME)
+        r2.cache["lineage"] = (
+            json.loads(R2.download_bytes(r2, key)) if R2.exists(r2, key)
+            else {"aggregations": {}, "exports": {}}
+        )
+    return r2.cache["lineage"]
+
+
+def save(r2: R2Client) -> None:
+    body = json.dumps(load(r2), sort_keys=True).encode()
+    R2.upload_bytes(r2, paths.construct_meta_path(_LINEAGE_NAME), body, "application/json")
+
+
+def stale(
+    r2: R2Client,
+    kind: str,
+    name: str,
+    inputs: dict[str, str | None],
+    recipe: str,
+    output: str | None,
+    force: bool,
+) -> str | None:
+    """Return why the step has to run, or None if it is up to date (and record the skip)."""
+    if force:
+        return "forced"
+    entry = load(r2)[kind].get(name)
+    if entry is None:
+        return "no lineage recorded"
+    changed = [
+        t for t in sorted(set(inputs) | set(entry["inputs"]))
+        if inputs.get(t) != entry["inputs"].get(t)
+    ]
+    if changed:
+        return f"input changed: {', '.join(changed)}"
+    if recipe != entry["recipe"]:
+        return "definition changed"
+    if output != entry["output"]:
+        return "output missing or modified"
+    r2.cache.setdefault("lineage_skipped", []).append(f"{kind}/{name}")
+    return None
+
+
+def record(
+    r2: R2Client,
+    kind: str,
+    name: str,
+    inputs: dict[str, str | None],
+    recipe: str,
+    output: str | None,
+) -> None:
+    load(r2)[kind][name] = {"inputs": inputs, "recipe": recipe, "output": output}
+
+
+def forget(r2: R2Client, kind: str, name: str) -> None:
+    """Drop a step's lineage so its next run rebuilds it in full."""
+    load(r2)[kind].pop(name, None)
+
+
+def skipped(r2: R2Client) -> list[str]:
+    """Steps skipped so far this run, as "{kind}/{name}"."""
+    return r2.cache.get("lineage_skipped", [])
@@ -0,0 +1,504 @@
+"""
+Run metrics: stage timings, storage request counts/latency/bytes and row throughput.
+
+Disabled unless enable() is called (run_pipeline does so when metrics_dir is set).
+While disabled, span() returns a shared no-op and instrument() returns the storage
+backend untouched, so the instrumented code paths cost one global lookup.
+
+  with metrics.span("aggregation", "daily_steps") as s:
+      ...
+      s.rows = len(result)
+
+At the end of a run, write_reports() writes run_report.json and pipeline.prom
+(a Prometheus node_exporter textfile) into the metrics directory.
+
+In batch mode spans and requests carry the tenant they belong to (the current
+paths.tenant_scope for spans, the key's tenants/{name}/ prefix for requests), and
+the report adds a per-tenant summary.
+
+Spans are also totalled per stage (kind, name, status), and pipeline.prom exports
+those totals, so a stage that runs many times is still one series per label set.
+
+In watch mode (pipeline.watch) one recorder covers the daemon's lifetime, keeping
+only the most recent spans (the totals cover them all). It also records, per
+source, the latency from a file's upload to the inbox to its data being
+published on the website.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pipeline.common import paths
+
+# Request latency histogram bucket upper bounds, in seconds (Prometheus style, +Inf implied)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upload-to-publish latency histogram bucket upper bounds, in seconds
+PUBLISH_LATENCY_BUCKETS = (5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 900.0, 3600.0, 21600.0, 86400.0)
+
+
+@dataclass
+class Span:
+    kind: str      # job | source | aggregation | export
+    name: str
+    rows: int | None = None
+    status: str = "ok"
+    seconds: float = 0.0
+    tenant: str = ""
+
+
+@dataclass
+class _StageStats:
+    count: int = 0
+    seconds: float = 0.0
+    rows: int | None = None  # None unless some span of the stage counted rows
+
+
+@dataclass
+class _RequestStats:
+    count: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+
+@dataclass
+class _PublishStats:
+    count: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(PUBLISH_LATENCY_BUCKETS) + 1))
+
+
+class _NullSpan:
+    """Accepts the same attribute writes as Span and drops them."""
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+    def __setattr__(self, name: str, value) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Recorder:
+    def __init__(self, span_limit: int | None = None) -> None:
+        self.started_at = datetime.now(timezone.utc)
+        self.spans: deque[Span] = deque(maxlen=span_limit)  # the most recent span_limit
+        # keyed by (kind, name, status, tenant)
+        self.stages: dict[tuple[str, str, str, str], _StageStats] = {}
+        # keyed by (bucket, operation, prefix, tenant)
+        self.requests: dict[tuple[str, str, str, str], _RequestStats] = {}
+        self.publish: dict[tuple[str, str], _PublishStats] = {}  # (source, tenant)
+        self._lock = threading.Lock()
+
+    def record_span(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+            key = (span.kind, span.name, span.status, span.tenant)
+            stats = self.stages.setdefault(key, _StageStats())
+            stats.count += 1
+            stats.seconds += span.seconds
+            if span.rows is not None:
+                stats.rows = (stats.rows or 0) + span.rows
+
+    def record_request(
+        self, bucket: str, operation: str, prefix: str, seconds: float,
+        bytes_in: int = 0, bytes_out: int = 0, error: bool = False, tenant: str = "",
+    ) -> None:
+        with self._lock:
+            stats = self.requests.setdefault((bucket, operation, prefix, tenant), _RequestStats())
+            stats.count += 1
+            stats.errors += error
+            stats.seconds += seconds
+            stats.bytes_in += bytes_in
+            stats.bytes_out += bytes_out
+            stats.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def record_publish(self, source: str, seconds: float, tenant: str = "") -> None:
+        with self._lock:
+            stats = self.publish.setdefault((source, tenant), _PublishStats())
+            stats.count += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.buckets[bisect_left(PUBLISH_LATENCY_BUCKETS, seconds)] += 1
+
+
+_recorder: Recorder | None = None
+
+
+def enable(span_limit: int | None = None) -> Recorder:
+    """Start recording; with span_limit, only that many of the latest spans are kept."""
+    global _recorder
+    _recorder = Recorder(span_limit)
+    return _recorder
+
+
+def disable() -> None:
+    global _recorder
+    _recorder = None
+
+
+def enabled() -> bool:
+    return _recorder is not None
+
+
+class _SpanContext:
+    def __init__(self, recorder: Recorder, span: Span) -> None:
+        self.recorder = recorder
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.t0 = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.span.seconds = time.perf_counter() - self.t0
+        if exc_type is not None:
+            self.span.status = "failed"
+        self.recorder.record_span(self.span)
+
+
+def span(kind: str, name: str):
+    """Time a stage of the run. Yields a Span whose .rows can be set for throughput."""
+    if _recorder is None:
+        return _NULL_SPAN
+    return _SpanContext(_recorder, Span(kind, str(name), tenant=paths.current_tenant()))
+
+
+def publish_latency(source: str, seconds: float) -> None:
+    """Record how long a file uploaded to source's inbox took to reach the website."""
+    if _recorder is not None:
+        _recorder.record_publish(source, seconds, paths.current_tenant())
+
+
+# ── Storage client instrumentation ────────────────────────────────────────────
+
+def instrument(storage, bucket: str):
+    """Wrap a storage backend so every request is counted and timed; no-op when disabled."""
+    if _recorder is None:
+        return storage
+    return _InstrumentedStorage(storage, bucket, _recorder)
+
+
+def key_prefix(key: str) -> tuple[str, str]:
+    """Group keys by tenant and their first two folders after it,
+    e.g. tenants/ana/archive/fitbit/2025-01-01/x.json → (archive/fitbit, ana)."""
+    tenant, key = paths.split_tenant(key)
+    folders = key.split("/")[:-1]
+    return "/".join(folders[:2]) or "/", tenant
+
+
+class _InstrumentedStorage:
+    """Records head/get/open/put/put_file/delete/copy/list calls on a storage backend.
+
+    A list() is one request however many pages the backend fetches; its time is
+    the time spent inside the backend while iterating. local_path() passes through
+    unrecorded, since reading a local file moves nothing over the network.
+    """
+
+    def __init__(self, storage, bucket: str, recorder: Recorder) -> None:
+        self._storage = storage
+        self._bucket = bucket
+        self._recorder = recorder
+
+    def __getattr__(self, name: str):
+        # Backend-specific extras, e.g. S3Storage.client for bucket_setup
+        return getattr(self._storage, name)
+
+    def _timed(self, operation: str, key: str, fn, *args, bytes_out: int = 0):
+        prefix, tenant = key_prefix(key)
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception:
+            self._recorder.record_request(
+                self._bucket, operation, prefix, time.perf_counter() - t0,
+                bytes_out=bytes_out, error=True, tenant=tenant,
+            )
+            raise
+        bytes_in = len(result) if isinstance(result, (bytes, bytearray)) else 0
+        self._recorder.record_request(
+            self._bucket, operation, prefix, time.perf_counter() - t0, bytes_in, bytes_out,
+            tenant=tenant,
+        )
+        return result
+
+    def head(self, key: str):
+        return self._timed("head", key, self._storage.head, key)
+
+    def get(self, key: str) -> bytes:
+        return self._timed("get", key, self._storage.get, key)
+
+    def open(self, key: str):
+        body = self._timed("open", key, self._storage.open, key)
+        return _CountingReader(body, self._recorder, (self._bucket, "open", *key_prefix(key)))
+
+    def put(self, key: str, data: bytes, *args, **kwargs) -> str:
+        return self._timed(
+            "put", key, lambda: self._storage.put(key, data, *args, **kwargs), bytes_out=len(data),
+        )
+
+    def put_file(self, key: str, path) -> None:
+        size = path.stat().st_size
+        return self._timed("put", key, self._storage.put_file, key, path, bytes_out=size)
+
+    def delete(self, key: str) -> None:
+        return self._timed("delete", key, self._storage.delete, key)
+
+    def delete_many(self, keys: list[str]) -> None:
+        return self._timed("delete_many", keys[0] if keys else "", self._storage.delete_many, keys)
+
+    def copy(self, src: str, dst: str, size: int = 0) -> None:
+        return self._timed("copy", dst, self._storage.copy, src, dst, size)
+
+    def list(self, prefix: str, start_after: str = ""):
+        tenant, unscoped = paths.split_tenant(prefix)
+        label = "/".join(unscoped.rstrip("/").split("/")[:2]) or "/"
+        objects = iter(self._storage.list(prefix, start_after))
+        seconds, error = 0.0, False
+        try:
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    obj = next(objects)
+                except StopIteration:
+                    return
+                except Exception:
+                    error = True
+                    raise
+                finally:
+                    seconds += time.perf_counter() - t0
+                yield obj
+        finally:
+            self._recorder.record_request(
+                self._bucket, "list", label, seconds, error=error, tenant=tenant,
+            )
+
+    def local_path(self, key: str):
+        return self._storage.local_path(key)
+
+    def ensure_bucket(self) -> bool:
+        return self._storage.ensure_bucket()
+
+
+class _CountingReader:
+    """Counts bytes read from a streamed object into the open request's stats."""
+
+    def __init__(self, body, recorder: Recorder, stats_key: tuple[str, str, str, str]) -> None:
+        self._body = body
+        self._recorder = recorder
+        self._stats_key = stats_key
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._body.read(size)
+        with self._recorder._lock:
+            self._recorder.requests[self._stats_key].bytes_in += len(chunk)
+        return chunk
+
+    def close(self) -> None:
+        self._body.close()
+
+
+# ── Reports ───────────────────────────────────────────────────────────────────
+
+def report() -> dict:
+    """Snapshot of everything recorded so far, as plain JSON-able data."""
+    rec = _recorder
+    if rec is None:
+        return {}
+    finished_at = datetime.now(timezone.utc)
+    with rec._lock:
+        spans = list(rec.spans)
+        stages = dict(rec.stages)
+        requests = dict(rec.requests)
+        publish = dict(rec.publish)
+    data = {
+        "started_at": rec.started_at.isoformat(),
+        "finished_at": finished_at.isoformat(),
+        "seconds": round((finished_at - rec.started_at).total_seconds(), 3),
+        "spans": [
+            {
+                "kind": s.kind, "name": s.name, "status": s.status,
+                "seconds": round(s.seconds, 4), "rows": s.rows,
+                "rows_per_second": (
+                    round(s.rows / s.seconds, 1) if s.rows is not None and s.seconds > 0 else None
+                ),
+                **_tenant_field(s.tenant),
+            }
+            for s in spans
+        ],
+        "stages": [
+            {
+                "kind": kind, "name": name, "status": status,
+                "count": st.count, "seconds": round(st.seconds, 4), "rows": st.rows,
+                **_tenant_field(tenant),
+            }
+            for (kind, name, status, tenant), st in sorted(stages.items())
+        ],
+        "requests": [
+            {
+                "bucket": bucket, "operation": op, "prefix": prefix,
+                "count": r.count, "errors": r.errors, "seconds": round(r.seconds, 4),
+                "bytes_in": r.bytes_in, "bytes_out": r.bytes_out,
+                "latency_buckets": dict(zip([*map(str, LATENCY_BUCKETS), "+Inf"], r.buckets)),
+                **_tenant_field(tenant),
+            }
+            for (bucket, op, prefix, tenant), r in sorted(requests.items())
+        ],
+    }
+    if publish:
+        data["publish_latency"] = [
+            {
+                "source": source, "count": p.count,
+                "seconds": round(p.seconds, 3), "max_seconds": round(p.max_seconds, 3),
+                "latency_buckets": dict(
+                    zip([*map(str, PUBLISH_LATENCY_BUCKETS), "+Inf"], p.buckets)
+                ),
+                **_tenant_field(tenant),
+            }
+            for (source, tenant), p in sorted(publish.items())
+        ]
+    tenants = sorted(({key[3] for key in stages} | {key[3] for key in requests}) - {""})
+    if tenants:
+        data["tenants"] = {t: _tenant_summary(t, data) for t in tenants}
+    return data
+
+
+def _tenant_field(tenant: str) -> dict:
+    return {"tenant": tenant} if tenant else {}
+
+
+def _tenant_summary(tenant: str, data: dict) -> dict:
+    """Job time, failures and storage traffic of one tenant in a batch run."""
+    jobs = [s for s in data["stages"] if s.get("tenant") == tenant and s["kind"] == "job"]
+    requests = [r for r in data["requests"] if r.get("tenant") == tenant]
+    return {
+        "seconds": round(sum(s["seconds"] for s in jobs), 3),
+        "jobs": sum(s["count"] for s in jobs),
+        "failed": [s["name"] for s in jobs if s["status"] == "failed"],
+        "requests": sum(r["count"] for r in requests),
+        "request_errors": sum(r["errors"] for r in requests),
+        "bytes_in": sum(r["bytes_in"] for r in requests),
+        "bytes_out": sum(r["bytes_out"] for r in requests),
+    }
+
+
+def prometheus_text(data: dict) -> str:
+    """Render report() in the Prometheus text exposition format."""
+    finished = datetime.fromisoformat(data["finished_at"]).timestamp()
+    lines = [
+        "# HELP yid_run_seconds Wall time of the pipeline run.",
+        "# TYPE yid_run_seconds gauge",
+        f"yid_run_seconds {data['seconds']}",
+        "# HELP yid_run_finished_timestamp_seconds Unix time the run finished.",
+        "# TYPE yid_run_finished_timestamp_seconds gauge",
+        f"yid_run_finished_timestamp_seconds {finished:.0f}",
+        "# HELP yid_stage_seconds Wall time per pipeline stage.",
+        "# TYPE yid_stage_seconds summary",
+    ]
+    rows: dict[tuple[str, str, str], int] = {}
+    for s in data["stages"]:
+        base = dict(
+            kind=s["kind"], name=s["name"], status=s["status"],
+            **_tenant_field(s.get("tenant", "")),
+        )
+        lines.append(f"yid_stage_seconds_sum{_labels(**base)} {s['seconds']}")
+        lines.append(f"yid_stage_seconds_count{_labels(**base)} {s['count']}")
+        if s["rows"] is not None:
+            key = (s["kind"], s["name"], s.get("tenant", ""))
+            rows[key] = rows.get(key, 0) + s["rows"]
+    lines += [
+        "# HELP yid_stage_rows_total Rows produced per pipeline stage.",
+        "# TYPE yid_stage_rows_total counter",
+    ]
+    for (kind, name, tenant), n in sorted(rows.items()):
+        labels = _labels(kind=kind, name=name, **_tenant_field(tenant))
+        lines.append(f"yid_stage_rows_total{labels} {n}")
+
+    lines += [
+        "# HELP yid_storage_request_seconds Storage request latency.",
+        "# TYPE yid_storage_request_seconds histogram",
+    ]
+    for r in data["requests"]:
+        base = _request_labels(r)
+        cumulative = 0
+        for le, n in r["latency_buckets"].items():
+            cumulative += n
+            lines.append(f"yid_storage_request_seconds_bucket{_labels(**base, le=le)} {cumulative}")
+        lines.append(f"yid_storage_request_seconds_sum{_labels(**base)} {r['seconds']}")
+        lines.append(f"yid_storage_request_seconds_count{_labels(**base)} {r['count']}")
+    for metric, field_, help_ in (
+        ("yid_storage_request_errors_total", "errors", "Failed storage requests."),
+        ("yid_storage_bytes_in_total", "bytes_in", "Bytes downloaded from storage."),
+        ("yid_storage_bytes_out_total", "bytes_out", "Bytes uploaded to storage."),
+    ):
+        lines += [f"# HELP {metric} {help_}", f"# TYPE {metric} counter"]
+        for r in data["requests"]:
+            lines.append(f"{metric}{_labels(**_request_labels(r))} {r[field_]}")
+
+    if data.get("publish_latency"):
+        lines += [
+            "# HELP yid_publish_latency_seconds Time from a file's upload to the inbox to its data "
+            "being on the website.",
+            "# TYPE yid_publish_latency_seconds histogram",
+        ]
+    for p in data.get("publish_latency", []):
+        base = dict(source=p["source"], **_tenant_field(p.get("tenant", "")))
+        cumulative = 0
+        for le, n in p["latency_buckets"].items():
+            cumulative += n
+            lines.append(f"yid_publish_latency_seconds_bucket{_labels(**base, le=le)} {cumulative}")
+        lines.append(f"yid_publish_latency_seconds_sum{_labels(**base)} {p['seconds']}")
+        lines.append(f"yid_publish_latency_seconds_count{_labels(**base)} {p['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _request_labels(r: dict) -> dict:
+    return dict(
+        bucket=r["bucket"], operation=r["operation"], prefix=r["prefix"],
+        **_tenant_field(r.get("tenant", "")),
+    )
+
+
+def _labels(**labels: str) -> str:
+    escaped = (f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_reports(metrics_dir: str) -> None:
+    """Write run_report.json and pipeline.prom into metrics_dir (atomically, for textfile
+    collectors)."""
+    data = report()
+    if not data:
+        return
+    out = Path(metrics_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    _write_atomic(out / "run_report.json", json.dumps(data, indent=2))
+    _write_atomic(out / "pipeline.prom", prometheus_text(data))
+    print(f"metrics → {out}/run_report.json, {out}/pipeline.prom")
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
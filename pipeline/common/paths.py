@@ -1,5 +1,22 @@
+"""
+Storage keys for every object the pipeline reads and writes.
+
+In batch mode (pipeline.batch) each tenant's keys live under tenants/{name}/, set
+for the current thread or task with tenant_scope(name). Outside a scope keys are
+unprefixed, as in a single-user run.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from enum import StrEnum
 
+TENANTS_PREFIX = "tenants/"
+
+_tenant: ContextVar[str] = ContextVar("tenant", default="")
+
 
 class Source(StrEnum):
     FITBIT           = "fitbit"
@@ -37,13 +54,65 @@ class Table(StrEnum):
     DAILY_MACOS_SCREENTIME     = "daily_macos_screentime"
     DAILY_STRONG_WORKOUTS      = "daily_strong_workouts"
 
+
+@contextmanager
+def tenant_scope(name: str) -> Iterator[None]:
+    """Prefix every key constructed inside the block with tenants/{name}/."""
+    token = _tenant.set(name)
+    try:
+        yield
+    finally:
+        _tenant.reset(token)
+
+
+def current_tenant() -> str:
+    return _tenant.get()
+
+
+def split_tenant(key: str) -> tuple[str, str]:
+    """Split tenants/{name}/rest into (name, rest); ("", key) for an unprefixed key."""
+    if key.startswith(TENANTS_PREFIX):
+        tenant, _, rest = key.removeprefix(TENANTS_PREFIX).partition("/")
+        return tenant, rest
+    return "", key
+
+
+def _scoped(key: str) -> str:
+    tenant = _tenant.get()
+    return f"{TENANTS_PREFIX}{tenant}/{key}" if tenant else key
+
+
 def construct_inbox_path(name: str) -> str:
-    return f"inbox/{name}"
+    return _scoped(f"inbox/{name}")
+
+
+def construct_inbox_prefix() -> str:
+    return _scoped("inbox/")
 
 
 def construct_archive_path(name: str) -> str:
-    return f"archive/{name}"
+    return _scoped(f"archive/{name}")
+
+
+def construct_compacted_path(name: str) -> str:
+    return _scoped(f"compacted/{name}.parquet")
 
 
 def construct_table_path(name: str) -> str:
-    return f"tables/{name}.parquet"
+    return _scoped(f"tables/{name}.parquet")
+
+
+def construct_tables_prefix() -> str:
+    return _scoped("tables/")
+
+
+def construct_meta_path(name: str) -> str:
+    # Meta keys are often derived from another key (e.g. an archive prefix), which
+    # already names its tenant; keep that one rather than prefixing twice
+    tenant, name = split_tenant(name)
+    return f"{TENANTS_PREFIX}{tenant}/meta/{name}" if tenant else _scoped(f"meta/{name}")
+
+
+def construct_web_path(name: str) -> str:
+    """Key in the web bucket. Paths inside index.json stay relative to it."""
+    return _scoped(name)
@@ -0,0 +1,240 @@
+"""
+Per-stage profiling for pipeline runs (--profile on pipeline.main and the sync scripts).
+
+Each job or source runs under its own profiler and writes to the profile directory:
+  {kind}-{name}.pstats   cprofile mode: deterministic; open with snakeviz or flameprof
+  {kind}-{name}.folded   sample mode: collapsed stacks for flamegraph.pl / speedscope
+  summary.json           wall time and peak RSS per stage, plus tracemalloc's top
+                         allocators with PROFILE_MEMORY
+
+Scope is PROFILE_SCOPE (comma-separated job/source names, parsed like JOBS_TO_RUN);
+empty profiles every job. Stages don't nest: a source inside a profiled job is
+covered by the job's profile. tracemalloc slows allocation-heavy code several-fold,
+so it only runs when PROFILE_MEMORY is set.
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from typing import Literal
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ProfileMode = Literal["cprofile", "sample"]
+
+_SAMPLE_INTERVAL = 0.005   # seconds between stack samples
+_TOP_ALLOCATORS = 15
+
+
+class _Profiler:
+    def __init__(self, out_dir: Path, mode: ProfileMode, scope: list[str], memory: bool) -> None:
+        self.out_dir = out_dir
+        self.mode = mode
+        self.scope = scope
+        self.memory = memory
+        self.active = False
+        self.stages: list[dict] = []
+
+
+_profiler: _Profiler | None = None
+
+
+def add_argument(parser: argparse.ArgumentParser) -> None:
+    """Add --profile [cprofile|sample] to a script's argument parser."""
+    parser.add_argument(
+        "--profile", nargs="?", const="cprofile", choices=["cprofile", "sample"],
+        help="profile each job/source (scope with PROFILE_SCOPE); cprofile is deterministic, "
+             "sample is low-overhead",
+    )
+
+
+def enable(
+    out_dir: str | Path,
+    mode: ProfileMode = "cprofile",
+    scope: list[str] | None = None,
+    memory: bool = False,
+) -> None:
+    global _profiler
+    path = Path(out_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    _profiler = _Profiler(path, mode, scope or [], memory)
+
+
+def enabled() -> bool:
+    return _profiler is not None
+
+
+class _NullStage:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc) -> None:
+        return None
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(kind: str, name: str):
+    """Profile a job or source if it is in scope and no enclosing stage is already profiled."""
+    p = _profiler
+    if p is None or p.active:
+        return _NULL_STAGE
+    if p.scope and str(name) not in p.scope:
+        return _NULL_STAGE
+    if not p.scope and kind != "job":
+        return _NULL_STAGE
+    return _Stage(p, kind, str(name))
+
+
+class _Stage:
+    def __init__(self, profiler: _Profiler, kind: str, name: str) -> None:
+        self.p = profiler
+        self.kind = kind
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.p.active = True
+        reset_peak_rss()
+        if self.p.memory:
+            tracemalloc.start()
+        self.profile = cProfile.Profile() if self.p.mode == "cprofile" else _Sampler()
+        self.t0 = time.perf_counter()
+        self.profile.enable()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.profile.disable()
+        seconds = time.perf_counter() - self.t0
+        traced = _traced_memory() if self.p.memory else None
+        self.p.active = False
+
+        stem = self.p.out_dir / f"{self.kind}-{self.name}"
+        if isinstance(self.profile, cProfile.Profile):
+            output = stem.with_suffix(".pstats")
+            self.profile.dump_stats(output)
+        else:
+            output = stem.with_suffix(".folded")
+            output.write_text(self.profile.folded())
+
+        entry = {
+            "kind": self.kind,
+            "name": self.name,
+            "status": "failed" if exc_type is not None else "ok",
+            "seconds": round(seconds, 3),
+            "peak_rss_bytes": peak_rss(),
+            **(traced or {}),
+            "profile": output.name,
+        }
+        self.p.stages.append(entry)
+        traced_peak = f", traced peak {_mib(traced['traced_peak_bytes'])}" if traced else ""
+        print(
+            f"  profiled {self.kind} {self.name}: {seconds:.2f}s, "
+            f"peak RSS {_mib(entry['peak_rss_bytes'])}{traced_peak} → {output}"
+        )
+
+
+def _traced_memory() -> dict:
+    """Stop tracemalloc and return its peak and top allocators for the stage."""
+    snapshot = tracemalloc.take_snapshot()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    top = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ]).statistics("lineno")[:_TOP_ALLOCATORS]
+    return {
+        "traced_peak_bytes": traced_peak,
+        "top_allocators": [
+            {
+                "location": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                "bytes": s.size,
+                "count": s.count,
+            }
+            for s in top
+        ],
+    }
+
+
+def write_summary() -> None:
+    p = _profiler
+    if p is None:
+        return
+    path = p.out_dir / "summary.json"
+    summary = {"mode": p.mode, "scope": p.scope, "memory": p.memory, "stages": p.stages}
+    path.write_text(json.dumps(summary, indent=2))
+    print(f"profiles → {p.out_dir}")
+
+
+# ── Sampling profiler ─────────────────────────────────────────────────────────
+
+class _Sampler:
+    """Samples every thread's stack at a fixed interval and counts collapsed stacks."""
+
+    def __init__(self, interval: float = _SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+
+    def enable(self) -> None:
+        self._thread.start()
+
+    def disable(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    location = f"{Path(code.co_filename).name}:{code.co_firstlineno}"
+                    names.append(f"{code.co_name} ({location})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(names))] += 1
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# ── Peak RSS ──────────────────────────────────────────────────────────────────
+
+def reset_peak_rss() -> None:
+    # Linux only: resets VmHWM so each stage reports its own peak
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def peak_rss() -> int | None:
+    """Peak resident set size in bytes: per stage on Linux, process lifetime elsewhere."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _mib(n: int | None) -> str:
+    return "?" if n is None else f"{n / 1024**2:.1f} MiB"
@@ -4,92 +4,143 @@ Cloudflare R2 client and all storage operations for the pipeline.
 
 from __future__ import annotations
 
+import csv
+import hashlib
 import io
-from dataclasses import dataclass
+import json
+import shutil
+import tempfile
+from collections import Counter
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from copy import deepcopy
+from dataclasses import dataclass, field
 from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
 from typing import Literal
 
-import boto3
 import polars as pl
-from botocore.config import Config as BotocoreConfig
-from botocore.exceptions import ClientError
 
+from pipeline.common import metrics, paths
 from pipeline.common.config import PipelineConfig
+from pipeline.common.storage import ObjectInfo, Storage, make_storage
+
+_MAX_WORKERS = 16
+_HASH_CHUNK_SIZE = 8 * 1024**2
 
 
 @dataclass
 class R2Client:
-    client: object  # boto3 S3 client
+    storage: Storage  # backend bound to bucket (see pipeline.common.storage)
     bucket: str
     public_url: str
-
-
-def _boto_client(config: PipelineConfig):
-    return boto3.client(
-        "s3",
-        endpoint_url=config.endpoint_url,
-        aws_access_key_id=config.secrets.r2_access_key_id,
-        aws_secret_access_key=config.secrets.r2_secret_access_key,
-        config=BotocoreConfig(signature_version="s3v4"),
-        region_name="auto",
-    )
+    cache: dict = field(default_factory=dict, repr=False)  # per-run memo of manifests and months
 
 
 def make_client(config: PipelineConfig) -> R2Client:
-    return R2Client(client=_boto_client(config), bucket=config.r2_bucket_name, public_url="")
+    return _make(config, config.r2_bucket_name)
 
 
 def make_web_client(config: PipelineConfig) -> R2Client:
-    return R2Client(client=_boto_client(config), bucket=config.web_bucket_name, public_url="")
+    return _make(config, config.web_bucket_name)
+
+
+def _make(config: PipelineConfig, bucket: str) -> R2Client:
+    storage = metrics.instrument(make_storage(config, bucket), bucket)
+    return R2Client(storage=storage, bucket=bucket, public_url="")
 
 
 # ── Low-level helpers ─────────────────────────────────────────────────────────
 
 def exists(r2: R2Client, key: str) -> bool:
-    try:
-        r2.client.head_object(Bucket=r2.bucket, Key=key)  # type: ignore[attr-defined]
-        return True
-    except ClientError:
-        return False
+    return r2.storage.head(key) is not None
+
+
+def list_keys(r2: R2Client, prefix: str, start_after: str = "") -> list[str]:
+    return list(iter_keys(r2, prefix, start_after))
 
 
-def list_keys(r2: R2Client, prefix: str) -> list[str]:
-    keys: list[str] = []
-    paginator = r2.client.get_paginator("list_objects_v2")  # type: ignore[attr-defined]
-    for page in paginator.paginate(Bucket=r2.bucket, Prefix=prefix):
-        for obj in page.get("Contents", []):
-            keys.append(obj["Key"])
-    return keys
+def iter_keys(r2: R2Client, prefix: str, start_after: str = "") -> Iterator[str]:
+    """Yield keys under prefix in lexicographic order, fetching pages lazily.
+
+    Stopping the iteration early stops paging, so callers can end a range scan
+    without listing the rest of the prefix.
+    """
+    for obj in iter_objects(r2, prefix, start_after):
+        yield obj.key
+
+
+def iter_objects(r2: R2Client, prefix: str, start_after: str = "") -> Iterator[ObjectInfo]:
+    """Like iter_keys, but yields the listing entries (key, size, etag)."""
+    return r2.storage.list(prefix, start_after)
 
 
 def download_bytes(r2: R2Client, key: str) -> bytes:
-    resp = r2.client.get_object(Bucket=r2.bucket, Key=key)  # type: ignore[attr-defined]
-    return resp["Body"].read()
+    return r2.storage.get(key)
+
 
+def download_file(r2: R2Client, key: str, path: Path) -> None:
+    """Stream an object to a local file without holding it in memory."""
+    with closing(r2.storage.open(key)) as body, open(path, "wb") as f:
+        shutil.copyfileobj(body, f)
 
-def upload_bytes(r2: R2Client, key: str, data: bytes, content_type: str = "application/octet-stream") -> None:
-    r2.client.put_object(Bucket=r2.bucket, Key=key, Body=data, ContentType=content_type)  # type: ignore[attr-defined]
+
+def head(r2: R2Client, key: str) -> ObjectInfo | None:
+    """Return the object's size, ETag and metadata, or None if it doesn't exist."""
+    return r2.storage.head(key)
+
+
+def upload_bytes(
+    r2: R2Client,
+    key: str,
+    data: bytes,
+    content_type: str = "application/octet-stream",
+    content_encoding: str | None = None,
+    cache_control: str | None = None,
+    metadata: dict[str, str] | None = None,
+    if_none_match: bool = False,
+    if_match: str | None = None,
+) -> str:
+    """Upload data and return its ETag. if_none_match / if_match make the put
+    conditional (see pipeline.common.storage); a failed condition raises PreconditionFailed."""
+    return r2.storage.put(
+        key, data, content_type, content_encoding, cache_control, metadata, if_none_match, if_match,
+    )
+
+
+def upload_file(r2: R2Client, key: str, path: Path) -> None:
+    """Upload a local file, streaming it rather than reading it into memory."""
+    r2.storage.put_file(key, path)
+
+
+def delete(r2: R2Client, key: str) -> None:
+    r2.storage.delete(key)
 
 
 def move(r2: R2Client, src: str, dst: str) -> None:
     """Copy then delete (R2 has no atomic rename)."""
-    r2.client.copy_object(  # type: ignore[attr-defined]
-        Bucket=r2.bucket,
-        CopySource={"Bucket": r2.bucket, "Key": src},
-        Key=dst,
-    )
-    r2.client.delete_object(Bucket=r2.bucket, Key=src)  # type: ignore[attr-defined]
+    r2.storage.copy(src, dst)
+    r2.storage.delete(src)
+
+
+def delete_many(r2: R2Client, keys: list[str]) -> None:
+    """Delete keys in as few requests as the backend allows (missing keys are ignored)."""
+    r2.storage.delete_many(keys)
+
+
+def copy(r2: R2Client, src: str, dst: str, size: int) -> None:
+    """Server-side copy; size lets the S3 backend switch to a multipart copy for huge objects."""
+    r2.storage.copy(src, dst, size)
 
 
 # ── Inbox / archive helpers ───────────────────────────────────────────────────
 
 def flush_inbox(r2: R2Client, tag: str, inbox_key: str, archive_key: str) -> None:
     """Move any inbox files to the archive."""
-    keys = list_keys(r2, inbox_key + "/")
-    if not keys:
-        return
-    archive_inbox(r2, inbox_key, archive_key)
-    print(f"[{tag}] archived {len(keys)} file(s)")
+    archived = archive_inbox(r2, inbox_key, archive_key)
+    if archived:
+        print(f"[{tag}] archived {archived} file(s)")
 
 
 def get_archive_keys(
@@ -99,34 +150,109 @@ def get_archive_keys(
     extension: str,
     start: date | None = None,
     end: date | None = None,
+    incremental: bool = True,
 ) -> list[str]:
     """Return archived files to process, filtered by extension and date range.
 
-    start defaults to the latest date in parquet_key (for incremental processing).
+    With incremental=True, start is raised to the latest date in parquet_key so only
+    files archived since the last run are processed.
     extension should include the dot, e.g. ".zip", ".json", ".csv".
+    Files marked as superseded in the archive index are skipped, since every record
+    they hold is also in another archived file.
     """
-    if start is None:
-        start = latest_date(r2, parquet_key)
+    if incremental:
+        latest = latest_date(r2, parquet_key)
+        if latest is not None and (start is None or latest > start):
+            start = latest
+    superseded = load_archive_index(r2, archive_key)["superseded"]
     return [
         k for k in list_archive_keys(r2, archive_key, start=start, end=end)
-        if k.lower().endswith(extension)
+        if k.lower().endswith(extension) and k not in superseded
     ]
 
 
-def archive_inbox(r2: R2Client, inbox_key: str, archive_prefix: str) -> None:
-    """Move all files from inbox_key/ to archive_prefix/{date}/{filename}."""
+def archive_inbox(r2: R2Client, inbox_key: str, archive_prefix: str) -> int:
+    """Move all files from inbox_key/ to archive_prefix/{date}/{filename}.
+
+    Files byte-identical to an already archived file are deleted from the inbox
+    instead of archived again. Returns the number of files archived.
+
+    The move is planned up front and the plan stored under meta/, then copies run
+    concurrently and the inbox is cleared with batched deletes. If a run is
+    interrupted, the next call finishes the stored plan before looking at the inbox.
+    """
+    plan_key = _archive_plan_key(archive_prefix)
+    if exists(r2, plan_key):
+        plan = json.loads(download_bytes(r2, plan_key))
+        print(f"  resuming archive of {len(plan['copies'])} file(s)")
+        _run_archive_plan(r2, archive_prefix, plan)
+
+    plan = _plan_archive(r2, inbox_key, archive_prefix)
+    if not plan["copies"] and not plan["drops"]:
+        return 0
+    upload_bytes(r2, plan_key, json.dumps(plan).encode(), "application/json")
+    _run_archive_plan(r2, archive_prefix, plan)
+    return len(plan["copies"])
+
+
+def _plan_archive(r2: R2Client, inbox_key: str, archive_prefix: str) -> dict:
     now = datetime.now(tz=timezone.utc)
     iso_date = now.date().isoformat()
     timestamp = now.strftime("%Y-%m-%d_%H%M%S")
-    for key in list_keys(r2, inbox_key + "/"):
-        if key.endswith("/.keep"):
+    objects = [o for o in iter_objects(r2, inbox_key + "/") if not o.key.endswith("/.keep")]
+    with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as pool:
+        fingerprints = list(pool.map(lambda o: _fingerprint(r2, o.key), objects))
+
+    index = deepcopy(load_archive_index(r2, archive_prefix))  # committed with the plan
+    archived_hashes = {entry["sha256"]: k for k, entry in index["files"].items()}
+    copies: list[dict] = []
+    drops: list[str] = []
+    for obj, (digest, records) in zip(objects, fingerprints):
+        key = obj.key
+        if digest in archived_hashes:
+            drops.append(key)
+            print(f"  skipped {key} (identical to {archived_hashes[digest]})")
             continue
         original = key.rsplit("/", 1)[-1].rsplit(".", 1)
         stem, ext = (original[0], original[1]) if len(original) == 2 else (original[0], "")
         filename = f"{stem}_{timestamp}.{ext}" if ext else f"{stem}_{timestamp}"
         dst = f"{archive_prefix}/{iso_date}/{filename}"
-        move(r2, key, dst)
-        print(f"  archived → {dst}")
+        copies.append({"src": key, "dst": dst, "size": obj.size})
+        archived_hashes[digest] = dst
+        _add_to_index(index, dst, digest, records)
+    return {"copies": copies, "drops": drops, "copied": False, "index": index}
+
+
+def _run_archive_plan(r2: R2Client, archive_prefix: str, plan: dict) -> None:
+    """Copy, update the index, then delete the inbox files. Safe to re-run after a crash."""
+    plan_key = _archive_plan_key(archive_prefix)
+    if not plan["copied"]:
+        with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as pool:
+            list(pool.map(lambda c: copy(r2, c["src"], c["dst"], c["size"]), plan["copies"]))
+        for c in plan["copies"]:
+            print(f"  archived → {c['dst']}")
+        store_archive_index(r2, archive_prefix, plan["index"])
+        plan["copied"] = True
+        upload_bytes(r2, plan_key, json.dumps(plan).encode(), "application/json")
+
+    delete_many(r2, [c["src"] for c in plan["copies"]] + plan["drops"])
+    delete(r2, plan_key)
+
+
+def _fingerprint(r2: R2Client, key: str) -> tuple[str, RecordFingerprints | None]:
+    """Return (sha256, record fingerprints) for an object, streaming non-record payloads."""
+    if key.lower().endswith(_RECORD_EXTENSIONS):
+        data = download_bytes(r2, key)
+        return content_hash(data), record_fingerprints(key, data)
+    digest = hashlib.sha256()
+    with closing(r2.storage.open(key)) as body:
+        while chunk := body.read(_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest(), None
+
+
+def _archive_plan_key(archive_prefix: str) -> str:
+    return paths.construct_meta_path(f"{archive_prefix}/archive_plan.json")
 
 
 def list_archive_keys(
@@ -139,35 +265,290 @@ def list_archive_keys(
 
     Keys follow the pattern: {archive_prefix}/{YYYY-MM-DD}/{filename}
     start/end filter on the folder date (i.e. when the file was archived).
+    ISO folder names sort by date, so the listing starts at the start folder and
+    stops paging once it passes the end folder.
+    Files rolled into a compacted month are listed even if the originals were deleted.
     """
-    all_keys = list_keys(r2, archive_prefix + "/")
+    manifest = load_compaction_manifest(r2, archive_prefix)
+    keys = {k for month in manifest["months"].values() for k in month["files"]}
+
+    start_after = f"{archive_prefix}/{start.isoformat()}" if start else ""
+    for key in iter_keys(r2, archive_prefix + "/", start_after):
+        if end and key[len(archive_prefix) + 1:].split("/", 1)[0] > end.isoformat():
+            break
+        keys.add(key)
+
     if not start and not end:
-        return all_keys
+        return sorted(keys)
+    return sorted(k for k in keys if _in_date_range(k, start, end))
 
-    filtered = []
-    for key in all_keys:
-        parts = key.split("/")
-        if len(parts) < 3:
-            continue
+
+def list_archive_keys_many(
+    r2: R2Client,
+    archive_prefixes: list[str],
+    start: date | None = None,
+    end: date | None = None,
+    max_workers: int = 8,
+) -> dict[str, list[str]]:
+    """Run list_archive_keys for several archive prefixes in parallel."""
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(
+            lambda p: list_archive_keys(r2, p, start=start, end=end), archive_prefixes,
+        )
+        return dict(zip(archive_prefixes, results))
+
+
+def _in_date_range(key: str, start: date | None, end: date | None) -> bool:
+    parts = key.split("/")
+    if len(parts) < 3:
+        return False
+    try:
+        folder_date = date.fromisoformat(parts[-2])
+    except ValueError:
+        return False
+    if start and folder_date < start:
+        return False
+    if end and folder_date > end:
+        return False
+    return True
+
+
+def read_archive(r2: R2Client, key: str) -> bytes:
+    """Download an archived file, reading it from its compacted month parquet if it has one."""
+    month = _compacted_month(r2, key)
+    if month is None:
+        return download_bytes(r2, key)
+
+    # Each archived file is its own row group, so the scan loads just that file's payload.
+    # Keys are processed in date order: a remote month is downloaded to disk once for all of them.
+    path = r2.storage.local_path(month["key"])
+    if path is None:
+        cached_key, tmp = r2.cache.get("compacted", (None, None))
+        if cached_key != month["key"] or tmp is None:
+            # The previous month's directory is removed when it is garbage collected
+            tmp = tempfile.TemporaryDirectory(prefix="yid-compacted-")
+            download_file(r2, month["key"], Path(tmp.name) / "month.parquet")
+            r2.cache["compacted"] = (month["key"], tmp)
+        path = Path(tmp.name) / "month.parquet"
+    payload = pl.scan_parquet(path).filter(pl.col("key") == key).select("payload").collect()
+    return payload["payload"][0]
+
+
+def download_archive(r2: R2Client, key: str, path: Path) -> None:
+    """Write an archived file to path, streaming it unless it's in a compacted month
+    (whose parquet row group is read whole)."""
+    if _compacted_month(r2, key) is None:
+        download_file(r2, key, path)
+    else:
+        path.write_bytes(read_archive(r2, key))
+
+
+def _compacted_month(r2: R2Client, key: str) -> dict | None:
+    archive_prefix, folder, _ = key.rsplit("/", 2)
+    month = load_compaction_manifest(r2, archive_prefix)["months"].get(folder[:7])
+    return month if month is not None and key in month["files"] else None
+
+
+# ── Compaction manifest ───────────────────────────────────────────────────────
+#
+# meta/{archive_prefix}/compaction.json records which months were rolled into a
+# compacted parquet and which archive keys each one holds:
+#   {"months": {"2026-01": {"key": "compacted/fitbit/2026-01.parquet",
+#                           "files": [archive_key, ...], "originals_deleted": false}}}
+
+def load_compaction_manifest(r2: R2Client, archive_prefix: str) -> dict:
+    cache_key = ("compaction", archive_prefix)
+    if cache_key not in r2.cache:
+        key = _compaction_manifest_key(archive_prefix)
+        r2.cache[cache_key] = (
+            json.loads(download_bytes(r2, key)) if exists(r2, key) else {"months": {}}
+        )
+    return r2.cache[cache_key]
+
+
+def store_compaction_manifest(r2: R2Client, archive_prefix: str, manifest: dict) -> None:
+    key = _compaction_manifest_key(archive_prefix)
+    upload_bytes(r2, key, json.dumps(manifest).encode(), "application/json")
+    r2.cache[("compaction", archive_prefix)] = manifest
+
+
+def _compaction_manifest_key(archive_prefix: str) -> str:
+    return paths.construct_meta_path(f"{archive_prefix}/compaction.json")
+
+
+# ── Archive index ─────────────────────────────────────────────────────────────
+#
+# meta/{archive_prefix}/index.json tracks every archived file:
+#   {"files":      {archive_key: {"sha256": ..., "chunks": [digest, ...],
+#                                  "edges": [fingerprint, ...]}},
+#    "superseded": {archive_key: [covering_key, ...]}}
+# The records of a JSON/CSV file are cut into chunks where a record's hash has its low
+# _CHUNK_BITS bits clear (or after _MAX_CHUNK records), so adding or removing a record only
+# changes the chunk around it, and each whole chunk is kept as one digest. The records
+# before the first cut and after the last are kept one fingerprint each ("edges"): a file
+# that grew at either end holds them in a longer chunk. Chunks and edges are only kept
+# for files that are not yet superseded.
+
+_RECORD_EXTENSIONS = (".json", ".csv")
+_CHUNK_BITS = 6     # about 64 records per chunk
+_MAX_CHUNK = 256
+
+
+@dataclass(frozen=True)
+class RecordFingerprints:
+    records: frozenset[str]   # every record; only held while the file is being archived
+    chunks: frozenset[str]
+    edges: frozenset[str]
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def record_fingerprints(key: str, data: bytes) -> RecordFingerprints | None:
+    """Fingerprint the records of a JSON array or CSV file, or None for other payloads.
+
+    Repeated records (and chunks) get distinct fingerprints by occurrence, so
+    containment between two files respects duplicate rows.
+    """
+    name = key.lower()
+    if name.endswith(".json"):
+        payload = json.loads(data)
+        if not isinstance(payload, list):
+            return None
+        records = [json.dumps(r, sort_keys=True) for r in payload]
+    elif name.endswith(".csv"):
+        text = data.decode("utf-8", errors="replace")
+        if not text.strip():
+            return RecordFingerprints(frozenset(), frozenset(), frozenset())
+        # Strong exports are ";"-separated, and a quoted field (workout notes) can span lines
         try:
-            folder_date = date.fromisoformat(parts[-2])
-        except ValueError:
-            continue
-        if start and folder_date < start:
-            continue
-        if end and folder_date > end:
-            continue
-        filtered.append(key)
-    return filtered
+            delimiter = csv.Sniffer().sniff(text.partition("\n")[0], delimiters=",;\t").delimiter
+        except csv.Error:  # a single column
+            delimiter = ","
+        header, *rows = csv.reader(io.StringIO(text, newline=""), delimiter=delimiter)
+        records = [json.dumps([header, row]) for row in rows if any(field.strip() for field in row)]
+    else:
+        return None
+
+    seen: Counter[str] = Counter()
+    seen_chunks: Counter[str] = Counter()
+    fingerprints: set[str] = set()
+    chunks: set[str] = set()
+    edges: set[str] = set()
+    current: list[str] = []
+    chunk = hashlib.blake2b(digest_size=8)
+    cut = False
+    for record in records:
+        seen[record] += 1
+        fingerprint = _digest(f"{seen[record]}:{record}")
+        fingerprints.add(fingerprint)
+        current.append(fingerprint)
+        record_hash = hashlib.blake2b(record.encode(), digest_size=8).digest()
+        chunk.update(record_hash)
+        if record_hash[0] & ((1 << _CHUNK_BITS) - 1) == 0 or len(current) >= _MAX_CHUNK:
+            if cut:
+                seen_chunks[chunk.hexdigest()] += 1
+                chunks.add(_digest(f"{seen_chunks[chunk.hexdigest()]}:{chunk.hexdigest()}"))
+            else:
+                edges.update(current)
+            current, chunk, cut = [], hashlib.blake2b(digest_size=8), True
+    edges.update(current)
+    return RecordFingerprints(frozenset(fingerprints), frozenset(chunks), frozenset(edges))
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
+
+
+def load_archive_index(r2: R2Client, archive_prefix: str) -> dict:
+    cache_key = ("archive_index", archive_prefix)
+    if cache_key not in r2.cache:
+        key = _archive_index_key(archive_prefix)
+        index = (
+            json.loads(download_bytes(r2, key)) if exists(r2, key)
+            else {"files": {}, "superseded": {}}
+        )
+        for entry in index["files"].values():
+            if "records" in entry:  # written before chunking: every record is an edge
+                entry["chunks"], entry["edges"] = [], entry.pop("records")
+        r2.cache[cache_key] = index
+    return r2.cache[cache_key]
+
+
+def store_archive_index(r2: R2Client, archive_prefix: str, index: dict) -> None:
+    body = json.dumps(index).encode()
+    upload_bytes(r2, _archive_index_key(archive_prefix), body, "application/json")
+    r2.cache[("archive_index", archive_prefix)] = index
+
+
+def _archive_index_key(archive_prefix: str) -> str:
+    return paths.construct_meta_path(f"{archive_prefix}/index.json")
+
+
+def _add_to_index(
+    index: dict, key: str, digest: str, fingerprints: RecordFingerprints | None,
+) -> None:
+    """Register a newly archived file and update which files are superseded.
+
+    An older file is superseded when all its chunks are chunks of the new file and all
+    its edges are records of it. The new file is superseded when its chunks and edges are
+    all among those of the files it overlaps; a file whose records only match loosely
+    (reordered, or cut differently) is kept, which costs a re-read but never loses rows.
+    """
+    files: dict = index["files"]
+    superseded: dict = index["superseded"]
+    files[key] = {"sha256": digest}
+    if fingerprints is None:
+        return
+
+    active = {
+        k: (set(entry["chunks"]), set(entry["edges"])) for k, entry in files.items()
+        if k != key and k not in superseded and "chunks" in entry
+    }
+    for old_key, (chunks, edges) in list(active.items()):
+        if chunks <= fingerprints.chunks and edges <= fingerprints.records:
+            superseded[old_key] = [key]
+            del files[old_key]["chunks"], files[old_key]["edges"]
+            del active[old_key]
+
+    covering = [
+        k for k, (chunks, edges) in active.items()
+        if chunks & fingerprints.chunks or edges & fingerprints.records
+    ]
+    held_chunks = set().union(*(active[k][0] for k in covering))
+    held_edges = set().union(*(active[k][1] for k in covering))
+    if fingerprints.chunks <= held_chunks and fingerprints.edges <= held_edges:
+        superseded[key] = covering
+    else:
+        files[key]["chunks"] = sorted(fingerprints.chunks)
+        files[key]["edges"] = sorted(fingerprints.edges)
 
 
 # ── Parquet helpers ───────────────────────────────────────────────────────────
 
+def read_parquet(r2: R2Client, key: str) -> pl.DataFrame:
+    """Read a Parquet object, memory-mapping it in place when the backend has a local file."""
+    path = r2.storage.local_path(key)
+    if path is not None:
+        return pl.read_parquet(path, memory_map=True)
+    return pl.read_parquet(io.BytesIO(download_bytes(r2, key)))
+
+
+def scan_parquet(r2: R2Client, key: str) -> pl.LazyFrame:
+    """Lazily scan a Parquet object: straight from disk when the backend has a local file,
+    otherwise from a single download."""
+    path = r2.storage.local_path(key)
+    if path is not None:
+        return pl.scan_parquet(path)
+    return pl.scan_parquet(io.BytesIO(download_bytes(r2, key)))
+
+
 def latest_date(r2: R2Client, key: str) -> date | None:
     """Return max(date) - 1 day from a Parquet file, or None if it doesn't exist."""
     if not exists(r2, key):
         return None
-    df = pl.read_parquet(io.BytesIO(download_bytes(r2, key)))
+    df = read_parquet(r2, key)
     if df.is_empty() or "date" not in df.columns:
         return None
     max_val = df["date"].max()
@@ -182,15 +563,26 @@ def load_parquet(
     start: date | None = None,
     end: date | None = None,
 ) -> pl.DataFrame | None:
-    """Download a Parquet file and return it filtered by date, or None if it doesn't exist."""
+    """Download a Parquet file and return it filtered by date, or None if it doesn't exist.
+
+    The date filter is pushed into the scan, so row groups outside the window are
+    skipped using their statistics.
+    """
     if not exists(r2, key):
         return None
-    df = pl.read_parquet(io.BytesIO(download_bytes(r2, key)))
-    if start:
-        df = df.filter(pl.col("date") >= start)
-    if end:
-        df = df.filter(pl.col("date") <= end)
-    return df
+    if start is None and end is None:
+        return read_parquet(r2, key)
+    return scan_parquet(r2, key).filter(in_date_window(start, end)).collect()
+
+
+def in_date_window(start: date | None, end: date | None, column: str = "date") -> pl.Expr:
+    """True for rows whose date falls within [start, end]; either bound may be None."""
+    expr = pl.lit(True)
+    if start is not None:
+        expr = expr & (pl.col(column) >= start)
+    if end is not None:
+        expr = expr & (pl.col(column) <= end)
+    return expr
 
 
 def store_parquet(
@@ -201,15 +593,26 @@ def store_parquet(
     dedup_cols: list[str] | None = None,
     keep: Literal["last", "first", "any", "none"] = "last",
     overwrite: bool = False,
+    window: tuple[date | None, date | None] | None = None,
 ) -> None:
-    """Write df to a Parquet file on R2, merging with any existing data by default."""
-    if not overwrite and exists(r2, key):
-        existing = pl.read_parquet(io.BytesIO(download_bytes(r2, key)))
+    """Write df to a Parquet file on R2, merging with any existing data by default.
+
+    With window=(start, end), only the rows of df in the window are written: they
+    replace the existing rows whose date falls in the window and the rows outside it
+    are kept as they are.
+    """
+    if window is not None:
+        df = df.filter(in_date_window(*window))
+        if exists(r2, key):
+            outside = read_parquet(r2, key).filter(~in_date_window(*window))
+            df = pl.concat([df, outside], how="diagonal_relaxed")
+    elif not overwrite and exists(r2, key):
+        existing = read_parquet(r2, key)
         df = pl.concat([df, existing])
 
     if dedup_cols:
         df = df.unique(subset=dedup_cols, keep=keep)
-    elif not overwrite:
+    elif not overwrite and window is None:
         df = df.unique(keep=keep)
 
     df = df.sort(sort_col)
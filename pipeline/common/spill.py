@@ -0,0 +1,192 @@
+"""
+Memory-budgeted accumulation of the frames an extractor parses from its archives.
+
+An extractor reads each archived file inside reading(), parses it in chunks of
+at most chunk_rows() rows, adds each chunk and then takes the combined result:
+
+  with spill.SpillBuffer("strong", config.extract_memory_budget, reduce=_longest_per_day) as chunks:
+      for key in keys:
+          data = R2.read_archive(r2, key)
+          with chunks.reading(len(data)):
+              chunks.add_batches(_scan_csv(data))
+      df = chunks.result()
+
+Without a budget each file is parsed whole, the frames stay in memory and are
+reduced once, at the end.
+
+With extract.memory_budget set (EXTRACT_MEMORY_BUDGET), the frames held plus
+the raw bytes of the file being parsed are kept under half the budget; the
+other half is headroom for parsing a chunk. Before a chunk would take them
+over, the frames held so far are reduced to a partial result and written to a
+Parquet file in a temp directory, and result() merges the spill files on
+Polars' streaming engine. A file or a chunk that can't fit on its own raises
+MemoryBudgetExceeded rather than going over.
+
+Sizes are Polars' estimates for frames and the byte length for raw files, so
+Python objects built while parsing a chunk are covered by the headroom, not
+counted exactly. The final table isn't counted either: merging the spill files
+and store_parquet both hold it in memory, so it sets the floor for a large
+extract (about 430 MiB for the 2.16M rows of a 24 MiB Fitbit takeout, against
+137 MiB for parsing it under an 8 MB budget).
+
+reduce has to give the same answer on partial results as on the raw frames (a
+sum or max per key, or the last row per key), so both paths build the same table.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+import polars as pl
+
+Reduce = Callable[[pl.LazyFrame], pl.LazyFrame]
+
+_ROW_BYTES = 64  # assumed width of a row until a frame has been added
+
+
+class MemoryBudgetExceeded(Exception):
+    """A single archived file or chunk doesn't fit in the extract memory budget."""
+
+
+def _identity(lf: pl.LazyFrame) -> pl.LazyFrame:
+    return lf
+
+
+def last_per(*keys: str) -> Reduce:
+    """Keep the last row added for each key, as store_parquet(dedup_cols=keys) does."""
+    return lambda lf: lf.unique(subset=list(keys), keep="last", maintain_order=True)
+
+
+class SpillBuffer:
+    def __init__(self, label: str, budget: int | None, reduce: Reduce = _identity) -> None:
+        self.label = label
+        self.budget = budget
+        self.reduce = reduce
+        self.peak = 0                         # most bytes held at once, frames plus file being read
+        self._frames: list[pl.DataFrame] = []
+        self._held = 0
+        self._reading = 0
+        self._row_bytes: int | None = None    # widest row seen so far
+        self._files: list[Path] = []
+        self._dir: tempfile.TemporaryDirectory | None = None
+
+    def __enter__(self) -> SpillBuffer:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def _limit(self) -> int | None:
+        return None if self.budget is None else self.budget // 2
+
+    def chunk_rows(self) -> int | None:
+        """Rows to parse into one frame, at the widest rows seen so far: an eighth of the
+        budget, or less while a large file is being read."""
+        if self.budget is None:
+            return None
+        room = min(self.budget // 8, (self.budget // 2 - self._reading) // 2)
+        return max(1, room // (self._row_bytes or _ROW_BYTES))
+
+    def batches(self, records: list) -> Iterator[list]:
+        """records in slices of chunk_rows() (at least one slice, even if empty)."""
+        size = self.chunk_rows() or len(records) or 1
+        for start in range(0, max(len(records), 1), size):
+            yield records[start:start + size]
+
+    def add_batches(self, lf: pl.LazyFrame) -> None:
+        """Collect lf in frames of chunk_rows() rows and add each."""
+        size = self.chunk_rows()
+        if size is None:
+            self.add(lf.collect())
+            return
+        added = False
+        for df in lf.collect_batches(chunk_size=size):
+            self.add(df)
+            added = True
+        if not added:  # keep the schema of an empty file
+            self.add(lf.limit(0).collect())
+
+    @contextmanager
+    def reading(self, nbytes: int) -> Iterator[None]:
+        """Count an archived file's raw bytes against the budget while it is parsed."""
+        limit = self._limit
+        if limit is not None:
+            if nbytes > limit:
+                raise MemoryBudgetExceeded(
+                    f"[{self.label}] an archived file of {_size(nbytes)} is over half the "
+                    f"{_size(self.budget)} memory budget; raise EXTRACT_MEMORY_BUDGET"
+                )
+            if self._held + nbytes > limit:
+                self._spill()
+        self._reading = nbytes
+        self.peak = max(self.peak, self._held + nbytes)
+        try:
+            yield
+        finally:
+            self._reading = 0
+
+    def add(self, df: pl.DataFrame) -> None:
+        size = df.estimated_size()
+        if df.height:
+            self._row_bytes = max(self._row_bytes or 0, -(-size // df.height))
+        limit = self._limit
+        if limit is not None:
+            if self._reading + size > limit:
+                raise MemoryBudgetExceeded(
+                    f"[{self.label}] a chunk of {df.height} rows takes {_size(size)}, which with "
+                    f"the file being read is over half the {_size(self.budget)} memory budget; "
+                    f"raise EXTRACT_MEMORY_BUDGET"
+                )
+            if self._held + self._reading + size > limit:
+                self._spill()
+        self._frames.append(df)
+        self._held += size
+        self.peak = max(self.peak, self._held + self._reading)
+
+    def result(self) -> pl.DataFrame:
+        if not self._files:
+            if self.budget is not None:
+                print(
+                    f"[{self.label}] peak {_size(self.peak)} of a {_size(self.budget)} budget, "
+                    f"no spill"
+                )
+            return self.reduce(pl.concat(self._frames, how="diagonal_relaxed").lazy()).collect()
+        if self._frames:
+            self._spill()
+        # Spill files can differ in schema (a column all null in one chunk): a relaxed concat
+        parts = pl.concat([pl.scan_parquet(path) for path in self._files], how="diagonal_relaxed")
+        df = self.reduce(parts).collect(engine="streaming")
+        on_disk = sum(path.stat().st_size for path in self._files)
+        print(
+            f"[{self.label}] merged {len(self._files)} spill file(s) ({_size(on_disk)} on disk), "
+            f"peak {_size(self.peak)} of a {_size(self.budget)} budget"
+        )
+        return df
+
+    def close(self) -> None:
+        self._frames.clear()
+        if self._dir is not None:
+            self._dir.cleanup()
+            self._dir = None
+
+    def _spill(self) -> None:
+        if not self._frames:
+            return
+        if self._dir is None:
+            self._dir = tempfile.TemporaryDirectory(prefix="yid-spill-")
+        path = Path(self._dir.name) / f"{len(self._files):05d}.parquet"
+        # Streamed, so reducing the held frames doesn't need a second copy of them
+        parts = pl.concat([df.lazy() for df in self._frames], how="diagonal_relaxed")
+        self.reduce(parts).sink_parquet(path)
+        self._files.append(path)
+        self._frames.clear()
+        self._held = 0
+
+
+def _size(n: int | None) -> str:
+    n = n or 0
+    return f"{n / 1024**2:.1f} MiB" if n >= 1024**2 else f"{n / 1024:.1f} KiB"
@@ -0,0 +1,539 @@
+"""
+Storage backends behind pipeline.common.r2.
+
+  s3      boto3 against Cloudflare R2 or MinIO (production)
+  local   one directory tree per bucket under storage.local_dir; streaming reads
+          are mmap-backed and parquet files are memory-mapped straight from disk
+  memory  process-wide dicts, for tests and benchmarks
+
+The backend is chosen with storage.backend in config.yaml (or STORAGE_BACKEND).
+Each backend instance is bound to one bucket.
+
+put() can be made conditional, as S3's If-None-Match / If-Match: if_none_match=True
+only creates a new object, if_match=etag only replaces that exact version. A put
+whose condition fails raises PreconditionFailed. pipeline.common.leases builds on this.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import itertools
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import cache
+from pathlib import Path
+from typing import BinaryIO, Protocol
+
+from pipeline.common.config import PipelineConfig
+
+_MAX_WORKERS = 16
+_POOL_CONNECTIONS = 64           # at least; botocore's default is 10
+_DELETE_BATCH_SIZE = 1000
+_MAX_COPY_SIZE = 5 * 1024**3     # CopyObject limit; larger objects need a multipart copy
+_COPY_PART_SIZE = 512 * 1024**2
+
+
+class PreconditionFailed(Exception):
+    """A conditional put() lost: the object already exists, or is no longer the given version."""
+
+
+@dataclass
+class ObjectInfo:
+    key: str
+    size: int
+    etag: str = ""
+    metadata: dict[str, str] = field(default_factory=dict)
+    last_modified: float | None = None  # unix time of the last write
+
+
+class Storage(Protocol):
+    """Object storage for one bucket. Missing keys: head() returns None, get()/open() raise
+    FileNotFoundError."""
+
+    def head(self, key: str) -> ObjectInfo | None: ...
+    def get(self, key: str) -> bytes: ...
+    def open(self, key: str) -> BinaryIO: ...
+    def put(
+        self, key: str, data: bytes, content_type: str = "application/octet-stream",
+        content_encoding: str | None = None, cache_control: str | None = None,
+        metadata: dict[str, str] | None = None,
+        if_none_match: bool = False, if_match: str | None = None,
+    ) -> str: ...  # ETag of the stored object
+    def put_file(self, key: str, path: Path) -> None: ...  # streamed from disk, for large objects
+    def delete(self, key: str) -> None: ...
+    def delete_many(self, keys: list[str]) -> None: ...
+    def copy(self, src: str, dst: str, size: int = 0) -> None: ...
+    def list(self, prefix: str, start_after: str = "") -> Iterator[ObjectInfo]: ...
+    def local_path(self, key: str) -> Path | None: ...
+    def ensure_bucket(self) -> bool: ...
+
+
+def make_storage(config: PipelineConfig, bucket: str) -> Storage:
+    if config.storage_backend == "s3":
+        return S3Storage(_boto_client(config), bucket)
+    if config.storage_backend == "local":
+        return LocalStorage(Path(config.storage_dir), bucket)
+    if config.storage_backend == "memory":
+        return MemoryStorage(bucket)
+    raise ValueError(
+        f"unknown storage backend {config.storage_backend!r} (expected s3, local or memory)"
+    )
+
+
+# ── S3 / R2 ───────────────────────────────────────────────────────────────────
+
+# boto3 takes a few hundred ms to import, so it is only loaded by the s3 backend.
+# One session and one (thread-safe) client per endpoint/credentials are shared by
+# make_client and make_web_client, and by every tenant in batch mode, so they share
+# one connection pool. The pool has a connection for each thread that can use the
+# client at once: config.concurrency units, each running pools of up to
+# _MAX_WORKERS threads (r2's are the same size). S3Storage catches
+# client.exceptions.ClientError rather than importing botocore.exceptions.
+
+def _boto_client(config: PipelineConfig):
+    if not config.endpoint_url:
+        raise ValueError("R2_ENDPOINT_URL is not set (required for the s3 storage backend)")
+    return _shared_client(
+        config.endpoint_url,
+        config.secrets.r2_access_key_id,
+        config.secrets.r2_secret_access_key,
+        max(_POOL_CONNECTIONS, config.concurrency * _MAX_WORKERS),
+    )
+
+
+@cache
+def _boto_session():
+    import boto3
+    return boto3.session.Session()
+
+
+@cache
+def _shared_client(
+    endpoint_url: str, access_key_id: str, secret_access_key: str, pool_connections: int,
+):
+    from botocore.config import Config as BotocoreConfig
+    return _boto_session().client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=access_key_id,
+        aws_secret_access_key=secret_access_key,
+        config=BotocoreConfig(signature_version="s3v4", max_pool_connections=pool_connections),
+        region_name="auto",
+    )
+
+
+class S3Storage:
+    def __init__(self, client, bucket: str) -> None:
+        self.client = client  # boto3 S3 client, also used directly by bucket_setup
+        self.bucket = bucket
+
+    def head(self, key: str) -> ObjectInfo | None:
+        try:
+            resp = self.client.head_object(Bucket=self.bucket, Key=key)
+        except self.client.exceptions.ClientError:
+            return None
+        return ObjectInfo(
+            key, resp.get("ContentLength", 0), resp.get("ETag", ""), resp.get("Metadata", {}),
+            _timestamp(resp),
+        )
+
+    def get(self, key: str) -> bytes:
+        return self.open(key).read()
+
+    def open(self, key: str) -> BinaryIO:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        except self.client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def put(
+        self, key: str, data: bytes, content_type: str = "application/octet-stream",
+        content_encoding: str | None = None, cache_control: str | None = None,
+        metadata: dict[str, str] | None = None,
+        if_none_match: bool = False, if_match: str | None = None,
+    ) -> str:
+        extra: dict = {}
+        if content_encoding:
+            extra["ContentEncoding"] = content_encoding
+        if cache_control:
+            extra["CacheControl"] = cache_control
+        if metadata:
+            extra["Metadata"] = metadata
+        if if_none_match:
+            extra["IfNoneMatch"] = "*"
+        if if_match is not None:
+            extra["IfMatch"] = if_match
+        try:
+            resp = self.client.put_object(
+                Bucket=self.bucket, Key=key, Body=data, ContentType=content_type, **extra,
+            )
+        except self.client.exceptions.ClientError as e:
+            # 409 ConditionalRequestConflict: a concurrent conditional put to the same key
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("PreconditionFailed", "ConditionalRequestConflict", "412", "409"):
+                raise PreconditionFailed(key) from e
+            raise
+        return resp.get("ETag", "")
+
+    def put_file(self, key: str, path: Path) -> None:
+        """Upload in parts (boto3's managed transfer), reading the file as it goes."""
+        self.client.upload_file(str(path), self.bucket, key)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def delete_many(self, keys: list[str]) -> None:
+        """Delete keys in DeleteObjects batches of up to 1000 (missing keys are ignored)."""
+        for i in range(0, len(keys), _DELETE_BATCH_SIZE):
+            batch = keys[i:i + _DELETE_BATCH_SIZE]
+            self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True},
+            )
+
+    def copy(self, src: str, dst: str, size: int = 0) -> None:
+        """Server-side copy, using a multipart copy above the single CopyObject size limit."""
+        source = {"Bucket": self.bucket, "Key": src}
+        if size <= _MAX_COPY_SIZE:
+            self.client.copy_object(Bucket=self.bucket, CopySource=source, Key=dst)
+            return
+
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=dst)["UploadId"]
+        ranges = [
+            (start, min(start + _COPY_PART_SIZE, size) - 1)
+            for start in range(0, size, _COPY_PART_SIZE)
+        ]
+
+        def copy_part(part: tuple[int, tuple[int, int]]) -> dict:
+            number, (first, last) = part
+            resp = self.client.upload_part_copy(
+                Bucket=self.bucket, Key=dst, UploadId=upload_id, PartNumber=number,
+                CopySource=source, CopySourceRange=f"bytes={first}-{last}",
+            )
+            return {"PartNumber": number, "ETag": resp["CopyPartResult"]["ETag"]}
+
+        try:
+            with ThreadPoolExecutor(max_workers=_MAX_WORKERS) as pool:
+                parts = list(pool.map(copy_part, enumerate(ranges, start=1)))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=dst, UploadId=upload_id, MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=dst, UploadId=upload_id)
+            raise
+
+    def list(self, prefix: str, start_after: str = "") -> Iterator[ObjectInfo]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        kwargs = {"StartAfter": start_after} if start_after else {}
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, **kwargs):
+            for obj in page.get("Contents", []):
+                yield ObjectInfo(
+                    obj["Key"], obj.get("Size", 0), obj.get("ETag", ""),
+                    last_modified=_timestamp(obj),
+                )
+
+    def local_path(self, key: str) -> Path | None:
+        return None
+
+    def ensure_bucket(self) -> bool:
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+            return False
+        except self.client.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] not in ("404", "NoSuchBucket"):
+                raise
+        self.client.create_bucket(Bucket=self.bucket)
+        return True
+
+
+def _timestamp(resp: dict) -> float | None:
+    """LastModified of a head_object response or list_objects_v2 entry, as unix time."""
+    modified = resp.get("LastModified")
+    return modified.timestamp() if modified is not None else None
+
+
+# ── Local filesystem ──────────────────────────────────────────────────────────
+#
+# {local_dir}/{bucket}/{key} holds the object; user metadata, when set, goes in
+# {local_dir}/{bucket}.meta/{key}.json. ETags are derived from mtime and size;
+# put() leaves a file untouched when the bytes are identical, so as with S3's
+# content MD5s, an ETag only changes when the content does. Every write is a new
+# file (inode), so two writes in the same mtime tick still get different ETags.
+# Conditional puts check and write under an flock on {local_dir}/{bucket}.lock,
+# which serializes them across threads and processes.
+# A key can't also be a "folder" of other keys (a/b and a/b/c), which the
+# pipeline's layout never needs.
+
+_TMP_PREFIX = ".~tmp-"
+
+
+class LocalStorage:
+    def __init__(self, root: Path, bucket: str) -> None:
+        self.root = root / bucket
+        self.meta_root = root / f"{bucket}.meta"
+        self.lock_path = root / f"{bucket}.lock"
+        self._tmp_ids = itertools.count()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def _meta_path(self, key: str) -> Path:
+        return self.meta_root / f"{key}.json"
+
+    def head(self, key: str) -> ObjectInfo | None:
+        try:
+            st = self._path(key).stat()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        meta_path = self._meta_path(key)
+        metadata = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+        return ObjectInfo(key, st.st_size, _stat_etag(st), metadata, st.st_mtime)
+
+    def get(self, key: str) -> bytes:
+        return self._path(key).read_bytes()
+
+    def open(self, key: str) -> BinaryIO:
+        """Memory-map the file; reads are served from the page cache without a copy into Python."""
+        with self._path(key).open("rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return open(os.devnull, "rb")
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)  # type: ignore[return-value]
+
+    def put(
+        self, key: str, data: bytes, content_type: str = "application/octet-stream",
+        content_encoding: str | None = None, cache_control: str | None = None,
+        metadata: dict[str, str] | None = None,
+        if_none_match: bool = False, if_match: str | None = None,
+    ) -> str:
+        if not if_none_match and if_match is None:
+            return self._put(key, data, metadata)
+        with self._locked():
+            current = self.head(key)
+            if (if_none_match and current is not None) or (
+                if_match is not None and (current is None or current.etag != if_match)
+            ):
+                raise PreconditionFailed(key)
+            return self._put(key, data, metadata)
+
+    def _put(self, key: str, data: bytes, metadata: dict[str, str] | None) -> str:
+        path = self._path(key)
+        if not _same_content(path, data):
+            self._write(path, data)
+        meta_path = self._meta_path(key)
+        if metadata:
+            self._write(meta_path, json.dumps(metadata).encode())
+        else:
+            meta_path.unlink(missing_ok=True)
+        return _stat_etag(path.stat())
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        import fcntl  # POSIX only, like the rest of the local tooling
+
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write(self, path: Path, data: bytes) -> None:
+        # Write then rename, so readers never see a partial object
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_path(path)
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _tmp_path(self, path: Path) -> Path:
+        return path.with_name(f"{_TMP_PREFIX}{os.getpid()}-{next(self._tmp_ids)}-{path.name}")
+
+    def put_file(self, key: str, path: Path) -> None:
+        dst_path = self._path(key)
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_path(dst_path)
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, dst_path)
+        self._meta_path(key).unlink(missing_ok=True)
+
+    def delete(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+        self._meta_path(key).unlink(missing_ok=True)
+
+    def delete_many(self, keys: list[str]) -> None:
+        for key in keys:
+            self.delete(key)
+
+    def copy(self, src: str, dst: str, size: int = 0) -> None:
+        dst_path = self._path(dst)
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._tmp_path(dst_path)
+        shutil.copyfile(self._path(src), tmp)
+        os.replace(tmp, dst_path)
+        if self._meta_path(src).exists():
+            self._write(self._meta_path(dst), self._meta_path(src).read_bytes())
+        else:
+            self._meta_path(dst).unlink(missing_ok=True)
+
+    def list(self, prefix: str, start_after: str = "") -> Iterator[ObjectInfo]:
+        """Walk the tree in key order, skipping folders that sort entirely before start_after."""
+        folder = prefix.rsplit("/", 1)[0] if "/" in prefix else ""
+        dir_key = f"{folder}/" if folder else ""
+        yield from self._walk(self.root / folder, dir_key, prefix, start_after)
+
+    def _walk(
+        self, directory: Path, dir_key: str, prefix: str, start_after: str,
+    ) -> Iterator[ObjectInfo]:
+        try:
+            entries = list(os.scandir(directory))
+        except (FileNotFoundError, NotADirectoryError):
+            return
+        # Sort as S3 does, by full key: a folder "a" sorts as "a/" (after "a.txt")
+        entries.sort(key=lambda e: e.name + "/" if e.is_dir() else e.name)
+        for entry in entries:
+            if entry.name.startswith(_TMP_PREFIX):
+                continue
+            key = dir_key + entry.name
+            if entry.is_dir():
+                sub = key + "/"
+                if not (sub.startswith(prefix) or prefix.startswith(sub)):
+                    continue
+                if sub < start_after and not start_after.startswith(sub):
+                    continue
+                yield from self._walk(Path(entry.path), sub, prefix, start_after)
+            elif key.startswith(prefix) and key > start_after:
+                st = entry.stat()
+                yield ObjectInfo(key, st.st_size, _stat_etag(st), last_modified=st.st_mtime)
+
+    def local_path(self, key: str) -> Path | None:
+        path = self._path(key)
+        return path if path.is_file() else None
+
+    def ensure_bucket(self) -> bool:
+        if self.root.is_dir():
+            return False
+        self.root.mkdir(parents=True)
+        return True
+
+
+def _same_content(path: Path, data: bytes) -> bool:
+    try:
+        if path.stat().st_size != len(data):
+            return False
+        return path.read_bytes() == data
+    except (FileNotFoundError, NotADirectoryError):
+        return False
+
+
+def _stat_etag(st: os.stat_result) -> str:
+    return f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+# ── In memory ─────────────────────────────────────────────────────────────────
+
+@dataclass
+class _MemoryBucket:
+    # key → (data, etag, metadata, written at)
+    objects: dict[str, tuple[bytes, str, dict[str, str], float]] = field(default_factory=dict)
+    keys: list[str] = field(default_factory=list)  # sorted
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+_MEMORY_BUCKETS: dict[str, _MemoryBucket] = {}
+_MEMORY_LOCK = threading.Lock()
+
+
+class MemoryStorage:
+    """Objects live for the rest of the process and are shared by every client of the bucket."""
+
+    def __init__(self, bucket: str) -> None:
+        with _MEMORY_LOCK:
+            self._bucket = _MEMORY_BUCKETS.setdefault(bucket, _MemoryBucket())
+
+    def head(self, key: str) -> ObjectInfo | None:
+        obj = self._bucket.objects.get(key)
+        if obj is None:
+            return None
+        data, etag, metadata, modified = obj
+        return ObjectInfo(key, len(data), etag, dict(metadata), modified)
+
+    def get(self, key: str) -> bytes:
+        obj = self._bucket.objects.get(key)
+        if obj is None:
+            raise FileNotFoundError(key)
+        return obj[0]
+
+    def open(self, key: str) -> BinaryIO:
+        return io.BytesIO(self.get(key))
+
+    def put(
+        self, key: str, data: bytes, content_type: str = "application/octet-stream",
+        content_encoding: str | None = None, cache_control: str | None = None,
+        metadata: dict[str, str] | None = None,
+        if_none_match: bool = False, if_match: str | None = None,
+    ) -> str:
+        return self._set(key, bytes(data), dict(metadata or {}), if_none_match, if_match)
+
+    def put_file(self, key: str, path: Path) -> None:
+        self._set(key, path.read_bytes(), {})
+
+    def _set(
+        self, key: str, data: bytes, metadata: dict[str, str],
+        if_none_match: bool = False, if_match: str | None = None,
+    ) -> str:
+        etag = f'"{hashlib.md5(data, usedforsecurity=False).hexdigest()}"'
+        b = self._bucket
+        with b.lock:
+            current = b.objects.get(key)
+            if (if_none_match and current is not None) or (
+                if_match is not None and (current is None or current[1] != if_match)
+            ):
+                raise PreconditionFailed(key)
+            if current is None:
+                insort(b.keys, key)
+            b.objects[key] = (data, etag, metadata, time.time())
+        return etag
+
+    def delete(self, key: str) -> None:
+        b = self._bucket
+        with b.lock:
+            if b.objects.pop(key, None) is not None:
+                b.keys.pop(bisect_right(b.keys, key) - 1)
+
+    def delete_many(self, keys: list[str]) -> None:
+        for key in keys:
+            self.delete(key)
+
+    def copy(self, src: str, dst: str, size: int = 0) -> None:
+        data, _, metadata, _ = self._bucket.objects[src]
+        self._set(dst, data, dict(metadata))
+
+    def list(self, prefix: str, start_after: str = "") -> Iterator[ObjectInfo]:
+        b = self._bucket
+        with b.lock:
+            i = max(bisect_left(b.keys, prefix), bisect_right(b.keys, start_after))
+            keys = b.keys[i:]
+        for key in keys:
+            if not key.startswith(prefix):
+                break
+            obj = b.objects.get(key)
+            if obj is not None:
+                yield ObjectInfo(key, len(obj[0]), obj[1], last_modified=obj[3])
+
+    def local_path(self, key: str) -> Path | None:
+        return None
+
+    def ensure_bucket(self) -> bool:
+        return False
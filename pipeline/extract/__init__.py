@@ -0,0 +1,44 @@
+"""
+Source modules, resolved by name so a run only imports the sources it touches.
+
+Each pipeline.extract.{source} module defines extract_{source}(r2, config), and
+fetch(r2, config) if the source is pulled from an API or the local machine.
+HTTP sources also define fetch_async(r2, config, client), which runs on a shared
+httpx.AsyncClient (see pipeline.common.http).
+"""
+
+from __future__ import annotations
+
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+from pipeline.common.paths import Source
+
+if TYPE_CHECKING:
+    from pipeline.common.http import AsyncFetch
+    from pipeline.jobs import JobFn
+
+# Order determines extraction sequence
+SOURCES: list[Source] = [
+    Source.GARMIN,
+    Source.STRONG,
+    Source.FITBIT,
+    Source.GITHUB,
+    Source.GYMGROUP,
+    Source.KINDLE,
+    Source.MACOS_COMMANDS,
+    Source.MACOS_SCREENTIME,
+]
+
+
+def extractor(source: Source | str) -> JobFn:
+    return getattr(import_module(f"pipeline.extract.{source}"), f"extract_{source}")
+
+
+def fetcher(source: Source | str) -> JobFn:
+    return import_module(f"pipeline.extract.{source}").fetch
+
+
+def async_fetcher(source: Source | str) -> AsyncFetch | None:
+    """The source's fetch_async, or None if it only has a blocking fetch."""
+    return getattr(import_module(f"pipeline.extract.{source}"), "fetch_async", None)
@@ -11,13 +11,14 @@ import json
 import re
 import tempfile
 import zipfile
+from collections.abc import Iterator
 from pathlib import Path
 
 import polars as pl
 
+from pipeline.common import paths, spill
 from pipeline.common import r2 as R2
 from pipeline.common.config import PipelineConfig
-from pipeline.common import paths
 from pipeline.common.paths import Source, Table
 from pipeline.common.r2 import R2Client
 
@@ -32,27 +33,50 @@ _STEPS_RE    = re.compile(r"Fitbit/Global Export Data/steps-\d{4}-\d{2}-\d{2}\.j
 def extract_fitbit(r2: R2Client, config: PipelineConfig) -> None:
     R2.flush_inbox(r2, TAG, paths.construct_inbox_path(TAG), paths.construct_archive_path(TAG))
 
-    _store_metric(r2, paths.construct_table_path(Table.FITBIT_CALORIES), _CALORIES_RE, "dateTime",    "value")
-    _store_metric(r2, paths.construct_table_path(Table.FITBIT_EXERCISE), _EXERCISE_RE, "startTime",   "activeDuration")
-    _store_metric(r2, paths.construct_table_path(Table.FITBIT_SLEEP),    _SLEEP_RE,    "startTime", "minutesAsleep")
-    _store_metric(r2, paths.construct_table_path(Table.FITBIT_STEPS),    _STEPS_RE,    "dateTime",    "value")
+    for table, file_re, date_field, value_field in (
+        (Table.FITBIT_CALORIES, _CALORIES_RE, "dateTime",  "value"),
+        (Table.FITBIT_EXERCISE, _EXERCISE_RE, "startTime", "activeDuration"),
+        (Table.FITBIT_SLEEP,    _SLEEP_RE,    "startTime", "minutesAsleep"),
+        (Table.FITBIT_STEPS,    _STEPS_RE,    "dateTime",  "value"),
+    ):
+        output_key = paths.construct_table_path(table)
+        _store_metric(r2, config, output_key, file_re, date_field, value_field)
 
 
 _DT_FORMATS = ["%m/%d/%y %H:%M:%S", "%Y-%m-%dT%H:%M:%S%.3f"]
 
 
-def _parse_zip(path: Path, file_re: re.Pattern, date_field: str, value_field: str) -> pl.DataFrame:
+def _parse_zip(
+    path: Path,
+    file_re: re.Pattern,
+    date_field: str,
+    value_field: str,
+    chunk_rows: int | None = None,
+) -> Iterator[pl.DataFrame]:
+    """Yield the entries of the matching files in frames of chunk_rows rows (one frame without a
+    limit)."""
     datetimes: list[str] = []
     values: list[float] = []
+    yielded = False
     with zipfile.ZipFile(path) as zf:
         for name in zf.namelist():
             if file_re.search(name):
                 for entry in json.loads(zf.read(name)):
                     datetimes.append(entry.get(date_field, ""))
                     values.append(float(entry.get(value_field, 0)))
+                    if chunk_rows is not None and len(datetimes) >= chunk_rows:
+                        yield _frame(datetimes, values)
+                        datetimes, values, yielded = [], [], True
+    if datetimes or not yielded:
+        yield _frame(datetimes, values)
+
 
+def _frame(datetimes: list[str], values: list[float]) -> pl.DataFrame:
     return (
-        pl.DataFrame({"datetime": datetimes, "value": values})
+        pl.DataFrame(
+            {"datetime": datetimes, "value": values},
+            schema={"datetime": pl.Utf8, "value": pl.Float64},
+        )
         .with_columns(
             pl.coalesce([
                 pl.col("datetime").str.to_datetime(fmt, strict=False)
@@ -68,24 +92,35 @@ def _parse_zip(path: Path, file_re: re.Pattern, date_field: str, value_field: st
 
 def _store_metric(
     r2: R2Client,
+    config: PipelineConfig,
     output_key: str,
     file_re: re.Pattern,
     date_field: str,
     value_field: str,
 ) -> None:
     label = output_key.split("/")[-1].removesuffix(".parquet")
-    keys = R2.get_archive_keys(r2, paths.construct_archive_path(TAG), output_key, ".zip")
+    keys = R2.get_archive_keys(
+        r2, paths.construct_archive_path(TAG), output_key, ".zip",
+        start=config.extract_from, incremental=not config.force,
+    )
     if not keys:
         print(f"[{TAG}/{label}] no new files, skipping")
         return
 
-    frames: list[pl.DataFrame] = []
-    with tempfile.TemporaryDirectory() as tmp:
-        for key in keys:
-            path = Path(tmp) / Path(key).name
-            path.write_bytes(R2.download_bytes(r2, key))
-            frames.append(_parse_zip(path, file_re, date_field, value_field))
-
-    df = pl.concat(frames)
-    R2.store_parquet(r2, output_key, df, sort_col="datetime", dedup_cols=["datetime"], overwrite=True)
+    # The latest file's reading wins for a datetime in several takeouts, as in store_parquet.
+    # Takeouts are streamed to disk and read a member at a time, so only the parsed rows count.
+    reduce = spill.last_per("datetime")
+    with spill.SpillBuffer(f"{TAG}/{label}", config.extract_memory_budget, reduce=reduce) as chunks:
+        with tempfile.TemporaryDirectory() as tmp:
+            for key in keys:
+                path = Path(tmp) / Path(key).name
+                R2.download_archive(r2, key, path)
+                for df in _parse_zip(path, file_re, date_field, value_field, chunks.chunk_rows()):
+                    chunks.add(df)
+                path.unlink()
+        df = chunks.result()
+    R2.store_parquet(
+        r2, output_key, df, sort_col="datetime", dedup_cols=["datetime"], overwrite=True,
+        window=config.extract_window,
+    )
     print(f"[{TAG}/{label}] {len(df)} rows")
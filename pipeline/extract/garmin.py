@@ -9,21 +9,30 @@ from __future__ import annotations
 
 import json
 import re
+import time
 from datetime import date, timedelta
+from typing import TYPE_CHECKING
 
 import polars as pl
-from garminconnect import Garmin
 
-from pipeline.common import paths, r2 as R2
+from pipeline.common import paths, spill
+from pipeline.common import r2 as R2
 from pipeline.common.config import PipelineConfig
 from pipeline.common.paths import Source, Table
 from pipeline.common.r2 import R2Client
 
+if TYPE_CHECKING:
+    from garminconnect import Garmin
+
 TAG = Source.GARMIN
 
 _WELLNESS_RE   = re.compile(r"/wellness-\d{4}-\d{2}-\d{2}")
 _ACTIVITIES_RE = re.compile(r"/activities-\d{4}-\d{2}-\d{2}")
 
+# garminconnect uses its own requests session, so it is paced here rather than by
+# the shared HTTP client's rate limits
+_REQUESTS_PER_SECOND = 4
+
 
 def fetch(r2: R2Client, config: PipelineConfig) -> None:
     """Fetch from Garmin Connect API and upload to inbox."""
@@ -41,8 +50,8 @@ def fetch(r2: R2Client, config: PipelineConfig) -> None:
 
 def extract_garmin(r2: R2Client, config: PipelineConfig) -> None:
     R2.flush_inbox(r2, TAG, paths.construct_inbox_path(TAG), paths.construct_archive_path(TAG))
-    _extract_wellness(r2)
-    _extract_activities(r2)
+    _extract_wellness(r2, config)
+    _extract_activities(r2, config)
 
 
 # ── Pure functions ─────────────────────────────────────────────────────────────
@@ -94,6 +103,8 @@ def parse_activities(records: list[dict]) -> pl.DataFrame:
 # ── Imperative shell ───────────────────────────────────────────────────────────
 
 def _login(config: PipelineConfig) -> Garmin:
+    from garminconnect import Garmin  # slow to import; only fetch needs it
+
     client = Garmin(config.secrets.garmin_username, config.secrets.garmin_password)
     client.login()
     return client
@@ -104,7 +115,9 @@ def _fetch_wellness(client: Garmin) -> list[dict]:
     stats = []
     for i in range(365):
         d = (today - timedelta(days=i)).isoformat()
+        started = time.monotonic()
         s = client.get_stats(d)
+        time.sleep(max(0.0, 1 / _REQUESTS_PER_SECOND - (time.monotonic() - started)))
         if s:
             stats.append(s)
     return stats
@@ -114,29 +127,56 @@ def _fetch_activities(client: Garmin):
     return client.get_activities(0, 1000)
 
 
-def _extract_wellness(r2: R2Client) -> None:
+def _extract_wellness(r2: R2Client, config: PipelineConfig) -> None:
     output_key = paths.construct_table_path(Table.GARMIN_WELLNESS)
-    keys = [k for k in R2.get_archive_keys(r2, paths.construct_archive_path(TAG), output_key, ".json") if _WELLNESS_RE.search(k)]
+    archived = R2.get_archive_keys(
+        r2, paths.construct_archive_path(TAG), output_key, ".json",
+        start=config.extract_from, incremental=not config.force,
+    )
+    keys = [k for k in archived if _WELLNESS_RE.search(k)]
     if not keys:
         print(f"[{TAG}/wellness] no new files, skipping")
         return
-    records: list[dict] = []
-    for key in keys:
-        records.extend(json.loads(R2.download_bytes(r2, key)))
-    df = parse_wellness(records)
-    R2.store_parquet(r2, output_key, df, sort_col="date", dedup_cols=["date"], overwrite=True)
+    # Each fetch covers the last year, so most days are in many files; the latest file's wins
+    with spill.SpillBuffer(
+        f"{TAG}/wellness", config.extract_memory_budget, reduce=spill.last_per("date"),
+    ) as chunks:
+        for key in keys:
+            data = R2.read_archive(r2, key)
+            with chunks.reading(len(data)):
+                records = json.loads(data)
+                for batch in chunks.batches(records) if records else ():
+                    chunks.add(parse_wellness(batch))
+        df = chunks.result()
+    R2.store_parquet(
+        r2, output_key, df, sort_col="date", dedup_cols=["date"], overwrite=True,
+        window=config.extract_window,
+    )
     print(f"[{TAG}/wellness] {len(df)} rows")
 
 
-def _extract_activities(r2: R2Client) -> None:
+def _extract_activities(r2: R2Client, config: PipelineConfig) -> None:
     output_key = paths.construct_table_path(Table.GARMIN_ACTIVITIES)
-    keys = [k for k in R2.get_archive_keys(r2, paths.construct_archive_path(TAG), output_key, ".json") if _ACTIVITIES_RE.search(k)]
+    archived = R2.get_archive_keys(
+        r2, paths.construct_archive_path(TAG), output_key, ".json",
+        start=config.extract_from, incremental=not config.force,
+    )
+    keys = [k for k in archived if _ACTIVITIES_RE.search(k)]
     if not keys:
         print(f"[{TAG}/activities] no new files, skipping")
         return
-    records: list[dict] = []
-    for key in keys:
-        records.extend(json.loads(R2.download_bytes(r2, key)))
-    df = parse_activities(records)
-    R2.store_parquet(r2, output_key, df, sort_col="date", dedup_cols=["activity_id"], overwrite=True)
+    with spill.SpillBuffer(
+        f"{TAG}/activities", config.extract_memory_budget, reduce=spill.last_per("activity_id"),
+    ) as chunks:
+        for key in keys:
+            data = R2.read_archive(r2, key)
+            with chunks.reading(len(data)):
+                records = json.loads(data)
+                for batch in chunks.batches(records) if records else ():
+                    chunks.add(parse_activities(batch))
+        df = chunks.result()
+    R2.store_parquet(
+        r2, output_key, df, sort_col="date", dedup_cols=["activity_id"], overwrite=True,
+        window=config.extract_window,
+    )
     print(f"[{TAG}/activities] {len(df)} rows")
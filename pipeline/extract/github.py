@@ -7,20 +7,23 @@ Fetch data first with: uv run python scripts/sync_api.py
 
 from __future__ import annotations
 
+import asyncio
 import json
-import os
 from datetime import date, timedelta, timezone
 from datetime import datetime as dt
+from typing import TYPE_CHECKING
 
-import httpx
 import polars as pl
 
+from pipeline.common import paths, spill
 from pipeline.common import r2 as R2
 from pipeline.common.config import PipelineConfig
-from pipeline.common import paths
 from pipeline.common.paths import Source, Table
 from pipeline.common.r2 import R2Client
 
+if TYPE_CHECKING:
+    import httpx
+
 TAG = Source.GITHUB
 
 _DEFAULT_API_URL = "https://api.github.com/graphql"
@@ -44,10 +47,20 @@ query($login: String!, $from: DateTime!, $to: DateTime!) {
 
 def fetch(r2: R2Client, config: PipelineConfig) -> None:
     """Fetch from GitHub API and upload to inbox."""
-    days = _fetch_api(config)
+    from pipeline.common import http  # only fetch needs httpx
+
+    http.run(fetch_async, r2, config)
+
+
+async def fetch_async(r2: R2Client, config: PipelineConfig, client: httpx.AsyncClient) -> None:
+    """fetch on a shared AsyncClient."""
+    days = await _fetch_api(client, config)
     if days:
         filename = f"contributions_{date.today().isoformat()}.json"
-        R2.upload_bytes(r2, paths.construct_inbox_path(TAG) + "/" + filename, json.dumps(days).encode(), "application/json")
+        key = paths.construct_inbox_path(TAG) + "/" + filename
+        await asyncio.to_thread(
+            R2.upload_bytes, r2, key, json.dumps(days).encode(), "application/json",
+        )
         print(f"[{TAG}] {len(days)} contribution days → inbox")
     else:
         print(f"[{TAG}] no contributions found")
@@ -56,33 +69,43 @@ def fetch(r2: R2Client, config: PipelineConfig) -> None:
 def extract_github(r2: R2Client, config: PipelineConfig) -> None:
     R2.flush_inbox(r2, TAG, paths.construct_inbox_path(TAG), paths.construct_archive_path(TAG))
 
-    archive_keys = sorted(R2.get_archive_keys(r2, paths.construct_archive_path(TAG), paths.construct_table_path(Table.GITHUB_CONTRIBUTIONS), ".json"))
+    output_key = paths.construct_table_path(Table.GITHUB_CONTRIBUTIONS)
+    archive_keys = sorted(R2.get_archive_keys(
+        r2, paths.construct_archive_path(TAG), output_key, ".json",
+        start=config.extract_from, incremental=not config.force,
+    ))
     if not archive_keys:
         print(f"[{TAG}] no new files, skipping")
         return
 
-    all_days: list[dict] = []
-    for key in archive_keys:
-        all_days.extend(json.loads(R2.download_bytes(r2, key)))
-
-    df = pl.DataFrame(
-        {
-            "date": [date.fromisoformat(d["date"]) for d in all_days],
-            "value": [float(d["contributionCount"]) for d in all_days],
-        },
-        schema={"date": pl.Date, "value": pl.Float64},
+    reduce = spill.last_per("date")
+    with spill.SpillBuffer(TAG, config.extract_memory_budget, reduce=reduce) as chunks:
+        for key in archive_keys:
+            data = R2.read_archive(r2, key)
+            with chunks.reading(len(data)):
+                for days in chunks.batches(json.loads(data)):
+                    chunks.add(pl.DataFrame(
+                        {
+                            "date": [date.fromisoformat(d["date"]) for d in days],
+                            "value": [float(d["contributionCount"]) for d in days],
+                        },
+                        schema={"date": pl.Date, "value": pl.Float64},
+                    ))
+        df = chunks.result()
+
+    R2.store_parquet(
+        r2, output_key, df, sort_col="date", dedup_cols=["date"], overwrite=True,
+        window=config.extract_window,
     )
-
-    R2.store_parquet(r2, paths.construct_table_path(Table.GITHUB_CONTRIBUTIONS), df, sort_col="date", dedup_cols=["date"], overwrite=True)
     print(f"[{TAG}] {len(df)} rows")
 
 
-def _fetch_api(config: PipelineConfig) -> list[dict]:
+async def _fetch_api(client: httpx.AsyncClient, config: PipelineConfig) -> list[dict]:
     api_url = _DEFAULT_API_URL
     end = dt.now(tz=timezone.utc)
     start = end - timedelta(weeks=52)
 
-    resp = httpx.post(
+    resp = await client.post(
         api_url,
         json={
             "query": _GQL,
@@ -96,7 +119,6 @@ def _fetch_api(config: PipelineConfig) -> list[dict]:
             "Authorization": f"bearer {config.secrets.github_token}",
             "Content-Type": "application/json",
         },
-        timeout=30,
     )
     resp.raise_for_status()
 
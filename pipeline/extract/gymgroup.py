@@ -7,26 +7,28 @@ Fetch data first with: uv run python scripts/sync_api.py
 
 from __future__ import annotations
 
+import asyncio
 import json
 from datetime import date
+from typing import TYPE_CHECKING
 
-import httpx
 import polars as pl
 
+from pipeline.common import paths
 from pipeline.common import r2 as R2
 from pipeline.common.config import PipelineConfig
-from pipeline.common import paths
 from pipeline.common.paths import Source, Table
 from pipeline.common.r2 import R2Client
 
+if TYPE_CHECKING:
+    import httpx
+
 TAG = Source.GYMGROUP
 
 _BASE = "https://thegymgroup.netpulse.com/np"
 _HEADERS = {
     "accept": "application/json",
     "accept-encoding": "gzip",
-    "connection": "Keep-Alive",
-    "host": "thegymgroup.netpulse.com",
     "x-np-user-agent": (
         "clientType=MOBILE_DEVICE; devicePlatform=ANDROID; deviceUid=; "
         "applicationName=The Gym Group; applicationVersion=5.0; applicationVersionCode=38"
@@ -35,10 +37,21 @@ _HEADERS = {
 
 def fetch(r2: R2Client, config: PipelineConfig) -> None:
     """Fetch from Gym Group API and upload to inbox."""
-    check_ins = _fetch_api(config.secrets.gym_group_username, config.secrets.gym_group_password)
+    from pipeline.common import http  # only fetch needs httpx
+
+    http.run(fetch_async, r2, config)
+
+
+async def fetch_async(r2: R2Client, config: PipelineConfig, client: httpx.AsyncClient) -> None:
+    """fetch on a shared AsyncClient."""
+    secrets = config.secrets
+    check_ins = await _fetch_api(client, secrets.gym_group_username, secrets.gym_group_password)
     if check_ins:
         filename = f"checkins_{date.today().isoformat()}.json"
-        R2.upload_bytes(r2, paths.construct_inbox_path(TAG) + "/" + filename, json.dumps(check_ins).encode(), "application/json")
+        key = paths.construct_inbox_path(TAG) + "/" + filename
+        await asyncio.to_thread(
+            R2.upload_bytes, r2, key, json.dumps(check_ins).encode(), "application/json",
+        )
         print(f"[{TAG}] {len(check_ins)} check-ins → inbox")
     else:
         print(f"[{TAG}] no check-ins found")
@@ -47,14 +60,18 @@ def fetch(r2: R2Client, config: PipelineConfig) -> None:
 def extract_gymgroup(r2: R2Client, config: PipelineConfig) -> None:
     R2.flush_inbox(r2, TAG, paths.construct_inbox_path(TAG), paths.construct_archive_path(TAG))
 
-    archive_keys = R2.get_archive_keys(r2, paths.construct_archive_path(TAG), paths.construct_table_path(Table.GYMGROUP_VISITS), ".json")
+    output_key = paths.construct_table_path(Table.GYMGROUP_VISITS)
+    archive_keys = R2.get_archive_keys(
+        r2, paths.construct_archive_path(TAG), output_key, ".json",
+        start=config.extract_from, incremental=not config.force,
+    )
     if not archive_keys:
         print(f"[{TAG}] no new files, skipping")
         return
 
     all_check_ins: list[dict] = []
     for key in archive_keys:
-        all_check_ins.extend(json.loads(R2.download_bytes(r2, key)))
+        all_check_ins.extend(json.loads(R2.read_archive(r2, key)))
 
     df = (
         pl.DataFrame(all_check_ins)
@@ -72,25 +89,27 @@ def extract_gymgroup(r2: R2Client, config: PipelineConfig) -> None:
         .sort("date")
     )
 
-    R2.store_parquet(r2, paths.construct_table_path(Table.GYMGROUP_VISITS), df, sort_col="date", dedup_cols=["date", "category"], overwrite=True)
+    R2.store_parquet(
+        r2, output_key, df, sort_col="date", dedup_cols=["date", "category"], overwrite=True,
+        window=config.extract_window,
+    )
     print(f"[{TAG}] {len(df)} rows")
 
 
-def _fetch_api(username: str, password: str) -> list[dict]:
-    with httpx.Client(headers=_HEADERS) as client:
-        resp = client.post(
-            f"{_BASE}/exerciser/login",
-            data={"username": username, "password": password},
-            headers={"content-type": "application/x-www-form-urlencoded"},
-        )
-        resp.raise_for_status()
-        user_id = resp.json()["uuid"]
-        cookie = resp.headers.get("set-cookie", "")
-
-        visits = client.get(
-            f"{_BASE}/exercisers/{user_id}/check-ins/history",
-            params={"endDate": "2099-01-01T00:00:00"},
-            headers={"cookie": cookie},
-        )
-        visits.raise_for_status()
-        return visits.json().get("checkIns", [])
+async def _fetch_api(client: httpx.AsyncClient, username: str, password: str) -> list[dict]:
+    resp = await client.post(
+        f"{_BASE}/exerciser/login",
+        data={"username": username, "password": password},
+        headers=_HEADERS,
+    )
+    resp.raise_for_status()
+    user_id = resp.json()["uuid"]
+    cookie = resp.headers.get("set-cookie", "")
+
+    visits = await client.get(
+        f"{_BASE}/exercisers/{user_id}/check-ins/history",
+        params={"endDate": "2099-01-01T00:00:00"},
+        headers={**_HEADERS, "cookie": cookie},
+    )
+    visits.raise_for_status()
+    return visits.json().get("checkIns", [])
@@ -8,13 +8,12 @@ from __future__ import annotations
 
 import io
 import zipfile
-from datetime import date
 
 import polars as pl
 
+from pipeline.common import paths, spill
 from pipeline.common import r2 as R2
 from pipeline.common.config import PipelineConfig
-from pipeline.common import paths
 from pipeline.common.paths import Source, Table
 from pipeline.common.r2 import R2Client
 
@@ -25,33 +24,44 @@ _CSV_NAME = "Kindle.reading-insights-sessions_with_adjustments.csv"
 def extract_kindle(r2: R2Client, config: PipelineConfig) -> None:
     R2.flush_inbox(r2, TAG, paths.construct_inbox_path(TAG), paths.construct_archive_path(TAG))
 
-    archive_keys = R2.get_archive_keys(r2, paths.construct_archive_path(TAG), paths.construct_table_path(Table.KINDLE_READING), ".zip")
+    output_key = paths.construct_table_path(Table.KINDLE_READING)
+    archive_keys = R2.get_archive_keys(
+        r2, paths.construct_archive_path(TAG), output_key, ".zip",
+        start=config.extract_from, incremental=not config.force,
+    )
     if not archive_keys:
         print(f"[{TAG}] no new files, skipping")
         return
 
-    frames = [_parse_zip(R2.download_bytes(r2, k)) for k in archive_keys]
-    df = (
-        pl.concat(frames)
-        .group_by(["date", "category"])
-        .agg(pl.col("reading_ms").sum())
-        .sort("date")
-    )
+    with spill.SpillBuffer(TAG, config.extract_memory_budget, reduce=_reading_per_day) as chunks:
+        for key in archive_keys:
+            csv_bytes = _read_csv(R2.read_archive(r2, key))
+            with chunks.reading(len(csv_bytes)):
+                chunks.add_batches(_scan_csv(csv_bytes))
+        df = chunks.result().sort("date")
 
-    R2.store_parquet(r2, paths.construct_table_path(Table.KINDLE_READING), df, sort_col="date", dedup_cols=["date", "category"], overwrite=True)
+    R2.store_parquet(
+        r2, output_key, df, sort_col="date", dedup_cols=["date", "category"], overwrite=True,
+        window=config.extract_window,
+    )
     print(f"[{TAG}] {len(df)} rows")
 
 
-def _parse_zip(data: bytes) -> pl.DataFrame:
+def _reading_per_day(lf: pl.LazyFrame) -> pl.LazyFrame:
+    return lf.group_by(["date", "category"]).agg(pl.col("reading_ms").sum())
+
+
+def _read_csv(data: bytes) -> bytes:
     with zipfile.ZipFile(io.BytesIO(data)) as zf:
         matches = [n for n in zf.namelist() if n.endswith(_CSV_NAME)]
         if not matches:
             raise FileNotFoundError(f"{_CSV_NAME} not found in ZIP")
-        csv_bytes = zf.read(matches[0])
+        return zf.read(matches[0])
+
 
-    raw = pl.read_csv(io.BytesIO(csv_bytes), infer_schema_length=1000)
+def _scan_csv(csv_bytes: bytes) -> pl.LazyFrame:
     return (
-        raw
+        pl.scan_csv(io.BytesIO(csv_bytes), infer_schema_length=1000)
         .filter(pl.col("total_reading_milliseconds").is_not_null())
         .with_columns(
             pl.col("start_time").str.slice(0, 10).str.to_date("%Y-%m-%d").alias("date"),
@@ -13,9 +13,9 @@ from pathlib import Path
 
 import polars as pl
 
+from pipeline.common import paths, spill
 from pipeline.common import r2 as R2
 from pipeline.common.config import PipelineConfig
-from pipeline.common import paths
 from pipeline.common.paths import Source, Table
 from pipeline.common.r2 import R2Client
 
@@ -37,33 +37,44 @@ def fetch(r2: R2Client, config: PipelineConfig) -> None:
 
 def extract_macos_commands(r2: R2Client, config: PipelineConfig) -> None:
     R2.flush_inbox(r2, TAG, paths.construct_inbox_path(TAG), paths.construct_archive_path(TAG))
-    archive_keys = R2.get_archive_keys(r2, paths.construct_archive_path(TAG), paths.construct_table_path(Table.MACOS_COMMANDS), ".json")
+    output_key = paths.construct_table_path(Table.MACOS_COMMANDS)
+    archive_keys = R2.get_archive_keys(
+        r2, paths.construct_archive_path(TAG), output_key, ".json",
+        start=config.extract_from, incremental=not config.force,
+    )
     if not archive_keys:
         print(f"[{TAG}] no new files, skipping")
         return
 
-    all_records: list[dict] = []
-    for key in archive_keys:
-        all_records.extend(json.loads(R2.download_bytes(r2, key)))
-
-    df = (
-        pl.DataFrame(
-            {
-                "date": [date.fromisoformat(r["date"]) for r in all_records],
-                "category": [r["command"] for r in all_records],
-            },
-            schema={"date": pl.Date, "category": pl.Utf8},
-        )
-        .with_columns(pl.lit(1).cast(pl.Int64).alias("count"))
-        .group_by(["date", "category"])
-        .agg(pl.col("count").sum())
-        .sort("date")
+    with spill.SpillBuffer(TAG, config.extract_memory_budget, reduce=_commands_per_day) as chunks:
+        for key in archive_keys:
+            data = R2.read_archive(r2, key)
+            with chunks.reading(len(data)):
+                for records in chunks.batches(json.loads(data)):
+                    chunks.add(
+                        pl.DataFrame(
+                            {
+                                "date": [date.fromisoformat(r["date"]) for r in records],
+                                "category": [r["command"] for r in records],
+                            },
+                            schema={"date": pl.Date, "category": pl.Utf8},
+                        )
+                        .group_by(["date", "category"])
+                        .agg(pl.len().cast(pl.Int64).alias("count"))
+                    )
+        df = chunks.result().sort("date")
+
+    R2.store_parquet(
+        r2, output_key, df, sort_col="date", dedup_cols=["date", "category"], overwrite=True,
+        window=config.extract_window,
     )
-
-    R2.store_parquet(r2, paths.construct_table_path(Table.MACOS_COMMANDS), df, sort_col="date", dedup_cols=["date", "category"], overwrite=True)
     print(f"[{TAG}] {len(df)} rows")
 
 
+def _commands_per_day(lf: pl.LazyFrame) -> pl.LazyFrame:
+    return lf.group_by(["date", "category"]).agg(pl.col("count").sum())
+
+
 def _parse_history(path: Path = _HISTORY_FILE) -> list[dict]:
     if not path.exists():
         raise FileNotFoundError(f"zsh history not found at {path}")
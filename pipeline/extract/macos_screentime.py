@@ -12,15 +12,14 @@ from __future__ import annotations
 
 import json
 import os
-import sqlite3
 from datetime import date, datetime, timezone
 from pathlib import Path
 
 import polars as pl
 
+from pipeline.common import paths, spill
 from pipeline.common import r2 as R2
 from pipeline.common.config import PipelineConfig
-from pipeline.common import paths
 from pipeline.common.paths import Source, Table
 from pipeline.common.r2 import R2Client
 
@@ -52,37 +51,49 @@ def fetch(r2: R2Client, config: PipelineConfig) -> None:
 
 def extract_macos_screentime(r2: R2Client, config: PipelineConfig) -> None:
     R2.flush_inbox(r2, TAG, paths.construct_inbox_path(TAG), paths.construct_archive_path(TAG))
-    archive_keys = R2.get_archive_keys(r2, paths.construct_archive_path(TAG), paths.construct_table_path(Table.MACOS_SCREENTIME), ".json")
+    output_key = paths.construct_table_path(Table.MACOS_SCREENTIME)
+    archive_keys = R2.get_archive_keys(
+        r2, paths.construct_archive_path(TAG), output_key, ".json",
+        start=config.extract_from, incremental=not config.force,
+    )
     if not archive_keys:
         print(f"[{TAG}] no new files, skipping")
         return
 
-    all_records: list[dict] = []
-    for key in archive_keys:
-        all_records.extend(json.loads(R2.download_bytes(r2, key)))
-
-    dates = [
-        datetime.fromtimestamp(r["start_unix"] + r["tz_offset"], tz=timezone.utc).date()
-        for r in all_records
-    ]
-    df = (
-        pl.DataFrame(
-            {
-                "date": dates,
-                "category": [r["app"] for r in all_records],
-                "usage_secs": [r["usage_secs"] for r in all_records],
-            },
-            schema={"date": pl.Date, "category": pl.Utf8, "usage_secs": pl.Float64},
-        )
-        .group_by(["date", "category"])
-        .agg(pl.col("usage_secs").sum())
-        .sort("date")
-    )
+    with spill.SpillBuffer(TAG, config.extract_memory_budget, reduce=_usage_per_day) as chunks:
+        for key in archive_keys:
+            data = R2.read_archive(r2, key)
+            with chunks.reading(len(data)):
+                for records in chunks.batches(json.loads(data)):
+                    dates = [
+                        datetime.fromtimestamp(
+                            r["start_unix"] + r["tz_offset"], tz=timezone.utc,
+                        ).date()
+                        for r in records
+                    ]
+                    chunks.add(pl.DataFrame(
+                        {
+                            "date": dates,
+                            "category": [r["app"] for r in records],
+                            "usage_secs": [r["usage_secs"] for r in records],
+                        },
+                        schema={"date": pl.Date, "category": pl.Utf8, "usage_secs": pl.Float64},
+                    ))
+        df = chunks.result().sort("date")
 
-    R2.store_parquet(r2, paths.construct_table_path(Table.MACOS_SCREENTIME), df, sort_col="date", dedup_cols=["date", "category"], overwrite=True)
+    R2.store_parquet(
+        r2, output_key, df, sort_col="date", dedup_cols=["date", "category"], overwrite=True,
+        window=config.extract_window,
+    )
     print(f"[{TAG}] {len(df)} rows")
 
+def _usage_per_day(lf: pl.LazyFrame) -> pl.LazyFrame:
+    return lf.group_by(["date", "category"]).agg(pl.col("usage_secs").sum())
+
+
 def _query_db(db_path: Path = _DB) -> list[dict]:
+    import sqlite3  # only fetch needs it
+
     if not db_path.exists():
         raise FileNotFoundError(f"knowledgeC.db not found at {db_path}")
     if not os.access(db_path, os.R_OK):
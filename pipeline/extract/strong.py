@@ -10,9 +10,9 @@ import io
 
 import polars as pl
 
+from pipeline.common import paths, spill
 from pipeline.common import r2 as R2
 from pipeline.common.config import PipelineConfig
-from pipeline.common import paths
 from pipeline.common.paths import Source, Table
 from pipeline.common.r2 import R2Client
 
@@ -22,26 +22,36 @@ TAG = Source.STRONG
 def extract_strong(r2: R2Client, config: PipelineConfig) -> None:
     R2.flush_inbox(r2, TAG, paths.construct_inbox_path(TAG), paths.construct_archive_path(TAG))
 
-    archive_keys = R2.get_archive_keys(r2, paths.construct_archive_path(TAG), paths.construct_table_path(Table.STRONG_WORKOUTS), ".csv")
+    output_key = paths.construct_table_path(Table.STRONG_WORKOUTS)
+    archive_keys = R2.get_archive_keys(
+        r2, paths.construct_archive_path(TAG), output_key, ".csv",
+        start=config.extract_from, incremental=not config.force,
+    )
     if not archive_keys:
         print(f"[{TAG}] no new files, skipping")
         return
 
-    frames = [_parse_csv(R2.download_bytes(r2, k)) for k in archive_keys]
-    df = (
-        pl.concat(frames)
-        .group_by(["date", "category"])
-        .agg(pl.col("duration_sec").max())
-        .sort("date")
-    )
+    with spill.SpillBuffer(TAG, config.extract_memory_budget, reduce=_longest_per_day) as chunks:
+        for key in archive_keys:
+            data = R2.read_archive(r2, key)
+            with chunks.reading(len(data)):
+                chunks.add_batches(_scan_csv(data))
+        df = chunks.result().sort("date")
 
-    R2.store_parquet(r2, paths.construct_table_path(Table.STRONG_WORKOUTS), df, sort_col="date", dedup_cols=["date", "category"], overwrite=True)
+    R2.store_parquet(
+        r2, output_key, df, sort_col="date", dedup_cols=["date", "category"], overwrite=True,
+        window=config.extract_window,
+    )
     print(f"[{TAG}] {len(df)} rows")
 
 
-def _parse_csv(data: bytes) -> pl.DataFrame:
+def _longest_per_day(lf: pl.LazyFrame) -> pl.LazyFrame:
+    return lf.group_by(["date", "category"]).agg(pl.col("duration_sec").max())
+
+
+def _scan_csv(data: bytes) -> pl.LazyFrame:
     return (
-        pl.read_csv(io.BytesIO(data), separator=";", infer_schema_length=1000)
+        pl.scan_csv(io.BytesIO(data), separator=";", infer_schema_length=1000)
         .with_columns(
             pl.col("Date").str.slice(0, 10).str.to_date("%Y-%m-%d").alias("date"),
             pl.col("Workout Name").alias("category"),
@@ -1,8 +1,27 @@
-from typing import Protocol
+from __future__ import annotations
 
-from pipeline.common.config import PipelineConfig
-from pipeline.common.r2 import R2Client
+from importlib import import_module
+from typing import TYPE_CHECKING, Protocol
+
+if TYPE_CHECKING:
+    from pipeline.common.config import PipelineConfig
+    from pipeline.common.r2 import R2Client
 
 
 class JobFn(Protocol):
     def __call__(self, r2: R2Client, config: PipelineConfig) -> None: ...
+
+
+# Job name (as used in JOBS_TO_RUN) → "module:function", imported on first use.
+# Order determines execution sequence.
+JOBS: dict[str, str] = {
+    "extract":           "pipeline.jobs.extract:extract_from_sources",
+    "daily_aggregation": "pipeline.jobs.daily_aggregation:aggregate_into_daily_tables",
+    "export":            "pipeline.jobs.export:export_to_web",
+    "compaction":        "pipeline.jobs.compaction:compact_archives",
+}
+
+
+def load_job(name: str) -> JobFn:
+    module, function = JOBS[name].split(":")
+    return getattr(import_module(module), function)
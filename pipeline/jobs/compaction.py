@@ -0,0 +1,102 @@
+"""
+Rolls closed months of archived raw files into one zstd-compressed parquet per source.
+
+Each compacted file holds one row per archived file, each in a row group of its own:
+  key (str), archived_on (date), sha256 (str), payload (binary)
+Extractors keep working on the original archive keys; R2.read_archive resolves
+them through the compaction manifest.
+
+A month is built on local disk one payload at a time and uploaded from there, so
+memory use is bounded by the largest archived file, not the month.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+
+import polars as pl
+
+from pipeline.common import paths
+from pipeline.common import r2 as R2
+from pipeline.common.config import PipelineConfig
+from pipeline.common.paths import Source
+from pipeline.common.r2 import R2Client
+
+_SCHEMA = {"key": pl.Utf8, "archived_on": pl.Date, "sha256": pl.Utf8, "payload": pl.Binary}
+
+
+def compact_archives(r2: R2Client, config: PipelineConfig) -> None:
+    today = date.today()
+    last_closed_day = today.replace(day=1) - timedelta(days=1)
+    prefixes = {source: paths.construct_archive_path(source) for source in Source}
+    listings = R2.list_archive_keys_many(r2, list(prefixes.values()), end=last_closed_day)
+    for source, archive_prefix in prefixes.items():
+        _compact_source(r2, source, archive_prefix, listings[archive_prefix])
+        if config.archive_retention_days is not None:
+            _apply_retention(r2, source, archive_prefix, today, config.archive_retention_days)
+
+
+def _compact_source(r2: R2Client, source: Source, archive_prefix: str, keys: list[str]) -> None:
+    """Compact every closed month in keys that has no compacted file yet."""
+    manifest = R2.load_compaction_manifest(r2, archive_prefix)
+    by_month: dict[str, list[str]] = {}
+    for key in keys:
+        month = key.split("/")[-2][:7]
+        if month not in manifest["months"]:
+            by_month.setdefault(month, []).append(key)
+
+    for month, month_keys in sorted(by_month.items()):
+        compacted_key = paths.construct_compacted_path(f"{source}/{month}")
+        with tempfile.TemporaryDirectory(prefix="yid-compact-") as tmp:
+            parts: list[Path] = []
+            raw_size = 0
+            for key in month_keys:
+                payload = R2.download_bytes(r2, key)
+                raw_size += len(payload)
+                part = Path(tmp) / f"{len(parts):05d}.parquet"
+                pl.DataFrame(
+                    {
+                        "key": [key],
+                        "archived_on": [date.fromisoformat(key.split("/")[-2])],
+                        "sha256": [R2.content_hash(payload)],
+                        "payload": [payload],
+                    },
+                    schema=_SCHEMA,
+                ).write_parquet(part, compression="zstd")
+                parts.append(part)
+                del payload
+            month_path = Path(tmp) / "month.parquet"
+            pl.scan_parquet(parts).sink_parquet(month_path, compression="zstd", row_group_size=1)
+            R2.upload_file(r2, compacted_key, month_path)
+            size = month_path.stat().st_size
+
+        manifest["months"][month] = {
+            "key": compacted_key, "files": month_keys, "originals_deleted": False,
+        }
+        R2.store_compaction_manifest(r2, archive_prefix, manifest)
+        print(
+            f"[{source}] compacted {len(month_keys)} file(s) for {month}: "
+            f"{raw_size} → {size} bytes"
+        )
+
+
+def _apply_retention(
+    r2: R2Client, source: Source, archive_prefix: str, today: date, retention_days: int
+) -> None:
+    """Delete original files of compacted months once the retention period has passed."""
+    manifest = R2.load_compaction_manifest(r2, archive_prefix)
+    for month, entry in sorted(manifest["months"].items()):
+        expires = _month_end(month) + timedelta(days=retention_days)
+        if entry["originals_deleted"] or expires >= today:
+            continue
+        R2.delete_many(r2, entry["files"])
+        entry["originals_deleted"] = True
+        R2.store_compaction_manifest(r2, archive_prefix, manifest)
+        print(f"[{source}] deleted {len(entry['files'])} original file(s) for {month}")
+
+
+def _month_end(month: str) -> date:
+    first = date.fromisoformat(f"{month}-01")
+    return (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
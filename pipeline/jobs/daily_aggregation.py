@@ -4,113 +4,223 @@ Aggregates job parquets into daily summary tables.
 
 from __future__ import annotations
 
+from collections.abc import Collection
+from dataclasses import dataclass
+from datetime import date
 from typing import Callable
 
 import polars as pl
 
+from pipeline.common import lineage, metrics
 from pipeline.common import r2 as R2
 from pipeline.common.config import PipelineConfig
 from pipeline.common.paths import Table, construct_table_path
 from pipeline.common.r2 import R2Client
 
+# ── Declarations ──────────────────────────────────────────────────────────────
+#
+# Each daily table is declared as the source tables it reads and how each one's
+# value column is converted to the output unit. A table with several inputs
+# (Fitbit and Garmin) takes the max per date, so a day recorded by both devices
+# isn't double counted.
+
+@dataclass(frozen=True)
+class Input:
+    table: Table
+    column: str                    # value column in the source table
+    daily_sum: bool = False        # sum the column per date (and category) before converting
+    divide_by: float = 1           # unit conversion, e.g. 60_000 for ms → minutes
+    decimals: int | None = None    # round after converting
+
+    def value(self) -> pl.Expr:
+        expr = pl.col(self.column)
+        if self.daily_sum:
+            expr = expr.sum()
+        expr = expr.cast(pl.Float64)
+        if self.divide_by != 1:
+            expr = expr / self.divide_by
+        if self.decimals is not None:
+            expr = expr.round(self.decimals)
+        return expr.alias("value")
+
+
+@dataclass(frozen=True)
+class Aggregation:
+    output: Table
+    inputs: tuple[Input, ...]
+    by_category: bool = False      # output is keyed by (date, category) rather than date
+
+    @property
+    def keys(self) -> list[str]:
+        return ["date", "category"] if self.by_category else ["date"]
+
+
+_AGGREGATIONS: list[Aggregation] = [
+    Aggregation(Table.DAILY_CALORIES, (
+        Input(Table.FITBIT_CALORIES, "value", daily_sum=True),
+        Input(Table.GARMIN_WELLNESS, "calories"),
+    )),
+    Aggregation(Table.DAILY_STEPS, (
+        Input(Table.FITBIT_STEPS, "value", daily_sum=True),
+        Input(Table.GARMIN_WELLNESS, "steps"),
+    )),
+    Aggregation(Table.DAILY_EXERCISE, (
+        Input(Table.FITBIT_EXERCISE, "value", daily_sum=True, divide_by=60_000, decimals=1),
+    )),
+    Aggregation(Table.DAILY_SLEEP, (
+        Input(Table.FITBIT_SLEEP, "value", daily_sum=True, divide_by=60, decimals=2),
+        Input(Table.GARMIN_WELLNESS, "sleep_seconds", divide_by=3600, decimals=2),
+    )),
+    Aggregation(Table.DAILY_GITHUB_CONTRIBUTIONS, (Input(Table.GITHUB_CONTRIBUTIONS, "value"),)),
+    Aggregation(Table.DAILY_GYMGROUP_VISITS, (
+        Input(Table.GYMGROUP_VISITS, "duration_ms", divide_by=60_000, decimals=1),
+    ), by_category=True),
+    Aggregation(Table.DAILY_KINDLE_READING, (
+        Input(Table.KINDLE_READING, "reading_ms", daily_sum=True, divide_by=60_000, decimals=1),
+    ), by_category=True),
+    Aggregation(Table.DAILY_MACOS_COMMANDS, (
+        Input(Table.MACOS_COMMANDS, "count"),
+    ), by_category=True),
+    Aggregation(Table.DAILY_MACOS_SCREENTIME, (
+        Input(Table.MACOS_SCREENTIME, "usage_secs", daily_sum=True, divide_by=60, decimals=1),
+    ), by_category=True),
+    Aggregation(Table.DAILY_STRONG_WORKOUTS, (
+        Input(Table.STRONG_WORKOUTS, "duration_sec", divide_by=60, decimals=1),
+    ), by_category=True),
+]
 
-def _aggregate_steps(fitbit_df: pl.DataFrame | None, garmin_df: pl.DataFrame | None) -> pl.DataFrame:
-    parts = []
-    if fitbit_df is not None:
-        parts.append(fitbit_df.group_by("date").agg(pl.col("value").sum()))
-    if garmin_df is not None:
-        parts.append(garmin_df.select(pl.col("date"), pl.col("steps").cast(pl.Float64).alias("value")).drop_nulls("value"))
-    return pl.concat(parts).group_by("date").agg(pl.col("value").max()).sort("date")
-
-def _aggregate_calories(fitbit_df: pl.DataFrame | None, garmin_df: pl.DataFrame | None) -> pl.DataFrame:
-    parts = []
-    if fitbit_df is not None:
-        parts.append(fitbit_df.group_by("date").agg(pl.col("value").sum()))
-    if garmin_df is not None:
-        parts.append(garmin_df.select(pl.col("date"), pl.col("calories").cast(pl.Float64).alias("value")).drop_nulls("value"))
-    return pl.concat(parts).group_by("date").agg(pl.col("value").max()).sort("date")
 
-def _aggregate_sleep(fitbit_df: pl.DataFrame | None, garmin_df: pl.DataFrame | None) -> pl.DataFrame:
-    parts = []
-    if fitbit_df is not None:
-        parts.append(
-            fitbit_df.group_by("date").agg(pl.col("value").sum())
-            .with_columns((pl.col("value") / 60).round(2).alias("value"))
-        )
-    if garmin_df is not None:
-        parts.append(
-            garmin_df.select(pl.col("date"), (pl.col("sleep_seconds").cast(pl.Float64) / 3600).round(2).alias("value"))
-            .drop_nulls("value")
+# ── Job ───────────────────────────────────────────────────────────────────────
+
+def aggregate_into_daily_tables(
+    r2: R2Client, config: PipelineConfig, only: Collection[Table] | None = None,
+) -> None:
+    """Rebuild the daily tables whose inputs changed; only limits it to those tables."""
+    tables = lineage.table_fingerprints(r2)
+    stale: list[Aggregation] = []
+    for agg in _AGGREGATIONS:
+        if only is not None and agg.output not in only:
+            continue
+        fingerprints = {str(i.table): tables.get(i.table) for i in agg.inputs}
+        reason = lineage.stale(
+            r2, "aggregations", agg.output, fingerprints, repr(agg), tables.get(agg.output),
+            config.force,
         )
-    return pl.concat(parts).group_by("date").agg(pl.col("value").max()).sort("date")
-
-def _aggregate_exercise(fitbit_df: pl.DataFrame | None, garmin_df: pl.DataFrame | None) -> pl.DataFrame:
-    if fitbit_df is None:
-        return pl.DataFrame({"date": [], "value": []}, schema={"date": pl.Date, "value": pl.Float64})
-    return (
-        fitbit_df.group_by("date").agg(pl.col("value").sum())
-        .with_columns((pl.col("value") / 60_000).round(1).alias("value"))
-        .sort("date")
-    )
-
-def _aggregate_gym_group(df: pl.DataFrame) -> pl.DataFrame:
-    return (
-        df.with_columns((pl.col("duration_ms") / 60_000).round(1).alias("value"))
-        .select(["date", "category", "value"])
-    )
-
-def _aggregate_kindle(df: pl.DataFrame) -> pl.DataFrame:
-    return (
-        df.group_by(["date", "category"])
-        .agg((pl.col("reading_ms").sum() / 60_000).round(1).alias("value"))
-        .sort("date")
-    )
-
-def _aggregate_macos_commands(df: pl.DataFrame) -> pl.DataFrame:
-    return (
-        df.with_columns(pl.col("count").cast(pl.Float64).alias("value"))
-        .select(["date", "category", "value"])
-    )
-
-def _aggregate_macos_screentime(df: pl.DataFrame) -> pl.DataFrame:
-    return (
-        df.group_by(["date", "category"])
-        .agg((pl.col("usage_secs").sum() / 60).round(1).alias("value"))
-        .sort("date")
-    )
+        if reason is None:
+            with metrics.span("aggregation", agg.output) as span:
+                span.status = "skipped"
+            print(f"[{agg.output}] inputs unchanged, skipping")
+        else:
+            print(f"[{agg.output}] {reason}, rebuilding")
+            stale.append(agg)
+
+    window = config.aggregate_window
+    if window is not None:
+        print(f"aggregation window: {window[0] or 'start'} → {window[1] or 'end'}")
+
+    if window is not None:
+        # Only the window is rebuilt from these inputs; the next full run must redo the rest
+        for agg in stale:
+            lineage.forget(r2, "aggregations", agg.output)
+
+    def built(agg: Aggregation) -> None:
+        if window is None:
+            stored = R2.head(r2, construct_table_path(agg.output))
+            fingerprints = {str(i.table): tables.get(i.table) for i in agg.inputs}
+            etag = stored.etag if stored else None
+            lineage.record(r2, "aggregations", agg.output, fingerprints, repr(agg), etag)
+
+    try:
+        aggregate(r2, stale, streaming=config.aggregate_streaming, window=window, built=built)
+    finally:
+        lineage.save(r2)
+
+
+def downstream(tables: Collection[str]) -> list[Table]:
+    """The daily tables built from any of these source tables."""
+    return [agg.output for agg in _AGGREGATIONS if any(i.table in tables for i in agg.inputs)]
+
+
+def aggregate(
+    r2: R2Client,
+    aggregations: list[Aggregation],
+    streaming: bool = False,
+    window: tuple[date | None, date | None] | None = None,
+    built: Callable[[Aggregation], None] | None = None,
+) -> None:
+    """Build every table in one pl.collect_all, so inputs shared between tables are
+    scanned once and the plans run in parallel. streaming runs the plans on Polars'
+    streaming engine, for inputs larger than memory.
+
+    With window=(start, end), only input rows in the window are read (the filter is
+    pushed into the Parquet scans) and the results replace just that window of each
+    daily table.
+
+    built is called with each aggregation once its table is stored (or found to have
+    no input data), so a failure part way leaves the rest to be retried.
+    """
+    built = built or (lambda agg: None)
+    scan = _scanner(r2, window)
+    plans: dict[Aggregation, pl.LazyFrame] = {}
+    for agg in aggregations:
+        plan = compile_aggregation(agg, scan)
+        if plan is None:
+            print(f"[{agg.output}] no data, skipping")
+            built(agg)
+        else:
+            plans[agg] = plan
+    if not plans:
+        return
 
-def _aggregate_strong_workouts(df: pl.DataFrame) -> pl.DataFrame:
+    with metrics.span("aggregation", "collect_all"):
+        results = pl.collect_all(plans.values(), engine="streaming" if streaming else "auto")
+    for agg, df in zip(plans, results):
+        with metrics.span("aggregation", agg.output) as span:
+            key = construct_table_path(agg.output)
+            R2.store_parquet(r2, key, df, sort_col="date", overwrite=True, window=window)
+            span.rows = len(df)
+        print(f"[{agg.output}] {len(df)} rows")
+        built(agg)
+
+
+def compile_aggregation(
+    agg: Aggregation, scan: Callable[[Table], pl.LazyFrame | None],
+) -> pl.LazyFrame | None:
+    """Return the query plan for one daily table, or None if none of its inputs exist."""
+    parts = []
+    for i in agg.inputs:
+        source = scan(i.table)
+        if source is None:
+            continue
+        if i.daily_sum:
+            parts.append(source.group_by(agg.keys).agg(i.value()))
+        else:
+            parts.append(source.select(*agg.keys, i.value()))
+    if not parts:
+        return None
+    if len(agg.inputs) == 1:
+        return parts[0].sort(agg.keys)
     return (
-        df.with_columns((pl.col("duration_sec") / 60).round(1).alias("value"))
-        .select(["date", "category", "value"])
+        pl.concat([p.drop_nulls("value") for p in parts])
+        .group_by(agg.keys)
+        .agg(pl.col("value").max())
+        .sort(agg.keys)
     )
 
 
-_AGGREGATIONS: list[tuple[list[Table], Table, Callable]] = [
-    ([Table.FITBIT_CALORIES, Table.GARMIN_WELLNESS],      Table.DAILY_CALORIES,      _aggregate_calories),
-    ([Table.FITBIT_STEPS, Table.GARMIN_WELLNESS],         Table.DAILY_STEPS,          _aggregate_steps),
-    ([Table.FITBIT_EXERCISE, Table.GARMIN_WELLNESS],      Table.DAILY_EXERCISE,       _aggregate_exercise),
-    ([Table.FITBIT_SLEEP, Table.GARMIN_WELLNESS],         Table.DAILY_SLEEP,          _aggregate_sleep),
-    ([Table.GITHUB_CONTRIBUTIONS], Table.DAILY_GITHUB_CONTRIBUTIONS,  lambda df: df),
-    ([Table.GYMGROUP_VISITS],      Table.DAILY_GYMGROUP_VISITS,       _aggregate_gym_group),
-    ([Table.KINDLE_READING],       Table.DAILY_KINDLE_READING,        _aggregate_kindle),
-    ([Table.MACOS_COMMANDS],       Table.DAILY_MACOS_COMMANDS,        _aggregate_macos_commands),
-    ([Table.MACOS_SCREENTIME],     Table.DAILY_MACOS_SCREENTIME,      _aggregate_macos_screentime),
-    ([Table.STRONG_WORKOUTS],      Table.DAILY_STRONG_WORKOUTS,       _aggregate_strong_workouts),
-]
-
+def _scanner(
+    r2: R2Client, window: tuple[date | None, date | None] | None,
+) -> Callable[[Table], pl.LazyFrame | None]:
+    """Memoized scans, so every plan reading a table shares one scan of it."""
+    scans: dict[Table, pl.LazyFrame | None] = {}
 
-def aggregate_into_daily_tables(r2: R2Client, config: PipelineConfig) -> None:
-    for inputs, output, transform in _AGGREGATIONS:
-        _agg(r2, inputs=inputs, output=output, transform=transform)
-
-
-def _agg(r2: R2Client, inputs: list[Table], output: Table, transform: Callable) -> None:
-    frames = [R2.load_parquet(r2, construct_table_path(t)) for t in inputs]
-    if all(df is None for df in frames):
-        print(f"[{output}] no data, skipping")
-        return
+    def scan(table: Table) -> pl.LazyFrame | None:
+        if table not in scans:
+            key = construct_table_path(table)
+            source = R2.scan_parquet(r2, key) if R2.exists(r2, key) else None
+            if source is not None and window is not None:
+                source = source.filter(R2.in_date_window(*window))
+            scans[table] = source
+        return scans[table]
 
-    result = transform(*frames)
-    R2.store_parquet(r2, construct_table_path(output), result, sort_col="date", overwrite=True)
-    print(f"[{output}] {len(result)} rows")
+    return scan
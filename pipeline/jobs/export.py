@@ -4,18 +4,36 @@ Export daily Parquet files to the public web bucket as JSON.
 
 from __future__ import annotations
 
+import gzip
+import hashlib
 import io
 import json
+import struct
+from collections.abc import Collection
 from dataclasses import dataclass
 from datetime import date
+from typing import Literal
 
+import numpy as np
 import polars as pl
 
+from pipeline.common import lineage, metrics, paths
 from pipeline.common import r2 as R2
 from pipeline.common.config import PipelineConfig
-from pipeline.common import paths
 from pipeline.common.paths import Table
 from pipeline.common.r2 import R2Client, upload_bytes
+from pipeline.jobs.export_stats import summary_stats
+
+try:
+    import brotli
+except ImportError:  # optional: pip install year-in-data-pipeline[web]
+    brotli = None
+
+_INDEX_PATH = "index.json"
+_CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+_CACHE_LATEST = "public, max-age=300"
+_CACHE_INDEX = "no-cache"
+_OTHER = "other"
 
 
 @dataclass(frozen=True)
@@ -23,6 +41,9 @@ class ExportSpec:
     table: Table
     unit: str
     label: str
+    top_n: int | None = None                     # keep this many, fold the rest into "other"
+    top_n_by: Literal["total", "day"] = "total"  # rank over all history, or within each day
+    category_totals: bool = False                # add per-category totals (before folding)
 
 
 _EXPORTS: list[ExportSpec] = [
@@ -33,58 +54,557 @@ _EXPORTS: list[ExportSpec] = [
     ExportSpec(Table.DAILY_GITHUB_CONTRIBUTIONS, "commits", "GitHub contributions"),
     ExportSpec(Table.DAILY_GYMGROUP_VISITS,      "minutes", "Gym duration"),
     ExportSpec(Table.DAILY_KINDLE_READING,       "minutes", "Reading time"),
-    ExportSpec(Table.DAILY_MACOS_COMMANDS,       "count",   "Shell commands"),
-    ExportSpec(Table.DAILY_MACOS_SCREENTIME,     "minutes", "Screen time"),
+    ExportSpec(Table.DAILY_MACOS_COMMANDS,       "count",   "Shell commands",
+               top_n=50, category_totals=True),
+    ExportSpec(Table.DAILY_MACOS_SCREENTIME,     "minutes", "Screen time",
+               top_n=30, category_totals=True),
     ExportSpec(Table.DAILY_STRONG_WORKOUTS,      "minutes", "Workout duration"),
 ]
 
 
-def export_to_web(r2: R2Client, config: PipelineConfig) -> None:
+def export_to_web(
+    r2: R2Client, config: PipelineConfig, only: Collection[Table] | None = None,
+) -> None:
+    """Export the daily tables that changed since their last export; only limits it to those
+    tables."""
     web_r2 = R2.make_web_client(config)
+    index = _load_index(web_r2)
+    tables = lineage.table_fingerprints(r2)
+    changed = False
+    exported = False
+    frames: dict[ExportSpec, pl.DataFrame] = {}
+    try:
+        for spec in _EXPORTS:
+            if only is not None and spec.table not in only:
+                continue
+            inputs = {str(spec.table): tables.get(spec.table)}
+            output = index["metrics"].get(spec.table, {}).get("sha256")
+            reason = lineage.stale(
+                r2, "exports", spec.table, inputs, repr(spec), output, config.force,
+            )
+            if reason is None:
+                with metrics.span("export", spec.table) as span:
+                    span.status = "skipped"
+                print(f"{spec.table}: input unchanged, skipping")
+                continue
+
+            print(f"{spec.table}: {reason}, exporting")
+            with metrics.span("export", spec.table) as span:
+                df = _load_export_frame(r2, spec)
+                if df is None:
+                    lineage.record(r2, "exports", spec.table, inputs, repr(spec), None)
+                    continue
+                extra = {"stats": summary_stats(df)}
+                if spec.category_totals:
+                    extra["category_totals"] = category_totals(df)
+                if spec.top_n is not None:
+                    df = rollup_categories(df, spec.top_n, spec.top_n_by)
+                frames[spec] = df
+                entry = _export_json(web_r2, spec, df, extra)
+                span.rows = len(df)
+            exported = True
+            lineage.record(r2, "exports", spec.table, inputs, repr(spec), entry["sha256"])
+            if entry != index["metrics"].get(spec.table):
+                index["metrics"][spec.table] = entry
+                changed = True
+    finally:
+        lineage.save(r2)
+
+    if exported or "dashboard" not in index:
+        with metrics.span("export", "dashboard"):
+            bundle = _export_bundle(web_r2, _bundle_frames(r2, frames), index.get("dashboard"))
+        if bundle != index.get("dashboard"):
+            index["dashboard"] = bundle
+            changed = True
+    else:
+        print("dashboard: exports unchanged, skipping")
+
+    if changed:
+        index["version"] += 1
+        index["updated_at"] = str(date.today())
+        body = json.dumps(index).encode()
+        _upload(web_r2, _INDEX_PATH, body, "application/json", None, _CACHE_INDEX)
+        print(f"index.json → version {index['version']}")
+
+
+def _bundle_frames(
+    r2: R2Client, exported: dict[ExportSpec, pl.DataFrame],
+) -> dict[ExportSpec, pl.DataFrame]:
+    """Frames for the dashboard bundle in _EXPORTS order, reloading the exports that were
+    skipped."""
+    frames = {}
     for spec in _EXPORTS:
-        daily_key = paths.construct_table_path(spec.table)
-        _export_json(r2, web_r2, daily_key, f"{spec.table}.json", spec.unit, spec.label)
+        df = exported.get(spec)
+        if df is None:
+            df = _load_export_frame(r2, spec, quiet=True)
+            if df is not None and spec.top_n is not None:
+                df = rollup_categories(df, spec.top_n, spec.top_n_by)
+        if df is not None:
+            frames[spec] = df
+    return frames
 
 
+def _load_export_frame(r2: R2Client, spec: ExportSpec, quiet: bool = False) -> pl.DataFrame | None:
+    """Read a daily Parquet from r2, sorted by date."""
+    daily_key = paths.construct_table_path(spec.table)
+    if not R2.exists(r2, daily_key):
+        if not quiet:
+            print(f"{daily_key} does not exist!")
+        return None
+    return R2.read_parquet(r2, daily_key).sort("date")
 
-def _export_json(
-    r2: R2Client,
-    web_r2: R2Client,
-    daily_key: str,
-    web_path: str,
-    unit: str,
-    label: str,
-) -> None:
-    """Read a daily Parquet from r2 and write aggregated JSON to web_r2.
+
+def _export_json(web_r2: R2Client, spec: ExportSpec, full: pl.DataFrame, extra: dict) -> dict:
+    """Write a daily table (after top_n folding) to web_r2 as JSON, with extra
+    top-level fields merged into the payload.
 
     Output format:
     {
       "source": "fitbit", "metric": "calories", "unit": "kcal",
       "label": "Calories burned", "updated_at": "2025-01-20",
+      "stats": {"years": {...}, "months": {...}, "weekdays": [...], ...},  (see export_stats)
+      "category_totals": [{"category": "git", "value": 5120.0}, ...],   (if spec.category_totals)
       "data": [{"date": "2025-01-01", "value": 2100.0}, ...]
     }
+
+    Skips the upload when the content hash of the data matches the sha256 metadata
+    on the existing web_path. Otherwise uploads web_path plus content-addressed
+    gzip/brotli copies, all precompressed. Returns the index.json entry.
     """
-    if not R2.exists(r2, daily_key):
-        print(f"{daily_key} does not exist!")
-        return
-
-    full = pl.read_parquet(io.BytesIO(R2.download_bytes(r2, daily_key))).sort("date")
-
-    records: list[dict] = []
-    for row in full.iter_rows(named=True):
-        entry: dict = {"date": str(row["date"]), "value": row["value"]}
-        if row.get("category") is not None:
-            entry["category"] = row["category"]
-        if row.get("image_url") is not None:
-            entry["image_url"] = row["image_url"]
-        records.append(entry)
-
-    payload = {
-        "name": web_path.strip(".json"),
-        "unit": unit,
-        "label": label,
-        "updated_at": str(date.today()),
-        "data": records,
+    web_path = f"{spec.table}.json"
+    unit, label = spec.unit, spec.label
+
+    name = web_path.removesuffix(".json")
+    _export_year_shards(web_r2, full, name, unit, label)
+
+    records = serialize_records(full)
+    digest = _content_hash(name, unit, label, records, extra)
+
+    stored = R2.head(web_r2, paths.construct_web_path(web_path))
+    if stored is not None and stored.metadata.get("sha256") == digest:
+        print(f"{web_path} unchanged, skipping")
+        meta = stored.metadata
+        variants = meta.get("variants", "gzip").split(",")
+        return _index_entry(web_path, digest, meta.get("updated_at", ""), variants)
+
+    updated_at = str(date.today())
+    body = _payload(name, unit, label, updated_at, records, extra)
+    variants = ["gzip", "br", "bin"] if brotli is not None else ["gzip", "bin"]
+    entry = _index_entry(web_path, digest, updated_at, variants)
+    metadata = {"sha256": digest, "updated_at": updated_at, "variants": ",".join(variants)}
+    gz = gzip.compress(body, compresslevel=9, mtime=0)
+    binary = gzip.compress(serialize_binary(full), compresslevel=9, mtime=0)
+
+    print(
+        f"uploading {len(full)} to {web_path} "
+        f"({len(body)} → {len(gz)} bytes gzip, {len(binary)} bytes binary)"
+    )
+    _upload(web_r2, entry["gzip"], gz, "application/json", "gzip", _CACHE_IMMUTABLE)
+    if "br" in entry:
+        br = brotli.compress(body, quality=11)
+        _upload(web_r2, entry["br"], br, "application/json", "br", _CACHE_IMMUTABLE)
+    _upload(web_r2, entry["bin"], binary, "application/octet-stream", "gzip", _CACHE_IMMUTABLE)
+    # Stable name for existing links; uploaded last so a failed run is retried next time
+    _upload(web_r2, web_path, gz, "application/json", "gzip", _CACHE_LATEST, metadata)
+    return entry
+
+
+def serialize_json(df: pl.DataFrame, name: str, unit: str, label: str, updated_at: str) -> bytes:
+    """Serialize a daily table to the export JSON without building per-row Python objects.
+
+    The output is byte-for-byte what json.dumps gives for the equivalent payload
+    of {"date", "value", "category"?, "image_url"?} dicts.
+    """
+    return _payload(name, unit, label, updated_at, serialize_records(df))
+
+
+def serialize_records(df: pl.DataFrame) -> str:
+    """Return the comma-joined JSON records of a daily table (the contents of "data")."""
+    if df.is_empty():
+        return ""
+    parts = [
+        pl.lit('{"date": "'),
+        pl.col("date").dt.to_string("%Y-%m-%d"),
+        pl.lit('", "value": '),
+        _json_numbers(df["value"]),
+    ]
+    for optional in ("category", "image_url"):
+        if optional in df.columns:
+            parts.append(
+                pl.when(pl.col(optional).is_not_null())
+                .then(pl.lit(f', "{optional}": ') + _json_strings(df[optional]))
+                .otherwise(pl.lit(""))
+            )
+    parts.append(pl.lit("}"))
+    return df.select(pl.concat_str(parts).str.join(", ")).item()
+
+
+def _payload(
+    name: str, unit: str, label: str, updated_at: str, records: str, extra: dict | None = None,
+) -> bytes:
+    meta = {"name": name, "unit": unit, "label": label, "updated_at": updated_at, **(extra or {})}
+    header = json.dumps({**meta, "data": []})
+    return (header.removesuffix("[]}") + "[" + records + "]}").encode()
+
+
+def _content_hash(name: str, unit: str, label: str, records: str, extra: dict | None = None) -> str:
+    """Hash everything in a payload except updated_at."""
+    parts = [name, unit, label, json.dumps(extra or {}, sort_keys=True), records]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+# ── Category rollup ───────────────────────────────────────────────────────────
+
+def rollup_categories(
+    df: pl.DataFrame, top_n: int, by: Literal["total", "day"] = "total",
+) -> pl.DataFrame:
+    """Keep the top_n categories and fold the rest into a single "other" category per day.
+
+    by="total" ranks categories by their value summed over all history; by="day"
+    keeps the top_n categories of each day separately.
+    """
+    if "category" not in df.columns:
+        return df
+
+    if by == "total":
+        top = (
+            df.group_by("category").agg(pl.col("value").sum())
+            .drop_nulls("category")
+            .sort(["value", "category"], descending=[True, False])
+            .head(top_n)["category"]
+        )
+        keep = pl.col("category").is_in(top.implode())
+    else:
+        rank = pl.struct(-pl.col("value"), pl.col("category")).rank("ordinal").over("date")
+        keep = rank <= top_n
+
+    return (
+        df.with_columns(
+            pl.when(keep | pl.col("category").is_null())
+            .then(pl.col("category"))
+            .otherwise(pl.lit(_OTHER))
+            .alias("category")
+        )
+        .group_by(["date", "category"], maintain_order=True)
+        .agg(pl.col("value").sum())
+        .with_columns(
+            pl.when(pl.col("category") == _OTHER)
+            .then(pl.col("value").round(1))
+            .otherwise(pl.col("value"))
+        )
+        .sort("date", maintain_order=True)
+    )
+
+
+def category_totals(df: pl.DataFrame) -> list[dict]:
+    """Return [{"category", "value"}] summed over all history, largest first."""
+    if "category" not in df.columns:
+        return []
+    return (
+        df.drop_nulls("category")
+        .group_by("category").agg(pl.col("value").sum().round(1))
+        .sort(["value", "category"], descending=[True, False])
+        .to_dicts()
+    )
+
+
+def _export_year_shards(
+    web_r2: R2Client,
+    full: pl.DataFrame,
+    name: str,
+    unit: str,
+    label: str,
+) -> None:
+    """Write {name}/{year}.json for every year whose data changed, plus {name}/manifest.json.
+
+    Manifest format:
+    {
+      "name": ..., "unit": ..., "label": ..., "updated_at": "2025-01-20",
+      "years": {"2025": {"path": "daily_steps/2025.json", "rows": 20,
+                         "min": 3100.0, "max": 12450.0, "sha256": ..., "updated_at": ...}}
+    }
+    """
+    manifest_path = f"{name}/manifest.json"
+    previous = (
+        json.loads(R2.download_bytes(web_r2, paths.construct_web_path(manifest_path)))["years"]
+        if R2.exists(web_r2, paths.construct_web_path(manifest_path)) else {}
+    )
+    by_year = full.with_columns(pl.col("date").dt.year().alias("year")).partition_by(
+        "year", as_dict=True, include_key=False, maintain_order=True
+    )
+    updated_at = str(date.today())
+
+    years: dict[str, dict] = {}
+    for (year,), part in sorted(by_year.items()):
+        records = serialize_records(part)
+        digest = _content_hash(name, unit, label, records)
+        prev = previous.get(str(year))
+        if prev is not None and prev["sha256"] == digest:
+            years[str(year)] = prev
+            continue
+
+        path = f"{name}/{year}.json"
+        payload = _payload(name, unit, label, updated_at, records)
+        body = gzip.compress(payload, compresslevel=9, mtime=0)
+        _upload(web_r2, path, body, "application/json", "gzip", _CACHE_LATEST)
+        years[str(year)] = {
+            "path": path,
+            "rows": len(part),
+            "min": part["value"].min(),
+            "max": part["value"].max(),
+            "sha256": digest,
+            "updated_at": updated_at,
+        }
+        print(f"uploading {len(part)} to {path}")
+
+    if years != previous:
+        manifest = {
+            "name": name, "unit": unit, "label": label, "updated_at": updated_at, "years": years,
+        }
+        body = json.dumps(manifest).encode()
+        _upload(web_r2, manifest_path, body, "application/json", None, _CACHE_INDEX)
+
+
+# ── Binary format ─────────────────────────────────────────────────────────────
+#
+# {table}.{hash12}.bin is a compact encoding of the same series. Little-endian,
+# with every array starting on a 4-byte boundary so it can be viewed in place
+# (e.g. new Float32Array(buffer, offset, n) in the browser):
+#
+#   offset  type          field
+#   0       char[4]       magic "YIDB"
+#   4       u8            version (2)
+#   5       u8            flags: bit 0 = has categories, bit 1 = codes are u32 (else u16)
+#   6       u16           reserved (0)
+#   8       i32           start date, days since 1970-01-01 (date of the first row)
+#   12      u32           n, number of rows
+#   16      u32           k, number of categories
+#   20      k × (u32 length, UTF-8 bytes)   category dictionary, then padding to 4
+#   ...     u16[n]        day deltas: row 0 = 0, row i = days since row i-1; padding to 4
+#   ...     f32[n]        values (NaN = null)
+#   ...     u16/u32[n]    category codes into the dictionary (max value = null), if flag bit 0
+#
+# Version 1 was the same with u16 category lengths, which capped a category at 64 KiB.
+
+_BIN_MAGIC = b"YIDB"
+_BIN_VERSION = 2
+_BIN_LENGTHS = {1: struct.Struct("<H"), 2: struct.Struct("<I")}  # category length, by version
+_BIN_HAS_CATEGORIES = 0b01
+_BIN_WIDE_CODES = 0b10
+_BIN_HEADER = struct.Struct("<4sBBHiII")
+
+
+def serialize_binary(df: pl.DataFrame) -> bytes:
+    """Encode a daily table (sorted by date) in the binary format above."""
+    days = df["date"].cast(pl.Int32).to_numpy()
+    start = int(days[0]) if len(days) else 0
+    deltas = np.diff(days, prepend=start).astype("<u2")
+    values = df["value"].cast(pl.Float32).fill_null(float("nan")).to_numpy().astype("<f4")
+
+    flags = 0
+    categories: list[str] = []
+    codes = None
+    if "category" in df.columns:
+        flags |= _BIN_HAS_CATEGORIES
+        categories = df["category"].drop_nulls().unique(maintain_order=True).to_list()
+        wide = len(categories) >= 0xFFFF
+        flags |= _BIN_WIDE_CODES if wide else 0
+        code_type = "<u4" if wide else "<u2"
+        null_code = np.iinfo(code_type).max
+        codes = (
+            df["category"]
+            .replace_strict(
+                categories, range(len(categories)), default=null_code, return_dtype=pl.UInt32,
+            )
+            .to_numpy()
+            .astype(code_type)
+        )
+
+    buf = io.BytesIO()
+    buf.write(_BIN_HEADER.pack(_BIN_MAGIC, _BIN_VERSION, flags, 0, start, len(df), len(categories)))
+    for category in categories:
+        encoded = category.encode()
+        buf.write(_BIN_LENGTHS[_BIN_VERSION].pack(len(encoded)))
+        buf.write(encoded)
+    _pad4(buf)
+    buf.write(deltas.tobytes())
+    _pad4(buf)
+    buf.write(values.tobytes())
+    if codes is not None:
+        buf.write(codes.tobytes())
+    return buf.getvalue()
+
+
+def deserialize_binary(data: bytes) -> pl.DataFrame:
+    """Reference decoder for serialize_binary: returns date, value (f32) and category columns."""
+    magic, version, flags, _, start, n, k = _BIN_HEADER.unpack_from(data, 0)
+    if magic != _BIN_MAGIC or version not in _BIN_LENGTHS:
+        raise ValueError(f"not a version {'/'.join(map(str, _BIN_LENGTHS))} binary export")
+    offset = _BIN_HEADER.size
+
+    categories: list[str] = []
+    length_field = _BIN_LENGTHS[version]
+    for _ in range(k):
+        (length,) = length_field.unpack_from(data, offset)
+        offset += length_field.size
+        categories.append(data[offset:offset + length].decode())
+        offset += length
+    offset += -offset % 4
+
+    deltas = np.frombuffer(data, "<u2", n, offset)
+    offset += 2 * n
+    offset += -offset % 4
+    values = np.frombuffer(data, "<f4", n, offset)
+    offset += 4 * n
+
+    days = start + np.cumsum(deltas, dtype=np.int64)
+    columns = {
+        "date": pl.Series("date", days).cast(pl.Int32).cast(pl.Date),
+        "value": pl.Series("value", values).fill_nan(None),
+    }
+    if flags & _BIN_HAS_CATEGORIES:
+        code_type = "<u4" if flags & _BIN_WIDE_CODES else "<u2"
+        codes = pl.Series("category", np.frombuffer(data, code_type, n, offset).astype(np.int64))
+        columns["category"] = codes.replace_strict(
+            range(len(categories)), categories, default=None, return_dtype=pl.Utf8
+        )
+    return pl.DataFrame(columns)
+
+
+def _pad4(buf: io.BytesIO) -> None:
+    buf.write(b"\0" * (-buf.tell() % 4))
+
+
+# ── Dashboard bundle ──────────────────────────────────────────────────────────
+#
+# dashboard.{hash12}.json holds every export on one shared date axis, so the
+# landing page can render all heatmaps from a single request:
+# {
+#   "updated_at": "2025-01-20",
+#   "dates": ["2025-01-01", ...],
+#   "metrics": {"daily_steps": {"unit": "steps", "label": "Steps", "values": [8012.0, null, ...]}},
+#   "categories": {"daily_kindle_reading": {"names": ["Dune", ...], "date_index": [0, 0, 3, ...],
+#                                           "category_index": [0, 2, 1, ...], "values": [...]}}
+# }
+# metrics.*.values is the daily total (summed over categories), null where a metric has no row.
+
+def _export_bundle(
+    web_r2: R2Client, frames: dict[ExportSpec, pl.DataFrame], previous: dict | None,
+) -> dict | None:
+    """Upload the dashboard bundle if its content changed; returns its index.json entry."""
+    if not frames:
+        return previous
+
+    bundle = build_bundle(frames)
+    digest = hashlib.sha256(json.dumps(bundle, sort_keys=True).encode()).hexdigest()
+    if previous is not None and previous["sha256"] == digest:
+        print("dashboard bundle unchanged, skipping")
+        return previous
+
+    updated_at = str(date.today())
+    body = json.dumps({"updated_at": updated_at, **bundle}).encode()
+    path = f"dashboard.{digest[:12]}.json"
+    gz = gzip.compress(body, compresslevel=9, mtime=0)
+    _upload(web_r2, path, gz, "application/json", "gzip", _CACHE_IMMUTABLE)
+    print(f"uploading dashboard bundle to {path} ({len(body)} → {len(gz)} bytes gzip)")
+    return {"sha256": digest, "updated_at": updated_at, "path": path}
+
+
+def build_bundle(frames: dict[ExportSpec, pl.DataFrame]) -> dict:
+    """Align every export on a shared date index (see the format above)."""
+    axis = (
+        pl.concat([df.select("date") for df in frames.values()])
+        .unique().sort("date")
+        .with_row_index("date_index")
+    )
+    wide = axis
+    categories: dict[str, dict] = {}
+    for spec, df in frames.items():
+        totals = df.group_by("date").agg(pl.col("value").sum().alias(spec.table))
+        wide = wide.join(totals, on="date", how="left")
+        if "category" in df.columns:
+            names = df["category"].drop_nulls().unique(maintain_order=True)
+            rows = df.drop_nulls("category").join(axis, on="date", how="left").with_columns(
+                pl.col("category").replace_strict(names, range(len(names)), return_dtype=pl.UInt32)
+            )
+            categories[spec.table] = {
+                "names": names.to_list(),
+                "date_index": rows["date_index"].to_list(),
+                "category_index": rows["category"].to_list(),
+                "values": rows["value"].to_list(),
+            }
+
+    wide = wide.sort("date_index")
+    return {
+        "dates": wide["date"].dt.to_string("%Y-%m-%d").to_list(),
+        "metrics": {
+            spec.table: {
+                "unit": spec.unit, "label": spec.label, "values": wide[spec.table].to_list(),
+            }
+            for spec in frames
+        },
+        "categories": categories,
     }
-    print(f"uploading {len(records)} to {web_path}")
-    upload_bytes(web_r2, f"{web_path}", json.dumps(payload).encode(), "application/json")
+
+
+# ── Web index ─────────────────────────────────────────────────────────────────
+#
+# index.json points at the content-addressed copy of every export:
+#   {"version": 3, "updated_at": "2025-01-20",
+#    "metrics": {"daily_steps": {"sha256": ..., "updated_at": ...,
+#                                "gzip": "daily_steps.1a2b3c4d5e6f.json",
+#                                "br": "daily_steps.1a2b3c4d5e6f.json.br",
+#                                "bin": "daily_steps.1a2b3c4d5e6f.bin"}},
+#    "dashboard": {"sha256": ..., "updated_at": ..., "path": "dashboard.1a2b3c4d5e6f.json"}}
+
+def _load_index(web_r2: R2Client) -> dict:
+    key = paths.construct_web_path(_INDEX_PATH)
+    if not R2.exists(web_r2, key):
+        return {"version": 0, "updated_at": "", "metrics": {}}
+    return json.loads(R2.download_bytes(web_r2, key))
+
+
+def _upload(
+    web_r2: R2Client,
+    path: str,
+    data: bytes,
+    content_type: str,
+    encoding: str | None,
+    cache_control: str,
+    metadata: dict[str, str] | None = None,
+) -> None:
+    upload_bytes(
+        web_r2, paths.construct_web_path(path), data, content_type, encoding, cache_control,
+        metadata,
+    )
+
+
+def _index_entry(web_path: str, digest: str, updated_at: str, variants: list[str]) -> dict:
+    stem = web_path.removesuffix(".json")
+    entry = {"sha256": digest, "updated_at": updated_at, "gzip": f"{stem}.{digest[:12]}.json"}
+    if "br" in variants:
+        entry["br"] = f"{stem}.{digest[:12]}.json.br"
+    if "bin" in variants:
+        entry["bin"] = f"{stem}.{digest[:12]}.bin"
+    return entry
+
+
+def _json_numbers(values: pl.Series) -> pl.Series:
+    """Format numbers as json.dumps does; Polars only differs for tiny exponents and infinities."""
+    text = values.cast(pl.Utf8)
+    if values.dtype.is_float():
+        odd = values.is_infinite() | ((values.abs() < 1e-4) & (values != 0))
+        if odd.any():
+            fixes = {v: json.dumps(v) for v in values.filter(odd).unique().to_list()}
+            text = pl.select(
+                pl.when(odd)
+                .then(values.replace_strict(fixes, default=None, return_dtype=pl.Utf8))
+                .otherwise(text)
+            ).to_series()
+    return text.fill_null("null")
+
+
+def _json_strings(values: pl.Series) -> pl.Series:
+    """JSON-encode strings once per distinct value rather than once per row."""
+    encoded = {v: json.dumps(v) for v in values.drop_nulls().unique().to_list()}
+    return values.replace_strict(encoded, default=None, return_dtype=pl.Utf8)
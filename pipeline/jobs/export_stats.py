@@ -0,0 +1,115 @@
+"""
+Summary statistics embedded in each export, so the website doesn't have to scan
+the full series: per-year/month totals and means, streaks, weekday profile and
+color-scale quantiles.
+
+Everything is computed from the daily totals on each export run, which the
+export's lineage already limits to tables that changed. Totals are summed
+unrounded and rounded only where they are published.
+"""
+
+from __future__ import annotations
+
+import polars as pl
+
+QUANTILES = [0.2, 0.4, 0.6, 0.8]
+
+
+def summary_stats(df: pl.DataFrame) -> dict:
+    """Return the "stats" block for a daily table.
+
+    {
+      "years":  {"2025": {"total": ..., "mean": ..., "days": ..., "quantiles": [...]}},
+      "months": {"2025-01": {"total": ..., "mean": ..., "days": ...}},
+      "weekdays": [mean Mon, ..., mean Sun],
+      "quantiles": [...],                       (over all history, for QUANTILES)
+      "longest_streak": {"days": 12, "start": "2025-01-03", "end": "2025-01-14"},
+      "current_streak": {"days": 4, "start": ..., "end": <last date with data>}
+    }
+    Means are per day with data; quantiles are over days with a positive value.
+    """
+    daily = (
+        df.group_by("date").agg(pl.col("value").sum())
+        .sort("date")
+        .with_columns(
+            pl.col("date").dt.strftime("%Y-%m").alias("month"),
+            pl.col("date").dt.year().cast(pl.Utf8).alias("year"),
+        )
+    )
+    return {
+        "years": _year_stats(daily),
+        "months": {
+            month: _period(total, days)
+            for month, total, days in _totals(daily, "month").iter_rows()
+        },
+        "weekdays": _weekday_means(daily),
+        "quantiles": _quantiles(daily["value"]),
+        **_streaks(daily),
+    }
+
+
+def _totals(daily: pl.DataFrame, period: str) -> pl.DataFrame:
+    return (
+        daily.group_by(period)
+        .agg(pl.col("value").sum().alias("total"), pl.len().alias("days"))
+        .sort(period)
+    )
+
+
+def _period(total: float, days: int) -> dict:
+    return {"total": round(total, 2), "mean": _mean(total, days), "days": days}
+
+
+def _year_stats(daily: pl.DataFrame) -> dict:
+    totals = _totals(daily, "year").iter_rows()
+    by_year = daily.partition_by("year", as_dict=True)
+    return {
+        year: {**_period(total, days), "quantiles": _quantiles(by_year[(year,)]["value"])}
+        for year, total, days in totals
+    }
+
+
+def _weekday_means(daily: pl.DataFrame) -> list[float | None]:
+    means = dict(
+        daily.group_by(pl.col("date").dt.weekday().alias("weekday"))
+        .agg(pl.col("value").mean())
+        .iter_rows()
+    )
+    return [None if means.get(day) is None else round(means[day], 2) for day in range(1, 8)]
+
+
+def _quantiles(values: pl.Series) -> list[float]:
+    positive = values.filter(values > 0)
+    if positive.is_empty():
+        return []
+    return [round(positive.quantile(q, "linear"), 2) for q in QUANTILES]
+
+
+def _streaks(daily: pl.DataFrame) -> dict:
+    """Longest and most recent run of consecutive days with a positive value."""
+    active = daily.filter(pl.col("value") > 0).select("date")
+    if active.is_empty():
+        return {"longest_streak": None, "current_streak": None}
+    runs = (
+        active.with_columns(
+            (pl.col("date").diff().dt.total_days().fill_null(1) != 1).cum_sum().alias("run")
+        )
+        .group_by("run")
+        .agg(
+            pl.col("date").min().alias("start"),
+            pl.col("date").max().alias("end"),
+            pl.len().alias("days"),
+        )
+        .sort("start")
+    )
+    longest = runs.sort(["days", "start"], descending=[True, True]).row(0, named=True)
+    current = runs.row(-1, named=True)
+    return {"longest_streak": _run(longest), "current_streak": _run(current)}
+
+
+def _run(row: dict) -> dict:
+    return {"days": row["days"], "start": str(row["start"]), "end": str(row["end"])}
+
+
+def _mean(total: float, days: int) -> float | None:
+    return round(total / days, 2) if days else None
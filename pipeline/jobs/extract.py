@@ -1,26 +1,18 @@
+from pipeline.common import metrics, profiling
 from pipeline.common.config import PipelineConfig
 from pipeline.common.r2 import R2Client
-from pipeline.common.paths import Source
-from pipeline.extract import fitbit, garmin, github, gymgroup, kindle, macos_commands, macos_screentime, strong
+from pipeline.extract import SOURCES, extractor
+
 
 def extract_from_sources(r2: R2Client, config: PipelineConfig):
     sources_to_extract = config.sources_to_extract
-    sources = [
-        (Source.GARMIN, garmin.extract_garmin),
-        (Source.STRONG, strong.extract_strong),
-        (Source.FITBIT, fitbit.extract_fitbit),
-        (Source.GITHUB, github.extract_github),
-        (Source.GYMGROUP, gymgroup.extract_gymgroup),
-        (Source.KINDLE, kindle.extract_kindle),
-        (Source.MACOS_COMMANDS, macos_commands.extract_macos_commands),
-        (Source.MACOS_SCREENTIME, macos_screentime.extract_macos_screentime)
-    ]
 
-    for source, extraction_function in sources:
+    for source in SOURCES:
         if not sources_to_extract or source in sources_to_extract:
             print(f"extracting {source}.. ")
             try:
-                extraction_function(r2, config)
+                with metrics.span("source", source), profiling.stage("source", source):
+                    extractor(source)(r2, config)
             except Exception as e:
                 print("error encounted")
                 print(e)
@@ -2,59 +2,85 @@
 Entry point for the yearly data pipeline.
 
   uv run python -m pipeline.main
+  uv run python -m pipeline.main --profile           # cProfile each job
+  PROFILE_SCOPE=fitbit uv run python -m pipeline.main --profile sample
+  uv run python -m pipeline.main --force             # ignore lineage and incremental state
+
+Each job holds a lease in the bucket while it runs (see pipeline.common.leases),
+so a second process started meanwhile skips the jobs the first is still running
+instead of racing it on the same tables.
 """
 
 from __future__ import annotations
 
+import argparse
 import sys
 import traceback
 
-from pipeline.common.config import PipelineConfig
-from pipeline.jobs import JobFn
-from pipeline.jobs.extract import extract_from_sources
-from pipeline.jobs.daily_aggregation import aggregate_into_daily_tables
-from pipeline.jobs.export import export_to_web
-from pipeline.common.r2 import make_client
+from pipeline.common import metrics, profiling
+from pipeline.common.config import PipelineConfig, profile_dir
+from pipeline.jobs import JOBS, load_job
 
-# Order determines execution sequence
-ALL_JOBS: list[JobFn] = [
-    extract_from_sources,
-    aggregate_into_daily_tables,
-    export_to_web
-]
 
+def run_pipeline(config: PipelineConfig, profile: profiling.ProfileMode | None = None) -> None:
+    if config.metrics_dir:
+        metrics.enable()
+    if profile:
+        profiling.enable(profile_dir(config), profile, config.profile_scope, config.profile_memory)
+    # Imported here so `--help` doesn't pay for polars and the storage backend
+    from pipeline.common import leases, lineage
+    from pipeline.common.r2 import make_client
 
-def run_pipeline(config: PipelineConfig) -> None:
     r2 = make_client(config)
+    run_id = leases.new_run_id()
 
-    jobs_to_run = [
-        job for job in ALL_JOBS
-        if not config.jobs_to_run or _job_name(job) in config.jobs_to_run
-    ]
+    unknown = [name for name in config.jobs_to_run if name not in JOBS]
+    if unknown:
+        print(f"unknown job(s) in JOBS_TO_RUN: {', '.join(unknown)} (expected: {', '.join(JOBS)})")
+    jobs_to_run = [name for name in JOBS if not config.jobs_to_run or name in config.jobs_to_run]
 
     failures: list[str] = []
 
-    for index, job in enumerate(jobs_to_run):
-        name = _job_name(job)
+    for index, name in enumerate(jobs_to_run):
         try:
-            print(f"{index}. running {name}...")
-            job(r2, config)
+            with leases.hold(r2, name, run_id) as lease:
+                if lease is None:
+                    print(f"{index}. {name} is running in another process, skipping")
+                    continue
+                print(f"{index}. running {name}...")
+                with metrics.span("job", name), profiling.stage("job", name):
+                    load_job(name)(r2, config)
         except Exception:
             traceback.print_exc()
             failures.append(name)
 
+    if config.metrics_dir:
+        metrics.write_reports(config.metrics_dir)
+    if profile:
+        profiling.write_summary()
+
+    skipped = lineage.skipped(r2)
+    if skipped:
+        print(
+            f"\nSkipped {len(skipped)} step(s) with unchanged inputs (--force to rerun): "
+            f"{', '.join(skipped)}"
+        )
+
     if failures:
         print(f"\n✗ Failed: {', '.join(failures)}")
         sys.exit(1)
     print("\nDone.")
 
 
-def _job_name(job: JobFn) -> str:
-    # e.g. pipeline.jobs.fitbit → fitbit; aggregate_daily → aggregate
-    module = getattr(job, "__module__", "")
-    return module.split(".")[-1]
-
-
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the yearly data pipeline.")
+    profiling.add_argument(parser)
+    parser.add_argument(
+        "--force", action="store_true",
+        help="reread every archive and rerun aggregations and exports even if their inputs are "
+             "unchanged",
+    )
+    args = parser.parse_args()
     config = PipelineConfig.load()
-    run_pipeline(config)
+    config.force = args.force
+    run_pipeline(config, profile=args.profile)
@@ -0,0 +1,271 @@
+"""
+Watch mode: a long-running process that publishes inbox uploads within seconds.
+
+  uv run python -m pipeline.watch
+  uv run python -m pipeline.watch --debounce 10 --max-interval 120
+
+Each poll is one listing of inbox/, compared per source (keys and ETags) with
+the previous one. The poll interval starts at --min-interval and doubles after
+every poll that finds nothing new, up to --max-interval; any change brings it back
+down to the minimum.
+
+A source with new files is processed once its inbox has been unchanged for
+--debounce seconds, so a burst of uploads is handled in one go (or after
+--max-delay if uploads keep coming). Processing extracts just the sources that
+are due, then rebuilds only the daily tables built from the tables that changed,
+and exports only those. Compaction is left to the nightly run.
+
+Jobs take the same leases as pipeline.main, so while the nightly run holds one
+the cycle is retried later. A failed cycle is retried with growing delays.
+SIGINT/SIGTERM lets the current cycle finish and then exits; a second signal
+stops at once.
+
+With metrics_dir set, the run report is rewritten after every cycle. Its totals
+cover the whole time the watcher has been running (only the latest spans are
+listed) and include, per source, the latency from a file's upload to its data
+being published (yid_publish_latency_seconds).
+"""
+
+from __future__ import annotations
+
+import argparse
+import signal
+import threading
+import time
+import traceback
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from pipeline.common import leases, lineage, metrics, paths
+from pipeline.common import r2 as R2
+from pipeline.common.config import PipelineConfig
+from pipeline.common.r2 import R2Client
+from pipeline.extract import SOURCES, extractor
+from pipeline.jobs.daily_aggregation import aggregate_into_daily_tables, downstream
+from pipeline.jobs.export import export_to_web
+
+_MIN_INTERVAL = 2.0     # seconds between polls while uploads are coming in
+_MAX_INTERVAL = 60.0    # seconds between polls when idle
+_DEBOUNCE = 5.0         # seconds a source's inbox must be unchanged before it is processed
+_MAX_DELAY = 60.0       # seconds after which a source is processed even if uploads keep coming
+_RETRY_DELAY = 30.0     # seconds before retrying a failed or deferred cycle, doubling each time
+_MAX_RETRY_DELAY = 900.0
+_SPAN_LIMIT = 1000      # spans kept for run_report.json; the per-stage totals cover every cycle
+
+
+@dataclass
+class _Pending:
+    """New files in a source's inbox, waiting to be processed."""
+    first_seen: float                   # monotonic times
+    changed_at: float
+    uploaded: dict[str, float] = field(default_factory=dict)  # inbox key → upload time (unix)
+    retries: int = 0
+    not_before: float = 0.0
+
+    def due_at(self, debounce: float, max_delay: float) -> float:
+        return max(min(self.changed_at + debounce, self.first_seen + max_delay), self.not_before)
+
+
+class Watcher:
+    def __init__(
+        self,
+        r2: R2Client,
+        config: PipelineConfig,
+        min_interval: float = _MIN_INTERVAL,
+        max_interval: float = _MAX_INTERVAL,
+        debounce: float = _DEBOUNCE,
+        max_delay: float = _MAX_DELAY,
+    ) -> None:
+        self.r2 = r2
+        self.config = config
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.interval = min_interval
+        wanted = config.sources_to_extract
+        self.sources = [s for s in SOURCES if not wanted or s in wanted]
+        self.stop = threading.Event()
+        # source → (key, etag) of its inbox files
+        self._listing: dict[str, frozenset[tuple[str, str]]] = {}
+        self._pending: dict[str, _Pending] = {}
+        # tables changed by an extraction whose downstream hasn't been published yet
+        self._unpublished: set[str] = set()
+
+    def run(self) -> None:
+        """Poll and process until stop is set."""
+        print(f"watching {paths.construct_inbox_prefix()} for {', '.join(self.sources)}")
+        while not self.stop.is_set():
+            try:
+                changed = self.poll()
+            except Exception as e:  # transient storage error: back off like an idle poll
+                print(f"poll failed: {e}")
+                changed = False
+            if changed or self._pending:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 2, self.max_interval)
+            due = self.due()
+            if due and not self.stop.is_set():
+                self.process(due)
+            self.stop.wait(self._sleep())
+
+    def poll(self) -> bool:
+        """List the inbox once; return whether any source's files changed since the last poll."""
+        prefix = paths.construct_inbox_prefix()
+        listing: dict[str, set[tuple[str, str]]] = defaultdict(set)
+        uploaded: dict[str, float] = {}
+        for obj in R2.iter_objects(self.r2, prefix):
+            source, _, name = obj.key.removeprefix(prefix).partition("/")
+            if source in self.sources and name and not name.endswith(".keep"):
+                listing[source].add((obj.key, obj.etag))
+                uploaded[obj.key] = obj.last_modified or time.time()
+
+        now = time.monotonic()
+        changed = False
+        for source in self.sources:
+            files = frozenset(listing.get(source, ()))
+            if files == self._listing.get(source, frozenset()):
+                continue
+            self._listing[source] = files
+            changed = True
+            if not files:
+                pending = self._pending.get(source)
+                # archived by another process, e.g. the nightly run
+                if pending is not None and not pending.retries:
+                    del self._pending[source]
+                continue
+            pending = self._pending.setdefault(source, _Pending(first_seen=now, changed_at=now))
+            pending.changed_at = now
+            pending.uploaded.update((key, uploaded[key]) for key, _ in files)
+            print(f"[{source}] {len(files)} file(s) in inbox")
+        return changed
+
+    def due(self) -> list[str]:
+        now = time.monotonic()
+        return [
+            s for s, p in self._pending.items() if p.due_at(self.debounce, self.max_delay) <= now
+        ]
+
+    def process(self, sources: list[str]) -> None:
+        """Extract the sources and publish what changed, in one cycle."""
+        print(f"processing {', '.join(sources)}...")
+        started = time.monotonic()
+        # Another process may have rewritten the lineage or tables since the last cycle
+        self.r2.cache.clear()
+        try:
+            done = self._cycle(sources, leases.new_run_id())
+        except Exception:
+            traceback.print_exc()
+            done = False
+        if not done:
+            delay = max(self._retry_later(source) for source in sources)
+            print(f"retrying {', '.join(sources)} in {delay:.0f}s")
+            self.write_reports()
+            return
+
+        published = time.time()
+        for source in sources:
+            pending = self._pending.pop(source)
+            self._listing[source] = frozenset()  # the extraction archived them
+            latencies = [published - uploaded for uploaded in pending.uploaded.values()]
+            for seconds in latencies:
+                metrics.publish_latency(source, seconds)
+            print(
+                f"[{source}] published {len(latencies)} file(s), "
+                f"{max(latencies):.1f}s after upload"
+            )
+        print(f"cycle took {time.monotonic() - started:.2f}s")
+        self.write_reports()
+
+    def _cycle(self, sources: list[str], run_id: str) -> bool:
+        """Return False if another process holds one of the jobs' leases."""
+        before = lineage.table_fingerprints(self.r2)
+        with leases.hold(self.r2, "extract", run_id) as lease:
+            if lease is None:
+                print("extract is running in another process, deferring")
+                return False
+            with metrics.span("job", "extract"):
+                for source in sources:
+                    with metrics.span("source", source):
+                        extractor(source)(self.r2, self.config)
+        after = lineage.table_fingerprints(self.r2)
+        self._unpublished |= {table for table, etag in after.items() if before.get(table) != etag}
+
+        outputs = downstream(self._unpublished)
+        if not outputs:
+            print("no tables changed, nothing to publish")
+            return True
+        print(f"publishing {', '.join(outputs)}")
+        jobs = (("daily_aggregation", aggregate_into_daily_tables), ("export", export_to_web))
+        for name, job in jobs:
+            with leases.hold(self.r2, name, run_id) as lease:
+                if lease is None:
+                    print(f"{name} is running in another process, deferring")
+                    return False
+                with metrics.span("job", name):
+                    job(self.r2, self.config, only=outputs)
+        self._unpublished.clear()
+        return True
+
+    def _retry_later(self, source: str) -> float:
+        pending = self._pending[source]
+        delay = min(_RETRY_DELAY * 2**pending.retries, _MAX_RETRY_DELAY)
+        pending.retries += 1
+        pending.not_before = time.monotonic() + delay
+        return delay
+
+    def _sleep(self) -> float:
+        """Seconds until the next poll or the next pending source falls due, whichever is sooner."""
+        now = time.monotonic()
+        due = [p.due_at(self.debounce, self.max_delay) - now for p in self._pending.values()]
+        return max(0.1, min([self.interval, *due]))
+
+    def write_reports(self) -> None:
+        if self.config.metrics_dir:
+            metrics.write_reports(self.config.metrics_dir)
+
+
+def _stop_on_signal(watcher: Watcher) -> None:
+    def handler(signum: int, frame) -> None:
+        if watcher.stop.is_set():
+            raise KeyboardInterrupt
+        name = signal.Signals(signum).name
+        print(f"\n{name}: stopping after the current cycle (again to stop now)")
+        watcher.stop.set()
+
+    signal.signal(signal.SIGINT, handler)
+    signal.signal(signal.SIGTERM, handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish inbox uploads as they arrive.")
+    parser.add_argument(
+        "--min-interval", type=float, default=_MIN_INTERVAL,
+        help="seconds between polls while uploads are coming in",
+    )
+    parser.add_argument(
+        "--max-interval", type=float, default=_MAX_INTERVAL,
+        help="seconds between polls when idle",
+    )
+    parser.add_argument(
+        "--debounce", type=float, default=_DEBOUNCE,
+        help="seconds a source's inbox must be unchanged before it is processed",
+    )
+    parser.add_argument(
+        "--max-delay", type=float, default=_MAX_DELAY,
+        help="process a source after this many seconds even if uploads keep coming",
+    )
+    args = parser.parse_args()
+
+    config = PipelineConfig.load()
+    if config.metrics_dir:
+        metrics.enable(span_limit=_SPAN_LIMIT)
+    watcher = Watcher(
+        R2.make_client(config), config,
+        args.min_interval, args.max_interval, args.debounce, args.max_delay,
+    )
+    _stop_on_signal(watcher)
+    watcher.run()
+    watcher.write_reports()
+    print("stopped")
@@ -0,0 +1,110 @@
+"""
+Benchmark archive listing against a synthetic bucket of daily archive folders.
+
+Compares the old list-everything-then-filter approach with the key-range scan in
+R2.list_archive_keys, counting list requests and wall time. Each list request
+sleeps for --latency-ms to stand in for the round trip to R2.
+
+  uv run python scripts/bench_archive_listing.py --years 5 --files-per-day 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pipeline.common import paths
+from pipeline.common import r2 as R2
+from pipeline.common.r2 import R2Client
+from pipeline.common.storage import ObjectInfo
+
+_PAGE_SIZE = 1000
+
+
+class SyntheticBucket:
+    """Just enough of the Storage protocol for archive listing, paged like S3."""
+
+    def __init__(self, keys: list[str], latency: float) -> None:
+        self.keys = sorted(keys)
+        self.latency = latency
+        self.list_requests = 0
+
+    def head(self, key: str) -> None:
+        return None
+
+    def list(self, prefix: str, start_after: str = ""):
+        matching = [k for k in self.keys if k.startswith(prefix) and k > start_after]
+        for i in range(0, len(matching), _PAGE_SIZE):
+            self.list_requests += 1
+            time.sleep(self.latency)
+            yield from (ObjectInfo(key=k, size=0) for k in matching[i:i + _PAGE_SIZE])
+
+
+def make_keys(years: int, files_per_day: int) -> list[str]:
+    today = date.today()
+    keys = []
+    for source in paths.Source:
+        for i in range(years * 365):
+            day = (today - timedelta(days=i)).isoformat()
+            for n in range(files_per_day):
+                keys.append(f"{paths.construct_archive_path(source)}/{day}/file{n}_{day}.json")
+    return keys
+
+
+def list_everything_then_filter(
+    r2: R2Client, archive_prefix: str, start: date, end: date,
+) -> list[str]:
+    keys = []
+    for key in R2.list_keys(r2, archive_prefix + "/"):
+        folder_date = date.fromisoformat(key.split("/")[-2])
+        if start <= folder_date <= end:
+            keys.append(key)
+    return keys
+
+
+def run(label: str, bucket: SyntheticBucket, fn) -> list:
+    bucket.list_requests = 0
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    print(f"  {label:<28} {elapsed * 1000:8.1f} ms  {bucket.list_requests:5d} list requests")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--files-per-day", type=int, default=3)
+    parser.add_argument("--window-days", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    keys = make_keys(args.years, args.files_per_day)
+    bucket = SyntheticBucket(keys, args.latency_ms / 1000)
+    r2 = R2Client(storage=bucket, bucket="bench", public_url="")
+    end = date.today()
+    start = end - timedelta(days=args.window_days)
+    prefixes = [paths.construct_archive_path(s) for s in paths.Source]
+    print(f"{len(keys)} keys, {len(prefixes)} sources, window {start} → {end}\n")
+
+    old = run("list all + filter", bucket, lambda: {
+        p: list_everything_then_filter(r2, p, start, end) for p in prefixes
+    })
+    new = run("range scan (sequential)", bucket, lambda: {
+        p: R2.list_archive_keys(r2, p, start=start, end=end) for p in prefixes
+    })
+    parallel = run("range scan (parallel)", bucket, lambda: R2.list_archive_keys_many(
+        r2, prefixes, start=start, end=end
+    ))
+    assert old == new == parallel, "listings differ"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark the export serializers on a synthetic category table (one row per
+category per day, like daily_macos_commands).
+
+- JSON: the columnar serializer against the previous iter_rows implementation,
+  checking the bytes are identical.
+- Binary: size against the JSON, and a round trip through the reference decoder.
+
+  uv run python scripts/bench_export.py --days 1825 --categories 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+import polars as pl
+
+from pipeline.jobs.export import deserialize_binary, serialize_binary, serialize_json
+
+
+def iter_rows_json(full: pl.DataFrame, name: str, unit: str, label: str, updated_at: str) -> bytes:
+    """The original per-row serializer, kept here as the reference."""
+    records: list[dict] = []
+    for row in full.iter_rows(named=True):
+        entry: dict = {"date": str(row["date"]), "value": row["value"]}
+        if row.get("category") is not None:
+            entry["category"] = row["category"]
+        if row.get("image_url") is not None:
+            entry["image_url"] = row["image_url"]
+        records.append(entry)
+    payload = {
+        "name": name, "unit": unit, "label": label, "updated_at": updated_at, "data": records,
+    }
+    return json.dumps(payload).encode()
+
+
+def make_table(days: int, categories: int, seed: int = 0) -> pl.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = date.today() - timedelta(days=days)
+    names = [f"cmd_{i}" for i in range(categories - 2)] + ["café", 'say "hi"']
+    n = days * categories
+    return pl.DataFrame({
+        "date": np.repeat(np.arange(days), categories),
+        "category": np.tile(names, days),
+        "value": np.round(rng.exponential(20.0, n), 1),
+    }).with_columns(
+        (pl.lit(start) + pl.duration(days=pl.col("date"))).alias("date"),
+        pl.when(pl.int_range(pl.len()) % 97 == 0)
+        .then(None)
+        .otherwise(pl.col("category"))
+        .alias("category"),
+    ).sort("date")
+
+
+def timed(fn) -> tuple[bytes, float]:
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--days", type=int, default=1825)
+    parser.add_argument("--categories", type=int, default=200)
+    args = parser.parse_args()
+
+    df = make_table(args.days, args.categories)
+    meta = ("daily_macos_commands", "count", "Shell commands", "2025-01-20")
+    print(f"{len(df)} rows\n")
+
+    old, old_s = timed(lambda: iter_rows_json(df, *meta))
+    new, new_s = timed(lambda: serialize_json(df, *meta))
+    print(f"  iter_rows + json.dumps  {old_s * 1000:9.1f} ms")
+    print(f"  columnar                {new_s * 1000:9.1f} ms  ({old_s / new_s:.1f}x)")
+    print(f"  {len(new)} bytes, identical: {old == new}")
+    if old != new:
+        sys.exit(1)
+
+    binary, bin_s = timed(lambda: serialize_binary(df))
+    decoded, dec_s = timed(lambda: deserialize_binary(binary))
+    expected = df.select("date", pl.col("value").cast(pl.Float32), "category")
+    round_trip = decoded.equals(expected)
+    print(f"\n  binary encode           {bin_s * 1000:9.1f} ms")
+    print(f"  binary decode           {dec_s * 1000:9.1f} ms")
+    print(
+        f"  {len(binary)} bytes ({len(new) / len(binary):.1f}x smaller than JSON), "
+        f"round trip: {round_trip}"
+    )
+    gz_json, gz_bin = (len(gzip.compress(b, mtime=0)) for b in (new, binary))
+    print(f"  gzipped: JSON {gz_json} bytes, binary {gz_bin} bytes ({gz_json / gz_bin:.1f}x)")
+    if not round_trip:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
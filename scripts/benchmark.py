@@ -0,0 +1,468 @@
+"""
+Benchmark every pipeline stage on synthetic data at a chosen scale.
+
+Generates inbox files for every source (scripts/fake_data.py), then runs each
+extractor, aggregation and the web export on the memory or local storage backend,
+recording wall time, peak RSS and bytes moved per stage. Results are compared
+with a stored baseline and the run fails if a stage regresses beyond --threshold.
+
+Startup stages time imports in a fresh interpreter (best of several runs) and
+fail if an entry point pulls in a heavy dependency it doesn't need.
+
+With --memory-budget, every extractor is run a second time under that budget
+(spilling to disk, see pipeline.common.spill) and the run fails unless it builds
+the same tables as the in-memory pass.
+
+  uv run python scripts/benchmark.py --scale 1y
+  uv run python scripts/benchmark.py --scale 5y --update-baseline
+  uv run python scripts/benchmark.py --scale commands-1m --threshold 0.25
+  uv run python scripts/benchmark.py --storage local
+  uv run python scripts/benchmark.py --startup-only
+  uv run python scripts/benchmark.py --scale takeout-gb --memory-budget 256MB
+
+Scales:
+  1y           one year of every source
+  5y           five years of every source
+  commands-1m  one year with ~1M lines of zsh history
+  takeout-gb   ten years of Fitbit at 30s resolution (~1 GB uncompressed takeout)
+
+Baselines are machine-specific and live in .benchmarks/{scale}-{storage}.json.
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import gc
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+from dataclasses import asdict, dataclass
+from datetime import date
+from pathlib import Path
+from typing import Callable
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+import fake_data
+import polars as pl
+
+from pipeline.common import metrics, paths, profiling
+from pipeline.common import r2 as R2
+from pipeline.common.config import PipelineConfig, parse_size
+from pipeline.common.paths import Source, Table
+from pipeline.extract import extractor
+
+_BASELINE_DIR = ROOT / ".benchmarks"
+
+
+@dataclass(frozen=True)
+class Scale:
+    days: int
+    fitbit_points_per_day: int = 24
+    commands_per_day: int = 100
+    screentime_sessions_per_day: int = 50
+
+
+SCALES: dict[str, Scale] = {
+    "1y":          Scale(days=365),
+    "5y":          Scale(days=1825),
+    "commands-1m": Scale(days=365, commands_per_day=2_740),
+    "takeout-gb":  Scale(days=3650, fitbit_points_per_day=2_880),
+}
+
+
+@dataclass
+class StageResult:
+    stage: str
+    status: str                  # ok | failed | skipped
+    seconds: float = 0.0
+    peak_rss_bytes: int | None = None
+    bytes_in: int = 0
+    bytes_out: int = 0
+    requests: int = 0
+
+
+# ── Startup ───────────────────────────────────────────────────────────────────
+
+_STARTUP_RUNS = 5
+
+# name → (statement, modules it must not import)
+STARTUP: dict[str, tuple[str, list[str]]] = {
+    "pipeline.main": (
+        "import pipeline.main",
+        ["polars", "boto3", "httpx", "garminconnect", "sqlite3"],
+    ),
+    "job/export": (
+        "from pipeline.jobs import load_job; load_job('export')",
+        ["boto3", "httpx", "garminconnect", "sqlite3"],
+    ),
+    "source/github": (
+        "from pipeline.extract import extractor; extractor('github')",
+        ["boto3", "httpx", "garminconnect", "sqlite3", "numpy"],
+    ),
+    "source/garmin": (
+        "from pipeline.extract import extractor; extractor('garmin')",
+        ["boto3", "httpx", "garminconnect", "sqlite3", "numpy"],
+    ),
+}
+
+_STARTUP_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+exec(sys.argv[1])
+print(json.dumps({"seconds": time.perf_counter() - t0, "modules": sorted(sys.modules)}))
+"""
+
+
+def startup_stages() -> list[StageResult]:
+    results = []
+    for name, (statement, forbidden) in STARTUP.items():
+        runs = []
+        for _ in range(_STARTUP_RUNS):
+            proc = subprocess.run(
+                [sys.executable, "-c", _STARTUP_PROBE, statement],
+                cwd=ROOT, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                print(f"  startup/{name}: {proc.stderr.strip().splitlines()[-1]}")
+                break
+            runs.append(json.loads(proc.stdout.splitlines()[-1]))
+        if len(runs) < _STARTUP_RUNS:
+            results.append(StageResult(stage=f"startup/{name}", status="failed"))
+            continue
+        loaded = set(runs[0]["modules"])
+        heavy = [m for m in forbidden if m in loaded]
+        if heavy:
+            print(f"  startup/{name}: imports {', '.join(heavy)}")
+        results.append(StageResult(
+            stage=f"startup/{name}",
+            status="failed" if heavy else "ok",
+            seconds=round(min(r["seconds"] for r in runs), 4),
+        ))
+    return results
+
+
+# ── Stages ────────────────────────────────────────────────────────────────────
+
+def run_stage(name: str, fn: Callable[[], object], recorder: metrics.Recorder) -> StageResult:
+    before = _storage_totals(recorder)
+    gc.collect()
+    profiling.reset_peak_rss()
+    t0 = time.perf_counter()
+    try:
+        fn()
+        status = "ok"
+    except ImportError as e:
+        print(f"  {name}: skipped ({e})")
+        status = "skipped"
+    except Exception:
+        traceback.print_exc()
+        status = "failed"
+    seconds = time.perf_counter() - t0
+    after = _storage_totals(recorder)
+    return StageResult(
+        stage=name,
+        status=status,
+        seconds=round(seconds, 4),
+        peak_rss_bytes=profiling.peak_rss(),
+        bytes_in=after[0] - before[0],
+        bytes_out=after[1] - before[1],
+        requests=after[2] - before[2],
+    )
+
+
+def _storage_totals(recorder: metrics.Recorder) -> tuple[int, int, int]:
+    with recorder._lock:
+        stats = list(recorder.requests.values())
+    return (
+        sum(s.bytes_in for s in stats), sum(s.bytes_out for s in stats), sum(s.count for s in stats)
+    )
+
+
+def fill_inbox(r2: R2.R2Client, scale: Scale) -> None:
+    today = date.today().isoformat()
+    fitbit = fake_data.make_fitbit_zip(scale.days, scale.fitbit_points_per_day)
+    files = {
+        Source.FITBIT:   [(f"takeout_{today}.zip", fitbit)],
+        Source.KINDLE:   [(f"kindle_{today}.zip", fake_data.make_kindle_zip(scale.days))],
+        Source.STRONG:   [(f"strong_{today}.csv", fake_data.make_strong_csv(scale.days))],
+        Source.GITHUB:   [(f"contributions_{today}.json", fake_data.make_github_days(scale.days))],
+        Source.GYMGROUP: [(f"checkins_{today}.json", fake_data.make_gymgroup_checkins(scale.days))],
+        Source.GARMIN:   [
+            (f"wellness-{today}.json", fake_data.make_garmin_wellness(scale.days)),
+            (f"activities-{today}.json", fake_data.make_garmin_activities(scale.days)),
+        ],
+    }
+    for source, entries in files.items():
+        for name, data in entries:
+            R2.upload_bytes(r2, f"{paths.construct_inbox_path(source)}/{name}", data)
+            print(f"  {source}/{name}: {len(data) / 1024**2:.1f} MiB")
+
+
+def parse_local_sources(
+    r2: R2.R2Client, scale: Scale, tmp: Path, recorder: metrics.Recorder,
+) -> list[StageResult]:
+    """Parse a zsh history and a knowledgeC.db as the sync_macos fetchers do, then
+    upload the records to the inbox for the extract stages."""
+    from pipeline.extract import macos_commands, macos_screentime
+
+    history = tmp / "zsh_history"
+    db = tmp / "knowledgeC.db"
+    lines = fake_data.make_zsh_history(history, scale.days, scale.commands_per_day)
+    sessions = fake_data.make_knowledge_db(db, scale.days, scale.screentime_sessions_per_day)
+    print(f"  zsh history: {lines} lines, knowledgeC.db: {sessions} sessions")
+
+    parsed: dict[Source, list[dict]] = {}
+    results = [
+        run_stage("parse/macos_commands", lambda: parsed.update({
+            Source.MACOS_COMMANDS: macos_commands._parse_history(history)
+        }), recorder),
+        run_stage("parse/macos_screentime", lambda: parsed.update({
+            Source.MACOS_SCREENTIME: macos_screentime._query_db(db)
+        }), recorder),
+    ]
+    today = date.today().isoformat()
+    for source, records in parsed.items():
+        key = f"{paths.construct_inbox_path(source)}/{source}_{today}.json"
+        R2.upload_bytes(r2, key, json.dumps(records).encode())
+    return results
+
+
+def run_benchmark(
+    scale: Scale, seed: int, storage: str, tmp: Path, memory_budget: int | None = None,
+) -> list[StageResult]:
+    from pipeline.jobs import daily_aggregation
+    from pipeline.jobs.export import export_to_web
+
+    random.seed(seed)
+    config = PipelineConfig.load(ROOT / "config" / "test.yaml", ".env.local.example")
+    config.storage_backend = storage
+    config.storage_dir = str(tmp / "storage")
+    recorder = metrics.enable()
+    r2 = R2.make_client(config)
+
+    print("── Generating data ─────────────────────────────────────────────")
+    fill_inbox(r2, scale)
+    results: list[StageResult] = []
+    results += parse_local_sources(r2, scale, tmp, recorder)
+
+    print("\n── Running stages ──────────────────────────────────────────────")
+    for source in Source:
+        had_inbox = bool(R2.list_keys(r2, f"{paths.construct_inbox_path(source)}/"))
+        result = run_stage(
+            f"extract/{source}", lambda source=source: extractor(source)(r2, config), recorder,
+        )
+        empty = _empty_tables(r2, source) if had_inbox and result.status == "ok" else []
+        if empty:
+            # The fake data no longer parses: the stage would be timing nothing
+            print(
+                f"  extract/{source}: no rows in {', '.join(empty)} although its inbox had files"
+            )
+            result.status = "failed"
+        results.append(result)
+    if memory_budget is not None:
+        results += run_budgeted_extracts(r2, config, memory_budget, recorder)
+
+    aggregations = daily_aggregation._AGGREGATIONS
+    for agg in aggregations:
+        results.append(run_stage(
+            f"aggregate/{agg.output}",
+            lambda agg=agg: daily_aggregation.aggregate(r2, [agg]),
+            recorder,
+        ))
+    # Every table in one collect_all, sharing scans of common inputs
+    results.append(run_stage(
+        "aggregate/all", lambda: daily_aggregation.aggregate(r2, aggregations), recorder,
+    ))
+    results.append(run_stage(
+        "aggregate/all-streaming",
+        lambda: daily_aggregation.aggregate(r2, aggregations, streaming=True),
+        recorder,
+    ))
+
+    results.append(run_stage("export", lambda: export_to_web(r2, config), recorder))
+    return results
+
+
+def _empty_tables(r2: R2.R2Client, source: Source) -> list[str]:
+    """The source's tables that are missing or have no rows."""
+    tables = [t for t in Table if t == source or t.startswith(f"{source}_")]
+    return [
+        t for t in tables
+        if not R2.exists(r2, key := paths.construct_table_path(t))
+        or R2.read_parquet(r2, key).is_empty()
+    ]
+
+
+def run_budgeted_extracts(
+    r2: R2.R2Client, config: PipelineConfig, budget: int, recorder: metrics.Recorder,
+) -> list[StageResult]:
+    """Rerun every extractor under the memory budget and check it rebuilds the same tables."""
+    expected = _tables(r2)
+    budgeted = dataclasses.replace(config, extract_memory_budget=budget, force=True)
+    results = [
+        run_stage(
+            f"extract-budget/{source}",
+            lambda source=source: extractor(source)(r2, budgeted),
+            recorder,
+        )
+        for source in Source
+    ]
+    actual = _tables(r2)
+    mismatched = sorted(
+        name for name in expected.keys() | actual.keys()
+        if not _same_rows(expected.get(name), actual.get(name))
+    )
+    if mismatched:
+        print(f"  tables differ from the in-memory pass: {', '.join(mismatched)}")
+    results.append(StageResult("extract-budget/same-tables", "failed" if mismatched else "ok"))
+    return results
+
+
+def _tables(r2: R2.R2Client) -> dict[str, pl.DataFrame]:
+    prefix = paths.construct_tables_prefix()
+    return {key.removeprefix(prefix): R2.read_parquet(r2, key) for key in R2.list_keys(r2, prefix)}
+
+
+def _same_rows(a: pl.DataFrame | None, b: pl.DataFrame | None) -> bool:
+    """Equal up to the order of rows, which sort_col leaves open for rows on the same date."""
+    if a is None or b is None:
+        return a is b
+    return a.schema == b.schema and a.sort(a.columns).equals(b.sort(b.columns))
+
+
+# ── Baseline ──────────────────────────────────────────────────────────────────
+
+def compare(
+    results: list[StageResult], baseline: dict, threshold: float, min_seconds: float,
+) -> list[str]:
+    """Return a description of every stage that regressed beyond threshold."""
+    regressions = []
+    base_stages = baseline.get("stages", {})
+    for r in results:
+        base = base_stages.get(r.stage)
+        if base is None or r.status != "ok" or base["status"] != "ok":
+            continue
+        checks = [
+            ("time", r.seconds, base["seconds"], max(r.seconds, base["seconds"]) >= min_seconds),
+            ("peak RSS", r.peak_rss_bytes or 0, base["peak_rss_bytes"] or 0, True),
+            ("bytes moved", r.bytes_in + r.bytes_out, base["bytes_in"] + base["bytes_out"], True),
+        ]
+        for label, current, previous, significant in checks:
+            if significant and previous > 0 and current > previous * (1 + threshold):
+                change = current / previous - 1
+                regressions.append(f"{r.stage}: {label} {change:+.0%} ({previous} → {current})")
+    return regressions
+
+
+def print_results(results: list[StageResult], baseline: dict | None) -> None:
+    base_stages = (baseline or {}).get("stages", {})
+    print(
+        f"\n  {'stage':<36} {'time':>9} {'Δ':>6} {'peak RSS':>10} "
+        f"{'in':>9} {'out':>9} {'reqs':>6}"
+    )
+    for r in results:
+        if r.status != "ok":
+            print(f"  {r.stage:<36} {r.status:>9}")
+            continue
+        base = base_stages.get(r.stage)
+        delta = f"{r.seconds / base['seconds'] - 1:+.0%}" if base and base.get("seconds") else ""
+        rss = f"{r.peak_rss_bytes / 1024**2:.0f} MiB" if r.peak_rss_bytes else "?"
+        print(
+            f"  {r.stage:<36} {r.seconds * 1000:7.0f}ms {delta:>6} {rss:>10} "
+            f"{_mib(r.bytes_in):>9} {_mib(r.bytes_out):>9} {r.requests:>6}"
+        )
+
+
+def _mib(n: int) -> str:
+    return f"{n / 1024**2:.1f}M"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--scale", choices=SCALES, default="1y")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--storage", choices=["memory", "local"], default="memory",
+        help="storage backend to run against",
+    )
+    parser.add_argument(
+        "--startup-only", action="store_true",
+        help="only run the startup (import time) stages",
+    )
+    parser.add_argument(
+        "--baseline", type=Path,
+        help="baseline file (default: .benchmarks/{scale}-{storage}.json)",
+    )
+    parser.add_argument(
+        "--update-baseline", action="store_true",
+        help="write this run as the new baseline",
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.2,
+        help="allowed regression, as a fraction",
+    )
+    parser.add_argument(
+        "--min-seconds", type=float, default=0.05,
+        help="ignore timing changes in stages faster than this",
+    )
+    parser.add_argument(
+        "--memory-budget", type=parse_size,
+        help="also run the extractors under this budget, e.g. 256MB, and check the tables match",
+    )
+    args = parser.parse_args()
+
+    baseline_path = args.baseline or _BASELINE_DIR / f"{args.scale}-{args.storage}.json"
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+
+    print("── Startup ─────────────────────────────────────────────────────")
+    results = startup_stages()
+    if not args.startup_only:
+        with tempfile.TemporaryDirectory() as tmp:
+            results += run_benchmark(
+                SCALES[args.scale], args.seed, args.storage, Path(tmp), args.memory_budget,
+            )
+    print_results(results, baseline)
+
+    failed = [r.stage for r in results if r.status == "failed"]
+    regressions = compare(results, baseline, args.threshold, args.min_seconds) if baseline else []
+
+    if args.update_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps({
+            "scale": args.scale,
+            "seed": args.seed,
+            "storage": args.storage,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            # --startup-only keeps the baseline's pipeline stages
+            "stages": {
+                **((baseline or {}).get("stages", {}) if args.startup_only else {}),
+                **{r.stage: asdict(r) for r in results},
+            },
+        }, indent=2))
+        print(f"\nbaseline → {baseline_path}")
+    elif baseline is None:
+        print(f"\nno baseline at {baseline_path} (run with --update-baseline to create one)")
+
+    if regressions:
+        print(f"\n✗ Regressions beyond {args.threshold:.0%}:")
+        for line in regressions:
+            print(f"  {line}")
+    if failed:
+        print(f"\n✗ Failed: {', '.join(failed)}")
+    if regressions or failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,8 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from pipeline.common.config import PipelineConfig
-from pipeline.common.r2 import make_client, make_web_client, list_keys
+from pipeline.common.r2 import delete_many, list_keys, make_client, make_web_client
+
 ROOT = Path(__file__).parent.parent
 
 
@@ -22,14 +23,11 @@ def delete_bucket(r2, bucket: str) -> None:
     print(f"Emptying '{bucket}'...")
     keys = list_keys(r2, "")
     if keys:
-        r2.client.delete_objects(  # type: ignore[attr-defined]
-            Bucket=bucket,
-            Delete={"Objects": [{"Key": k} for k in keys]},
-        )
+        delete_many(r2, keys)
         print(f"  deleted {len(keys)} object(s)")
     else:
         print("  bucket already empty")
-    r2.client.delete_bucket(Bucket=bucket)  # type: ignore[attr-defined]
+    r2.storage.client.delete_bucket(Bucket=bucket)  # type: ignore[attr-defined]
     print(f"✓ Bucket '{bucket}' deleted")
 
 
@@ -0,0 +1,208 @@
+"""
+Fake source data for the e2e test and the benchmark suite.
+
+Every generator covers the `days` days up to today, in the same shape the
+source's inbox files (or local database / history file) have in real life.
+Seed `random` first for reproducible output.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+import sqlite3
+import zipfile
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from random import choice, randint, random
+
+
+def days_back(n: int) -> list[date]:
+    today = date.today()
+    return [today - timedelta(days=i) for i in range(n)]
+
+
+def make_fitbit_zip(days: int = 30, points_per_day: int = 24) -> bytes:
+    """Fitbit takeout: per-day calories/steps files with points_per_day readings each
+    (24 = hourly, 1440 = per minute) and sleep logs, plus exercise logs in files
+    of 100 entries (exercise-0000.json, exercise-0100.json, ...)."""
+    step = 86_400 // points_per_day
+    prefix = "Takeout/Fitbit/Global Export Data"
+    exercises: list[dict] = []
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for d in days_back(days):
+            ds, us = d.isoformat(), d.strftime("%m/%d/%y")
+            times = [
+                f"{us} {s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}"
+                for s in range(0, 86_400, step)
+            ]
+            calories = [{"dateTime": t, "value": str(randint(60, 120))} for t in times]
+            zf.writestr(f"{prefix}/calories-{ds}.json", json.dumps(calories))
+            steps = [{"dateTime": t, "value": str(randint(0, 800))} for t in times]
+            zf.writestr(f"{prefix}/steps-{ds}.json", json.dumps(steps))
+            sleep = {
+                "dateOfSleep": ds,
+                "startTime": f"{ds}T23:{randint(0, 59):02d}:00.000",
+                "minutesAsleep": randint(300, 480),
+            }
+            zf.writestr(f"{prefix}/sleep-{ds}.json", json.dumps([sleep]))
+            exercise = {"startTime": f"{us} 09:00:00", "activeDuration": randint(0, 3_600_000)}
+            exercises.append(exercise)
+        for i in range(0, len(exercises), 100):
+            zf.writestr(f"{prefix}/exercise-{i:04d}.json", json.dumps(exercises[i:i + 100]))
+    return buf.getvalue()
+
+
+def make_kindle_zip(days: int = 30) -> bytes:
+    books = ["Dune", "Project Hail Mary", "The Pragmatic Programmer"]
+    lines = ["ASIN,end_time,product_name,reading_marketplace,start_time,total_reading_milliseconds"]
+    for d in days_back(days):
+        book = books[d.toordinal() % len(books)]
+        lines.append(
+            f"B{d.toordinal()},{d.isoformat()}T23:00:00Z,{book},US,{d.isoformat()}T08:00:00Z,"
+            f"{randint(10, 90) * 60_000}"
+        )
+    csv_bytes = "\n".join(lines).encode()
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("Kindle.reading-insights-sessions_with_adjustments.csv", csv_bytes)
+    return buf.getvalue()
+
+
+def make_strong_csv(days: int = 30) -> bytes:
+    workouts = ["Push Day", "Pull Day", "Leg Day"]
+    exercises = ["Bench Press", "Squat"]
+    lines = [
+        "Date;Workout Name;Duration (sec);Exercise Name;Set Order;Weight (kg);Reps;RPE;"
+        "Distance (meters);Seconds;Notes;Workout Notes"
+    ]
+    for d in days_back(days):
+        if d.weekday() < 5:
+            workout = workouts[d.toordinal() % len(workouts)]
+            for i, ex in enumerate(exercises):
+                lines.append(
+                    f"{d.isoformat()} 09:00:00;{workout};{randint(45, 90) * 60};{ex};{i+1};"
+                    f"{randint(40,100)};{randint(5,12)};;;0;0;"
+                )
+    return "\n".join(lines).encode()
+
+
+def make_github_response(weeks: int = 52) -> dict:
+    """GraphQL contributionCalendar response, as returned by the GitHub API."""
+    out = []
+    start = date.today() - timedelta(weeks=weeks)
+    for w in range(weeks):
+        days = []
+        for d in range(7):
+            day = start + timedelta(weeks=w, days=d)
+            count = randint(0, 8) if day.weekday() < 5 else randint(0, 2)
+            days.append({"date": day.isoformat(), "contributionCount": count})
+        out.append({"contributionDays": days})
+    return {"data": {"user": {"contributionsCollection": {"contributionCalendar": {"weeks": out}}}}}
+
+
+def make_github_days(days: int = 30) -> bytes:
+    """Inbox file written by github.fetch: contribution days with a non-zero count."""
+    records = [
+        {"date": d.isoformat(), "contributionCount": randint(1, 8)}
+        for d in days_back(days) if random() < 0.7
+    ]
+    return json.dumps(records).encode()
+
+
+def make_garmin_wellness(days: int = 30) -> bytes:
+    """Inbox file written by garmin.fetch: one get_stats() summary per day."""
+    records = [
+        {
+            "calendarDate": d.isoformat(),
+            "totalSteps": randint(2_000, 20_000),
+            "totalDistanceMeters": randint(1_500, 15_000),
+            "totalKilocalories": randint(1_800, 3_200),
+            "activeKilocalories": randint(100, 1_200),
+            "restingHeartRate": randint(48, 70),
+            "averageStressLevel": randint(15, 60),
+            "sleepingSeconds": randint(18_000, 32_000),
+            "floorsAscended": randint(0, 30),
+        }
+        for d in days_back(days)
+    ]
+    return json.dumps(records).encode()
+
+
+def make_garmin_activities(days: int = 30) -> bytes:
+    types = ["running", "cycling", "walking", "strength_training"]
+    records = [
+        {
+            "activityId": d.toordinal() * 10 + n,
+            "activityName": f"Activity {n}",
+            "startTimeLocal": f"{d.isoformat()} 07:30:00",
+            "activityType": {"typeKey": choice(types)},
+            "duration": float(randint(900, 5_400)),
+            "distance": float(randint(0, 20_000)),
+            "calories": float(randint(100, 900)),
+        }
+        for d in days_back(days)
+        for n in range(randint(0, 2))
+    ]
+    return json.dumps(records).encode()
+
+
+def make_gymgroup_checkins(days: int = 30) -> bytes:
+    """Inbox file written by gymgroup.fetch: check-in history."""
+    gyms = ["London Bermondsey", "London Holborn", "Manchester Central"]
+    records = [
+        {
+            "checkInDate": f"{d.isoformat()}T18:{randint(0, 59):02d}:00",
+            "gymLocationName": choice(gyms),
+            "duration": randint(30, 120) * 60_000,
+        }
+        for d in days_back(days)
+        if random() < 0.5
+    ]
+    return json.dumps(records).encode()
+
+
+_COMMANDS = [
+    "git", "ls", "cd", "uv", "python", "make", "docker", "npm", "vim", "cat", "grep", "rg",
+    "kubectl", "terraform", "ssh", "curl", "brew", "code", "pytest", "jq",
+]
+
+
+def make_zsh_history(path: Path, days: int = 30, commands_per_day: int = 100) -> int:
+    """Write an extended-format ~/.zsh_history; returns the number of lines."""
+    # A long tail of rarer commands on top of the usual ones, like a real history
+    commands = _COMMANDS + [f"tool{n}" for n in range(500)]
+    lines = 0
+    with path.open("w") as f:
+        for d in reversed(days_back(days)):
+            midnight = int(datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp())
+            for ts in sorted(midnight + randint(0, 86_399) for _ in range(commands_per_day)):
+                command = commands[min(int(random() ** 3 * len(commands)), len(commands) - 1)]
+                f.write(f": {ts}:0;{command} --flag arg{randint(0, 9)}\n")
+                lines += 1
+    return lines
+
+
+def make_knowledge_db(path: Path, days: int = 30, sessions_per_day: int = 50) -> int:
+    """Write a knowledgeC.db with /app/usage sessions; returns the number of sessions."""
+    apps = [
+        "com.apple.Safari", "com.microsoft.VSCode", "com.apple.Terminal",
+        "com.tinyspeck.slackmacgap",
+    ]
+    apps += [f"com.example.app{n}" for n in range(100)]
+    mac_epoch = 978_307_200
+    rows = []
+    for d in days_back(days):
+        midnight = datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp() - mac_epoch
+        for _ in range(sessions_per_day):
+            start = midnight + randint(0, 86_000)
+            app = apps[min(int(random() ** 2 * len(apps)), len(apps) - 1)]
+            rows.append(("/app/usage", app, start, start + randint(5, 1_800), 0))
+    with sqlite3.connect(path) as con:
+        con.execute(
+            "CREATE TABLE ZOBJECT (ZSTREAMNAME TEXT, ZVALUESTRING TEXT, ZSTARTDATE REAL, "
+            "ZENDDATE REAL, ZSECONDSFROMGMT INTEGER)"
+        )
+        con.executemany("INSERT INTO ZOBJECT VALUES (?, ?, ?, ?, ?)", rows)
+    return len(rows)
@@ -0,0 +1,217 @@
+"""
+Run several batch workers against one local storage directory and check that
+leases split the work between them correctly.
+
+- A reference run: one worker, on storage of its own.
+- The shared run: first a worker that dies right after claiming its first unit,
+  leaving a lease that has to expire and be recovered (--lease-ttl is short so
+  that happens quickly), then --workers processes with the same run id.
+
+Then checks that every unit ran to completion exactly once, that a tenant's
+units never overlapped and ran in order, that every lease ended done, and that
+the tables match the reference run's. Exits 1 if any check fails.
+
+  uv run python scripts/lease_harness.py
+  uv run python scripts/lease_harness.py --workers 6 --tenants 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+import polars as pl
+from fake_data import make_fitbit_zip, make_github_days, make_kindle_zip, make_strong_csv
+
+from pipeline import batch
+from pipeline.common import leases, paths
+from pipeline.common import r2 as R2
+from pipeline.common.config import PipelineConfig, load_tenant_configs
+
+_ENV = str(ROOT / ".env.local.example")
+_TENANT_YAML = """\
+r2:
+  bucket_name: year-in-data
+  web_bucket_name: year-in-data-web
+github:
+  username: {name}
+"""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--tenants", type=int, default=3)
+    parser.add_argument("--lease-ttl", type=float, default=2.0)
+    parser.add_argument(
+        "--keep", action="store_true",
+        help="keep the temp directory for inspection",
+    )
+    args = parser.parse_args()
+
+    work = Path(tempfile.mkdtemp(prefix="lease_harness_"))
+    tenants_dir = work / "tenants"
+    tenants_dir.mkdir()
+    for i in range(args.tenants):
+        (tenants_dir / f"t{i}.yaml").write_text(_TENANT_YAML.format(name=f"t{i}"))
+
+    reference, shared, events = work / "reference", work / "shared", work / "events.jsonl"
+    for storage in (reference, shared):
+        _seed(tenants_dir, storage)
+
+    print(f"reference run (1 worker, {args.tenants} tenants)...")
+    reference_events = work / "reference.jsonl"
+    _run_workers([(tenants_dir, reference, "reference", args.lease_ttl, reference_events, False)])
+
+    run_id = f"harness-{os.getpid()}"
+    print(f"shared run {run_id}: a worker that dies holding a lease...")
+    crashed = _run_workers([(tenants_dir, shared, run_id, args.lease_ttl, events, True)])
+    print(f"shared run {run_id}: {args.workers} workers...")
+    worker = (tenants_dir, shared, run_id, args.lease_ttl, events, False)
+    exit_codes = _run_workers([worker] * args.workers)
+
+    problems = _check(tenants_dir, reference, shared, events, run_id)
+    if crashed != [3]:
+        problems.append(f"the crashing worker exited with {crashed}, without claiming a unit")
+    if any(exit_codes):
+        problems.append(f"workers exited with {exit_codes}")
+    if args.keep:
+        print(f"\nkept {work}")
+    else:
+        shutil.rmtree(work)
+    if problems:
+        print("\n✗ " + "\n✗ ".join(problems))
+        sys.exit(1)
+    print("\n✓ every unit ran once, in order, and the tables match the reference run")
+
+
+def _run_workers(worker_args: list[tuple]) -> list[int]:
+    """Run a worker process per args tuple, concurrently; return their exit codes."""
+    ctx = multiprocessing.get_context("spawn")
+    workers = [ctx.Process(target=_run_worker, args=a) for a in worker_args]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    print(f"  {time.perf_counter() - started:.1f}s")
+    return [w.exitcode for w in workers]
+
+
+def _configs(tenants_dir: Path, storage: Path) -> dict[str, PipelineConfig]:
+    configs = load_tenant_configs(tenants_dir, _ENV)
+    for config in configs.values():
+        config.storage_backend, config.storage_dir = "local", str(storage)
+    return configs
+
+
+def _seed(tenants_dir: Path, storage: Path) -> None:
+    for index, (name, config) in enumerate(_configs(tenants_dir, storage).items()):
+        random.seed(index)
+        r2 = R2.make_client(config)
+        with paths.tenant_scope(name):
+            for source, file, data in [
+                (paths.Source.FITBIT, "export.zip", make_fitbit_zip(60)),
+                (paths.Source.KINDLE, "reading.zip", make_kindle_zip(60)),
+                (paths.Source.STRONG, "workouts.csv", make_strong_csv(60 + 30 * index)),
+                (paths.Source.GITHUB, "contributions.json", make_github_days(90 + 30 * index)),
+            ]:
+                R2.upload_bytes(r2, f"{paths.construct_inbox_path(source)}/{file}", data)
+
+
+def _run_worker(
+    tenants_dir: Path, storage: Path, run_id: str, ttl: float, events: Path, crash: bool,
+) -> None:
+    """One worker process: a batch run with every unit it runs logged to events."""
+    hold = leases.hold
+
+    @contextmanager
+    def logged_hold(r2, unit, run, lease_ttl):
+        with hold(r2, unit, run, lease_ttl) as lease:
+            if lease is None:
+                yield None
+                return
+            if crash:
+                os._exit(3)  # dies holding the lease, without releasing it
+            started, ok = time.time(), False
+            try:
+                yield lease
+                ok = True
+            finally:
+                event = {"worker": os.getpid(), "tenant": paths.current_tenant(), "unit": unit,
+                         "start": started, "end": time.time(), "ok": ok}
+                with open(events, "a") as f:
+                    f.write(json.dumps(event) + "\n")
+
+    leases.hold = logged_hold
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        batch.run_batch(_configs(tenants_dir, storage), concurrency=2, run_id=run_id, lease_ttl=ttl)
+
+
+def _check(
+    tenants_dir: Path, reference: Path, shared: Path, events: Path, run_id: str,
+) -> list[str]:
+    problems: list[str] = []
+    runs: dict[str, list[dict]] = defaultdict(list)
+    for line in events.read_text().splitlines():
+        event = json.loads(line)
+        runs[event["tenant"]].append(event)
+
+    ref_configs, configs = _configs(tenants_dir, reference), _configs(tenants_dir, shared)
+    for name, config in configs.items():
+        expected = batch.units(config)
+        ran = sorted(runs[name], key=lambda e: e["start"])
+        if [e["unit"] for e in ran] != expected:
+            problems.append(
+                f"{name}: ran {[e['unit'] for e in ran]}, expected each of {expected} once, "
+                "in order"
+            )
+        problems += [f"{name}/{e['unit']} failed" for e in ran if not e["ok"]]
+        problems += [
+            f"{name}: {a['unit']} and {b['unit']} overlapped"
+            for a, b in zip(ran, ran[1:]) if b["start"] < a["end"]
+        ]
+        workers = {e["worker"] for e in ran}
+        print(f"  {name}: {len(ran)} units on {len(workers)} workers")
+
+        r2, ref_r2 = R2.make_client(config), R2.make_client(ref_configs[name])
+        with paths.tenant_scope(name):
+            for unit in expected:
+                lease = leases.peek(r2, unit)
+                if lease is None or lease["run"] != run_id or lease["status"] != "done":
+                    problems.append(f"{name}/{unit}: lease ended {lease and lease['status']}")
+            problems += [f"{name}: {p}" for p in _compare_tables(r2, ref_r2)]
+    return problems
+
+
+def _compare_tables(r2: R2.R2Client, ref_r2: R2.R2Client) -> list[str]:
+    prefix = paths.construct_tables_prefix()
+    keys, ref_keys = set(R2.list_keys(r2, prefix)), set(R2.list_keys(ref_r2, prefix))
+    if keys != ref_keys:
+        return [f"tables differ: {sorted(keys ^ ref_keys)}"]
+    problems = []
+    for key in sorted(keys):
+        df, ref = (pl.read_parquet(R2.download_bytes(c, key)) for c in (r2, ref_r2))
+        if not df.sort(df.columns).equals(ref.sort(ref.columns)):
+            problems.append(f"{key.removeprefix(prefix)} differs from the reference run")
+    return problems
+
+
+if __name__ == "__main__":
+    main()
@@ -6,49 +6,143 @@ Covers all API-based sources:
   - Gym Group check-ins (HTTP API)
   - Garmin Connect wellness + activities
 
+The sources are fetched concurrently: GitHub and Gym Group on one shared
+httpx.AsyncClient, and Garmin (a blocking client library) in a worker thread.
+Each source has its own time limit and request rate, and a failing source doesn't
+stop the others. Exits 1 if any source failed. With --profile the sources are fetched
+one at a time instead, each as its own stage (PROFILE_SCOPE=github picks one).
+
 Does not archive — run the main pipeline afterwards to process the inbox.
 
   uv run python scripts/sync_api.py
+  uv run python scripts/sync_api.py --profile
 """
 
 from __future__ import annotations
 
+import argparse
+import asyncio
 import sys
+import threading
+import time
+from collections.abc import Callable
+from contextlib import suppress
+from dataclasses import dataclass
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from pipeline.common.config import PipelineConfig
-from pipeline.common.r2 import make_client
-from pipeline.extract import garmin, github, gymgroup
+from pipeline.common import http, profiling
+from pipeline.common.config import PipelineConfig, profile_dir
+from pipeline.common.paths import Source
+from pipeline.common.r2 import R2Client, make_client
+from pipeline.extract import async_fetcher, fetcher
+
+if TYPE_CHECKING:
+    import httpx
+
+
+@dataclass(frozen=True)
+class _Service:
+    timeout: float              # seconds the whole fetch and upload may take
+    host: str | None = None     # where its requests go, for rate limiting
+    rate: float | None = None   # max requests per second to host
+
+
+SERVICES: dict[Source, _Service] = {
+    Source.GITHUB:   _Service(timeout=60, host="api.github.com", rate=2),
+    Source.GYMGROUP: _Service(timeout=60, host="thegymgroup.netpulse.com", rate=2),
+    Source.GARMIN:   _Service(timeout=600),  # paced by garmin._REQUESTS_PER_SECOND
+}
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Fetch API sources into the R2 inbox.")
+    profiling.add_argument(parser)
+    args = parser.parse_args()
+
     config = PipelineConfig.load()
+    if args.profile:
+        profiling.enable(
+            profile_dir(config), args.profile, config.profile_scope, config.profile_memory,
+        )
     r2 = make_client(config)
-    failures: list[str] = []
 
-    try:
-        github.fetch(r2, config)
-    except Exception as e:
-        print(f"  ✗ github: {e}", file=sys.stderr)
-        failures.append("github")
+    failures = asyncio.run(sync(r2, config))
+
+    profiling.write_summary()
+    if failures:
+        print(f"\n✗ Failed: {', '.join(failures)}")
+        sys.exit(1)
 
-    try:
-        gymgroup.fetch(r2, config)
-    except Exception as e:
-        print(f"  ✗ gymgroup: {e}", file=sys.stderr)
-        failures.append("gymgroup")
 
+async def sync(
+    r2: R2Client, config: PipelineConfig, services: dict[Source, _Service] = SERVICES,
+) -> list[str]:
+    """Fetch every source concurrently; return the ones that failed."""
+    rate_limits = {s.host: s.rate for s in services.values() if s.host and s.rate}
+    async with http.async_client(rate_limits) as client:
+        runs = [_sync_source(r2, config, client, source, s) for source, s in services.items()]
+        if profiling.enabled():
+            # Profiled stages can't overlap, so each source runs on its own
+            ok = [await run for run in runs]
+        else:
+            ok = await asyncio.gather(*runs)
+    return [source for source, succeeded in zip(services, ok) if not succeeded]
+
+
+async def _sync_source(
+    r2: R2Client,
+    config: PipelineConfig,
+    client: httpx.AsyncClient,
+    source: Source,
+    service: _Service,
+) -> bool:
+    started = time.perf_counter()
     try:
-        garmin.fetch(r2, config)
+        async with asyncio.timeout(service.timeout):
+            fetch = async_fetcher(source)
+            if fetch is not None:
+                with profiling.stage("job", source):
+                    await fetch(r2, config, client)
+            else:
+                await _in_thread(source, fetcher(source), r2, config)
+    except TimeoutError:
+        print(f"  ✗ {source}: timed out after {service.timeout:.0f}s", file=sys.stderr)
+        return False
     except Exception as e:
-        print(f"  ✗ garmin: {e}", file=sys.stderr)
-        failures.append("garmin")
+        print(f"  ✗ {source}: {e}", file=sys.stderr)
+        return False
+    print(f"  ✓ {source} ({time.perf_counter() - started:.1f}s)")
+    return True
 
-    if failures:
-        print(f"\n✗ Failed: {', '.join(failures)}")
-        sys.exit(1)
+
+def _in_thread(source: Source, fn: Callable[..., object], *args) -> asyncio.Future:
+    """Run a blocking fn in a daemon thread, so one that times out doesn't hold up exit.
+    Its profiling stage opens in that thread, which is the only one cProfile sees."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(result, error) -> None:
+        if future.done():  # cancelled by its timeout
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def target() -> None:
+        try:
+            with profiling.stage("job", source):
+                result, error = fn(*args), None
+        except Exception as e:
+            result, error = None, e
+        with suppress(RuntimeError):  # loop already closed
+            loop.call_soon_threadsafe(settle, result, error)
+
+    threading.Thread(target=target, name=f"fetch-{source}", daemon=True).start()
+    return future
 
 
 if __name__ == "__main__":
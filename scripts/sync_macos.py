@@ -7,6 +7,7 @@ and process it. Does not archive or run aggregation.
 Run on a cron schedule to keep the inbox fresh:
 
   uv run python scripts/sync_macos.py
+  uv run python scripts/sync_macos.py --profile sample
 
 To run daily at 11pm via crontab:
   crontab -e
@@ -18,22 +19,39 @@ Requires Full Disk Access for Terminal (or whichever app runs this script):
 
 from __future__ import annotations
 
+import argparse
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from pipeline.common.config import PipelineConfig
+from pipeline.common import profiling
+from pipeline.common.config import PipelineConfig, profile_dir
+from pipeline.common.paths import Source
 from pipeline.common.r2 import make_client
-from pipeline.extract import macos_commands, macos_screentime
+from pipeline.extract import fetcher
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Sync macOS Screen Time and shell history to the R2 inbox.",
+    )
+    profiling.add_argument(parser)
+    args = parser.parse_args()
+
     config = PipelineConfig.load()
+    if args.profile:
+        profiling.enable(
+            profile_dir(config), args.profile, config.profile_scope, config.profile_memory,
+        )
     r2 = make_client(config)
 
-    macos_commands.fetch(r2, config)
-    macos_screentime.fetch(r2, config)
+    try:
+        for source in (Source.MACOS_COMMANDS, Source.MACOS_SCREENTIME):
+            with profiling.stage("job", source):
+                fetcher(source)(r2, config)
+    finally:
+        profiling.write_summary()
 
 
 if __name__ == "__main__":
@@ -3,89 +3,28 @@ End-to-end test: starts MinIO, generates fake data, runs the pipeline,
 and checks that the expected web JSON files were written.
 
   uv run python scripts/test_e2e.py
+  uv run python scripts/test_e2e.py --storage memory   # no MinIO needed
 """
 
 from __future__ import annotations
 
-import io
+import argparse
 import json
 import sys
 import threading
-import zipfile
-from datetime import date, timedelta
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from pathlib import Path
-from random import randint
-from botocore.exceptions import ClientError
 
 ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(ROOT))
 
+from fake_data import make_fitbit_zip, make_github_response, make_kindle_zip, make_strong_csv
+
+from pipeline.common import paths
 from pipeline.common.bucket_setup import ensure_bucket
 from pipeline.common.config import PipelineConfig
 from pipeline.common.r2 import make_client, make_web_client, upload_bytes
 from pipeline.main import run_pipeline
-from pipeline.common import paths
-
-
-def days_back(n: int) -> list[date]:
-    today = date.today()
-    return [today - timedelta(days=i) for i in range(n)]
-
-
-# ── Fake data generators ──────────────────────────────────────────────────────
-
-def make_fitbit_zip() -> bytes:
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w") as zf:
-        for d in days_back(30):
-            ds = d.isoformat()
-            prefix = "Takeout/Fitbit/Global Export Data"
-            calories = [{"dateTime": f"{ds} {h:02d}:00:00", "value": str(randint(60, 120))} for h in range(24)]
-            zf.writestr(f"{prefix}/calories-{ds}.json", json.dumps(calories))
-            steps = [{"dateTime": f"{ds} {h:02d}:00:00", "value": str(randint(0, 800))} for h in range(24)]
-            zf.writestr(f"{prefix}/steps-{ds}.json", json.dumps(steps))
-            zf.writestr(f"{prefix}/sleep-{ds}.json", json.dumps([{"dateOfSleep": ds, "minutesAsleep": randint(300, 480)}]))
-            zf.writestr(f"{prefix}/exercise-{ds}.json", json.dumps([{"startTime": f"{ds}T09:00:00", "activeDuration": randint(0, 3_600_000)}]))
-    return buf.getvalue()
-
-
-def make_kindle_zip() -> bytes:
-    books = ["Dune", "Project Hail Mary", "The Pragmatic Programmer"]
-    lines = ["ASIN,end_time,product_name,reading_marketplace,start_time,total_reading_milliseconds"]
-    for d in days_back(30):
-        book = books[d.toordinal() % len(books)]
-        lines.append(f"B{d.toordinal()},{d.isoformat()}T23:00:00Z,{book},US,{d.isoformat()}T08:00:00Z,{randint(10, 90) * 60_000}")
-    csv_bytes = "\n".join(lines).encode()
-    buf = io.BytesIO()
-    with zipfile.ZipFile(buf, "w") as zf:
-        zf.writestr("Kindle.reading-insights-sessions_with_adjustments.csv", csv_bytes)
-    return buf.getvalue()
-
-
-def make_strong_csv() -> bytes:
-    workouts = ["Push Day", "Pull Day", "Leg Day"]
-    exercises = ["Bench Press", "Squat"]
-    lines = ["Date;Workout Name;Duration (sec);Exercise Name;Set Order;Weight (kg);Reps;RPE;Distance (meters);Seconds;Notes;Workout Notes"]
-    for d in days_back(30):
-        if d.weekday() < 5:
-            workout = workouts[d.toordinal() % len(workouts)]
-            for i, ex in enumerate(exercises):
-                lines.append(f"{d.isoformat()} 09:00:00;{workout};{randint(45, 90) * 60};{ex};{i+1};{randint(40,100)};{randint(5,12)};;;0;0;")
-    return "\n".join(lines).encode()
-
-
-def make_github_response() -> dict:
-    weeks = []
-    start = date.today() - timedelta(weeks=52)
-    for w in range(52):
-        days = []
-        for d in range(7):
-            day = start + timedelta(weeks=w, days=d)
-            days.append({"date": day.isoformat(), "contributionCount": randint(0, 8) if day.weekday() < 5 else randint(0, 2)})
-        weeks.append({"contributionDays": days})
-    return {"data": {"user": {"contributionsCollection": {"contributionCalendar": {"weeks": weeks}}}}}
-
 
 # ── Mock GitHub API server ────────────────────────────────────────────────────
 
@@ -128,7 +67,16 @@ def create_test_bucket(config):
     upload_test_data(r2)
 
 def main() -> None:
+    parser = argparse.ArgumentParser(description="End-to-end pipeline test on fake data.")
+    parser.add_argument(
+        "--storage", choices=["s3", "local", "memory"],
+        help="storage backend (default: from config)",
+    )
+    args = parser.parse_args()
+
     config = PipelineConfig.load(ROOT / "config" / "test.yaml", ".env.local.example")
+    if args.storage:
+        config.storage_backend = args.storage
 
     print("── Starting MinIO ──────────────────────────────────────────────")
     create_test_bucket(config)
@@ -16,13 +16,11 @@ interface Props {
 
 export function DataSection({ config, year, onYearsLoaded }: Props) {
   const { metric, colorScheme } = config;
-  const { data, loading, error } = useMetricData(metric);
+  const { data, years, loading, error } = useMetricData(metric, year);
 
   useEffect(() => {
-    if (!data) return;
-    const years = [...new Set(data.data.map((d) => parseInt(d.date.slice(0, 4))))].sort((a, b) => b - a);
     if (years.length > 0) onYearsLoaded(years);
-  }, [data, onYearsLoaded]);
+  }, [years, onYearsLoaded]);
 
   const yearData = useMemo(
     () => data?.data.filter((d) => d.date.startsWith(String(year))) ?? [],
@@ -1,29 +1,116 @@
 import { useEffect, useState } from "react";
-import type { MetricData } from "../types";
+import type { DashboardBundle, DataPoint, ExportIndex, MetricData, MetricManifest } from "../types";
 
 declare const __R2_PUBLIC_URL__: string;
 
-export function useMetricData( metric: string) {
+// index.json is fetched once and shared by every metric on the page
+let indexPromise: Promise<ExportIndex | null> | null = null;
+let bundlePromise: Promise<DashboardBundle | null> | null = null;
+const manifestPromises = new Map<string, Promise<MetricManifest | null>>();
+
+function fetchOptionalJson<T>(path: string): Promise<T | null> {
+  return fetch(`${__R2_PUBLIC_URL__}/${path}`)
+    .then((res) => (res.ok ? (res.json() as Promise<T>) : null))
+    .catch(() => null);
+}
+
+function fetchIndex(): Promise<ExportIndex | null> {
+  indexPromise ??= fetchOptionalJson<ExportIndex>("index.json");
+  return indexPromise;
+}
+
+// One request for every metric on the landing page
+function fetchBundle(): Promise<DashboardBundle | null> {
+  bundlePromise ??= fetchIndex().then((index) =>
+    index?.dashboard ? fetchOptionalJson<DashboardBundle>(index.dashboard.path) : null
+  );
+  return bundlePromise;
+}
+
+function metricFromBundle(bundle: DashboardBundle, metric: string): { data: MetricData; years: number[] } | null {
+  const series = bundle.metrics[metric];
+  if (!series) return null;
+  const cats = bundle.categories[metric];
+  const points: DataPoint[] = cats
+    ? cats.values.map((value, i) => ({
+      date: bundle.dates[cats.date_index[i]],
+      value,
+      category: cats.names[cats.category_index[i]],
+    }))
+    : series.values.flatMap((value, i) => (value === null ? [] : [{ date: bundle.dates[i], value }]));
+  const years = [...new Set(points.map((d) => parseInt(d.date.slice(0, 4))))];
+  return {
+    data: {
+      asset_name: metric, metric, unit: series.unit, label: series.label,
+      updated_at: bundle.updated_at, data: points,
+    },
+    years,
+  };
+}
+
+function fetchManifest(metric: string): Promise<MetricManifest | null> {
+  if (!manifestPromises.has(metric)) {
+    manifestPromises.set(metric, fetchOptionalJson<MetricManifest>(`${metric}/manifest.json`));
+  }
+  return manifestPromises.get(metric)!;
+}
+
+async function fetchJson<T>(path: string): Promise<T> {
+  const url = `${__R2_PUBLIC_URL__}/${path}`;
+  const res = await fetch(url);
+  if (!res.ok) throw new Error(`${res.status} fetching ${url}`);
+  return res.json() as Promise<T>;
+}
+
+// Full history: prefer the content-addressed brotli/gzip copy, falling back to {metric}.json
+async function fetchFullHistory(metric: string): Promise<MetricData> {
+  const entry = (await fetchIndex())?.metrics[metric];
+  return fetchJson<MetricData>(entry?.br ?? entry?.gzip ?? `${metric}.json`);
+}
+
+async function fetchYear(metric: string, year: number): Promise<{ data: MetricData; years: number[] }> {
+  const bundle = await fetchBundle();
+  const fromBundle = bundle && metricFromBundle(bundle, metric);
+  if (fromBundle) return fromBundle;
+
+  const manifest = await fetchManifest(metric);
+  if (!manifest) {
+    const data = await fetchFullHistory(metric);
+    const years = [...new Set(data.data.map((d) => parseInt(d.date.slice(0, 4))))];
+    return { data, years };
+  }
+  const years = Object.keys(manifest.years).map(Number);
+  const shard = manifest.years[String(year)];
+  const data = shard
+    ? await fetchJson<MetricData>(shard.path)
+    : { ...manifest, asset_name: manifest.name, metric, data: [] };
+  return { data, years };
+}
+
+export function useMetricData(metric: string, year: number) {
   const [data, setData] = useState<MetricData | null>(null);
+  const [years, setYears] = useState<number[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
   useEffect(() => {
-    const url = `${__R2_PUBLIC_URL__}/${metric}.json`;
-    fetch(url)
-      .then((res) => {
-        if (!res.ok) throw new Error(`${res.status} fetching ${url}`);
-        return res.json() as Promise<MetricData>;
-      })
-      .then((d) => {
-        setData(d);
+    let cancelled = false;
+    fetchYear(metric, year)
+      .then((result) => {
+        if (cancelled) return;
+        setData(result.data);
+        setYears(result.years.sort((a, b) => b - a));
         setLoading(false);
       })
       .catch((e: Error) => {
+        if (cancelled) return;
         setError(e.message);
         setLoading(false);
       });
-  }, [metric]);
+    return () => {
+      cancelled = true;
+    };
+  }, [metric, year]);
 
-  return { data, loading, error };
+  return { data, years, loading, error };
 }
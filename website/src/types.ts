@@ -5,12 +5,36 @@ export interface DataPoint {
   image_url?: string;
 }
 
+export interface PeriodStats {
+  total: number;
+  mean: number | null;  // per day with data
+  days: number;
+}
+
+export interface Streak {
+  days: number;
+  start: string;
+  end: string;
+}
+
+// Precomputed by the export job so the page doesn't scan the full series
+export interface MetricStats {
+  years: Record<string, PeriodStats & { quantiles: number[] }>;
+  months: Record<string, PeriodStats>;
+  weekdays: (number | null)[];  // mean per weekday, Monday first
+  quantiles: number[];          // color-scale breakpoints at 20/40/60/80% of active days
+  longest_streak: Streak | null;
+  current_streak: Streak | null;
+}
+
 export interface MetricData {
   asset_name: string;
   metric: string;
   unit: string;
   label: string;
   updated_at: string;
+  category_totals?: { category: string; value: number }[];  // all-history totals, before top-N folding
+  stats?: MetricStats;
   data: DataPoint[];
 }
 
@@ -19,3 +43,49 @@ export interface MetricConfig {
   metric: string;
   colorScheme: "greens" | "blues" | "oranges" | "purples" | "reds" | "warm";
 }
+
+// index.json written by the export job, pointing at content-addressed copies
+export interface ExportIndexEntry {
+  sha256: string;
+  updated_at: string;
+  gzip: string;
+  br?: string;
+}
+
+export interface ExportIndex {
+  version: number;
+  updated_at: string;
+  metrics: Record<string, ExportIndexEntry>;
+  dashboard?: { sha256: string; updated_at: string; path: string };
+}
+
+// dashboard.{hash}.json: every metric on one shared date axis
+export interface DashboardBundle {
+  updated_at: string;
+  dates: string[];
+  metrics: Record<string, { unit: string; label: string; values: (number | null)[] }>;
+  categories: Record<string, {
+    names: string[];
+    date_index: number[];
+    category_index: number[];
+    values: number[];
+  }>;
+}
+
+// {metric}/manifest.json: one entry per year shard ({metric}/{year}.json)
+export interface YearShard {
+  path: string;
+  rows: number;
+  min: number;
+  max: number;
+  sha256: string;
+  updated_at: string;
+}
+
+export interface MetricManifest {
+  name: string;
+  unit: string;
+  label: string;
+  updated_at: string;
+  years: Record<string, YearShard>;
+}